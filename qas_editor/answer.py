@@ -92,6 +92,12 @@ def __init__(self, text: FText):
     def __str__(self) -> str:
         return self._text.get()
 
+    @property
+    def text(self) -> FText:
+        """Text of the option.
+        """
+        return self._text
+
 
 class GapOption:
     """qti-simple-associable-choice"""
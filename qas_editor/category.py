@@ -20,16 +20,19 @@
 from __future__ import annotations
 
 import csv
+import functools
+import importlib
 import logging
+import os
 import re
+import tarfile
+import zipfile
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Dict, Iterator, List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple
 
 from .enums import TestStatus
-from .parsers import (aiken, cloze, csv_card, gift, ims, kahoot, latex,
-                      markdown, moodle, olx)
 from .question import QQuestion
-from .utils import File
+from .utils import File, QFilter, parallel_map
 
 if TYPE_CHECKING:
     from .utils import Dataset
@@ -45,9 +48,144 @@
     "OLX": ("read_olx", "write_olx", "olx"),
     "QTI2.1": ("read_qti12", "write_qti12", "xml"),
     "LaTex": ("read_latex", "write_latex", "tex"),
-    "Moodle": ("read_moodle", "write_moodle", "xml")
+    "Moodle": ("read_moodle", "write_moodle", "xml"),
+    "Moodle Backup": ("read_moodle_backup", None, "mbz")  # Read only
 }
 EXTS = ";;".join(f"{k}(*.{v[2]})" for k,v in SERIALIZERS.items())
+WRITE_EXTS = ";;".join(f"{k}(*.{v[2]})" for k,v in SERIALIZERS.items()
+                       if v[1] is not None)
+
+_SNIFF_SIZE = 4096
+_XML_ROOTS = {"quiz": "Moodle", "questestinterop": "QTI2.1"}
+_XML_ROOT = re.compile(r"<(?![?!])([\w.-]+:)?([\w.-]+)")
+_CLOZE = re.compile(r"\{\d*:(MULTICHOICE|MULTIRESPONSE|SHORTANSWER|NUMERICAL|"
+                    r"MC|MR|SA|NM)\w*:")
+_GIFT = re.compile(r"^\s*(::|\$CATEGORY:)", re.M)
+_AIKEN = re.compile(r"^ANSWER:\s*[A-Z]\s*$", re.M)
+_FILTERED = {"GIFT", "Moodle"}    # Readers that take a filter
+
+
+def _archive_format(name: str) -> str:
+    if name == "questions.xml":
+        return "Moodle Backup"
+    if name == "imsmanifest.xml":
+        return ""  # IMS packages are read through the ims module
+    if name.endswith(("/course.xml", "/library.xml")):
+        return "OLX"
+    return None
+
+
+def _sniff_archive(file_path: str, head: bytes) -> str:
+    if head[:4] == b"PK\x03\x04":
+        with zipfile.ZipFile(file_path) as ifile:
+            names = ifile.namelist()
+    elif (head[:6] == b"\xfd7zXZ\x00" or head[:2] == b"\x1f\x8b" or
+          head[257:262] == b"ustar"):
+        # Members are read in order, so compressed tars are only
+        # decompressed up to the first member that tells the format
+        with tarfile.open(file_path, "r|*") as ifile:
+            for member in ifile:
+                name = _archive_format(member.name)
+                if name is not None:
+                    return name or None
+        return None
+    else:
+        return None
+    found = [_archive_format(name) for name in names]
+    for name in ("Moodle Backup", "", "OLX"):
+        if name in found:
+            return name or None
+    return None
+
+
+def detect_format(file_path: str) -> str:
+    """Find the serializer able to read a file. Only the extension and the
+    first few KB of the file are checked, so no file is parsed more than
+    once.
+    Args:
+        file_path (str): path of the file.
+    Returns:
+        str: a key of SERIALIZERS, or None if the format is not known.
+    """
+    if not os.path.isfile(file_path):
+        return None
+    with open(file_path, "rb") as ifile:
+        head = ifile.read(_SNIFF_SIZE)
+    try:
+        name = _sniff_archive(file_path, head)
+    except (zipfile.BadZipFile, tarfile.TarError):
+        return None
+    if name is not None:
+        return name
+    text = head.decode("utf-8", errors="ignore").lstrip("\ufeff \t\r\n")
+    if text[:1] == "<":
+        match = _XML_ROOT.search(text)
+        if match and match[2] in _XML_ROOTS:
+            return _XML_ROOTS[match[2]]
+    elif _CLOZE.search(text):
+        return "Cloze"
+    elif _GIFT.search(text):
+        return "GIFT"
+    elif _AIKEN.search(text):
+        return "Aiken"
+    # Aiken has a signature and uses "txt", which is too common to be trusted
+    ext = os.path.splitext(file_path)[1][1:].lower()
+    names = [key for key, val in SERIALIZERS.items()
+             if val[2] == ext and key != "Aiken"]
+    return names[0] if len(names) == 1 else None
+
+
+def _prune(cat: Category, qfilter: QFilter, path: str):
+    for question in list(cat.questions):
+        if not qfilter.accepts(path, None, question.tags, question.dbid):
+            cat.pop_question(question)
+    for name in cat:
+        _prune(cat[name], qfilter, f"{path}/{name}")
+
+
+def _read_file(cls, file_path: str, qfilter: QFilter = None):
+    """Read a single file. Module level so it can run in worker processes.
+    Readers that do not take a filter have the questions pruned after the
+    file is read, without checking their types.
+    """
+    name = detect_format(file_path)
+    reader = getattr(cls, SERIALIZERS[name][0], None) if name else None
+    if reader is None:
+        raise ValueError("No valid parser found")
+    if qfilter is None:
+        return reader(file_path)
+    if name in _FILTERED:
+        return reader(file_path, filter=qfilter)
+    top = reader(file_path)
+    _prune(top, qfilter, top.name)
+    return top
+
+
+class _Parser:
+    """Reader or writer of a parser module that is only imported when first
+    used. Importing all parsers eagerly made loading this module slow, even
+    if only one format is needed. Once resolved, the descriptor replaces
+    itself in the class by the actual method.
+    """
+
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._owner = None
+        self._attr = None
+
+    def __set_name__(self, owner, attr: str):
+        self._owner = owner
+        self._attr = attr
+
+    def __get__(self, obj, owner=None):
+        module = importlib.import_module(f".parsers.{self._module}",
+                                         __package__)
+        func = getattr(module, self._name)
+        if self._attr.startswith("read_"):
+            func = classmethod(func)
+        setattr(self._owner, self._attr, func)
+        return func.__get__(obj, owner)
 
 
 class Category:  # pylint: disable=R0904
@@ -55,30 +193,42 @@ class Category:  # pylint: disable=R0904
     similarities to be grouped together.
     """
 
-    read_aiken = classmethod(aiken.read_aiken)
-    read_cloze = classmethod(cloze.read_cloze)
-    read_anki = classmethod(csv_card.read_anki)
-    read_quizlet = classmethod(csv_card.read_quizlet)
-    read_gift = classmethod(gift.read_gift)
-    read_kahoot = classmethod(kahoot.read_kahoot)
-    read_latex_l2m = classmethod(latex.read_l2m)
-    read_latex_amc = classmethod(latex.read_amc)
-    read_markdown = classmethod(markdown.read_markdown)
-    read_moodle = classmethod(moodle.read_moodle)
-    read_moodle_backup = classmethod(moodle.read_moodle_backup)
-    read_olx = classmethod(olx.read_olx)
-    read_qti12 = classmethod(ims.read_qti1v2)
-
-    write_aiken = aiken.write_aiken
-    write_cloze = cloze.write_cloze
-    write_anki = csv_card.write_anki
-    write_quizlet = csv_card.write_quizlet
-    write_gift = gift.write_gift
-    write_kahoot = kahoot.write_kahoot
-    write_latex_l2m = latex.write_l2m
-    write_markdown = markdown.write_markdown
-    write_moodle = moodle.write_moodle
-    write_olx = olx.write_olx
+    _dirty = True  # Defaults for instances restored from older states
+    _saved_to = None
+
+    read_aiken = _Parser("aiken", "read_aiken")
+    read_cloze = _Parser("cloze", "read_cloze")
+    read_anki = _Parser("csv_card", "read_anki")
+    read_quizlet = _Parser("csv_card", "read_quizlet")
+    read_gift = _Parser("gift", "read_gift")
+    read_kahoot = _Parser("kahoot", "read_kahoot")
+    read_latex_l2m = _Parser("latex", "read_l2m")
+    read_latex_amc = _Parser("latex", "read_amc")
+    read_markdown = _Parser("markdown", "read_markdown")
+    read_moodle = _Parser("moodle", "read_moodle")
+    read_moodle_backup = _Parser("moodle", "read_moodle_backup")
+    read_olx = _Parser("olx", "read_olx")
+    read_json = _Parser("qasjson", "read_json")
+    read_jsonl_shards = _Parser("qasjson", "read_jsonl_shards")
+    read_sqlite = _Parser("sqlite", "read_sqlite")
+    read_folder = _Parser("folder", "read_folder")
+    read_qti12 = _Parser("ims", "read_qti1v2")
+
+    write_aiken = _Parser("aiken", "write_aiken")
+    write_cloze = _Parser("cloze", "write_cloze")
+    write_anki = _Parser("csv_card", "write_anki")
+    write_quizlet = _Parser("csv_card", "write_quizlet")
+    write_gift = _Parser("gift", "write_gift")
+    write_kahoot = _Parser("kahoot", "write_kahoot")
+    write_latex_l2m = _Parser("latex", "write_l2m")
+    write_markdown = _Parser("markdown", "write_markdown")
+    write_moodle = _Parser("moodle", "write_moodle")
+    write_olx = _Parser("olx", "write_olx")
+    write_json = _Parser("qasjson", "write_json")
+    write_jsonl_shards = _Parser("qasjson", "write_jsonl_shards")
+    append_jsonl_shards = _Parser("qasjson", "append_jsonl_shards")
+    write_sqlite = _Parser("sqlite", "write_sqlite")
+    write_folder = _Parser("folder", "write_folder")
 
     def __init__(self, name: str = None):
         self.__questions: List[QQuestion] = []
@@ -89,6 +239,24 @@ def __init__(self, name: str = None):
         self.datasets: List[Dataset] = None
         self.resources: List[File] = []
         self.info: str = ""
+        self._dirty = True
+        self._saved_to: str = None
+
+    def __getstate__(self):
+        # Only links to children are pickled, so a subtree can be sent to
+        # another process without its parents. They are restored below.
+        state = self.__dict__.copy()
+        state["_Category__parent"] = None
+        state.pop("_dirty", None)  # Restored instances are dirty and were
+        state.pop("_saved_to", None)  # not saved anywhere yet
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        for question in self.__questions:
+            question._set_parent(self)
+        for cat in self.__categories.values():
+            cat.__parent = self
 
     def __iter__(self):
         return self.__categories.__iter__()
@@ -102,6 +270,26 @@ def __len__(self):
     def __str__(self):
         return f"Category: '{self.name}' @{hex(id(self))}"
 
+    @property
+    def dirty(self) -> bool:
+        """If this category or anything in it changed since it was last
+        saved. Questions mark their categories when touched. Texts changed in
+        place are found by checking the questions, so this walks the tree.
+        """
+        if self._dirty:
+            return True
+        questions, cats = self._in_memory()
+        return any(question.dirty for question in questions) or \
+            any(cat.dirty for cat in cats)
+
+    @property
+    def saved_to(self) -> str:
+        """Output this tree was last saved to by an incremental writer, or
+        None. Items that are not dirty can only be skipped when writing to it
+        again, since the flags are shared by all the outputs.
+        """
+        return self._saved_to
+
     @property
     def questions(self) -> Iterator[QQuestion]:
         """Set of questions of this category.
@@ -116,15 +304,17 @@ def name(self):
 
     @name.setter
     def name(self, value: str):
-        if self.__parent is not None:
-            if value in self.__parent:
+        parent = self.__parent
+        if parent is not None:
+            if value in parent:
                 raise ValueError(f"Question name \"{value}\" already "
                                  "exists on current category")
-            self.__parent.pop_subcat(self.__name)
+            parent.pop_subcat(self.__name)
             self.__name = value
-            self.__parent.add_subcat(self)
+            parent.add_subcat(self)
         else:
             self.__name = value
+        self.touch()
 
     @property
     def parent(self):
@@ -154,6 +344,7 @@ def add_subcat(self, child: Category | str) -> bool:
             child.parent.pop_subcat(child.name)
         self.__categories[child.name] = child
         child.parent = self
+        self.touch()
         return child
 
     def add_question(self, question) -> bool:
@@ -169,6 +360,7 @@ def add_question(self, question) -> bool:
             question.parent.pop_question(question)
         self.__questions.append(question)
         question.parent = self
+        question.touch()
         return True
 
     def find(self, results: list, title: str = None, tags: list = None,
@@ -277,6 +469,34 @@ def get_question(self, index: int) -> QQuestion:
         """
         return self.__questions[index]
 
+    def mark_saved(self, target: str = None):
+        """Clear the dirty flags of this category, its questions and its
+        subcategories. Called by incremental writers after saving.
+        Args:
+            target (str, optional): the output that was written.
+        """
+        self._clear_dirty()
+        self._saved_to = target
+        parent = self.__parent
+        while parent is not None:  # Their flags no longer match their output
+            parent._saved_to = None
+            parent = parent.__parent
+
+    def _in_memory(self) -> Tuple[Iterable[QQuestion], Iterable[Category]]:
+        """Questions and subcategories already in memory. Lazy categories
+        do not read the ones still in their bank, which can not be dirty.
+        """
+        return self.__questions, self.__categories.values()
+
+    def _clear_dirty(self):
+        self._dirty = False
+        self._saved_to = None
+        questions, cats = self._in_memory()
+        for question in questions:
+            question.mark_saved()
+        for cat in cats:  # Even if clean, its texts may have been changed
+            cat._clear_dirty()
+
     def merge(self, child: Category):
         """Merge this <code>Category</code> with another one. This merge will
         move the subcats and questions of the provided <code>Category</code>
@@ -295,6 +515,7 @@ def merge(self, child: Category):
             cat = child.pop_subcat(cat_name)
             self.__categories[cat_name] = cat
             cat.parent = self
+        self.touch()
         del child
         return True
 
@@ -308,6 +529,7 @@ def pop_question(self, question: QQuestion) -> bool:
             return False
         self.__questions.remove(question)
         question.parent = None
+        self.touch()
         return True
 
     def pop_subcat(self, subcat: Category | str) -> Category:
@@ -320,12 +542,14 @@ def pop_subcat(self, subcat: Category | str) -> Category:
         name = subcat.name if isinstance(subcat, Category) else subcat
         child = self.__categories.pop(name)
         child.parent = None
+        self.touch()
         return child
 
     def sort_questions(self, recursive: bool):
         """Sort the questions in this category.
         """
         self.__questions = sorted(self.__questions, key=lambda qst: qst.name)
+        self.touch()
         if recursive:
             for cat in self.__categories.values():
                 cat.sort_questions(recursive)
@@ -335,36 +559,51 @@ def sort_subcats(self, recursive: bool):
         """
         self.__categories = dict(sorted(self.__categories.items(),
                                  key=lambda elem: elem[0]))
+        self.touch()
         if recursive:
             for cat in self.__categories.values():
                 cat.sort_subcats(recursive)
 
+    def touch(self):
+        """Mark this category and its parents as changed. Only goes up until
+        a category that is already dirty, since its parents are too.
+        """
+        cat = self
+        while cat is not None and not cat._dirty:
+            cat._dirty = True
+            cat = cat.__parent
+
     @classmethod
-    def read_files(cls, files: list, category: str = "$course$"):
-        """_summary_
+    def read_files(cls, files: list, category: str = "$course$", jobs=1,
+                   errors: list = None, filter: QFilter = None):
+        """Read a set of files, each with the reader given by detect_format,
+        and merge them into a single category, in the order of the files.
+        Files that can not be read are logged and skipped.
 
         Args:
-            folder_path (str): _description_
-            category (str, optional): _description_. Defaults to "$".
+            files (list): paths of the files.
+            category (str, optional): name of the top category. Defaults to
+                "$course$".
+            jobs (int, optional): number of worker processes used to parse
+                the files. None uses all the CPUs. Defaults to 1.
+            errors (list, optional): if provided, a (path, exception) tuple
+                is appended for each file that could not be read.
+            filter (QFilter, optional): questions to read. GIFT and Moodle
+                files skip the others before parsing them.
 
         Returns:
-            list: _description_
+            Category: the merged category.
         """
         top_quiz = cls(category)
-        for _path in files:
-            ext = _path.rsplit(".", 1)[-1]
-            for func in dir(cls):
-                try:
-                    if callable(getattr(cls, func)) and func[:6] == "write_":
-                        obj = getattr(cls, func)(_path)
-                        if obj:
-                            top_quiz.merge(obj)
-                            break
-                except (ValueError, KeyError, TypeError):
-                    pass
-            else:
-                _LOG.error("Failed to parse file %s. No valid parser"
-                           " found for %s.", _path, ext)
+        results = parallel_map(functools.partial(_read_file, cls,
+                                                 qfilter=filter), files, jobs)
+        for _path, obj in zip(files, results):
+            if isinstance(obj, Exception):
+                _LOG.error("Failed to parse file %s: %s", _path, obj)
+                if errors is not None:
+                    errors.append((_path, obj))
+            elif obj is not None:
+                top_quiz.merge(obj)
         return top_quiz
 
     def update_links(self, filename: str, link_header: str, recursive: bool,
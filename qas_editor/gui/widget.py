@@ -76,8 +76,11 @@ def focusOutEvent(self, event):             # pylint: disable=C0103
         """Method overwritten. Updates the data in the target object.
         """
         if self.__obj is not None and self._get_data:
-            setattr(self.__obj, self.__attr,
-                    getattr(self, self._get_data)) # pylint: disable=E1102
+            value = getattr(self, self._get_data)() # pylint: disable=E1102
+            if value != getattr(self.__obj, self.__attr):
+                setattr(self.__obj, self.__attr, value)
+                if hasattr(self.__obj, "touch"):  # Changed in place
+                    self.__obj.touch()
         return super().focusOutEvent(event)        # pylint: disable=E1101
 
 
@@ -804,6 +807,7 @@ class GTagBar(QFrame):
 
     def __init__(self, parent):
         super().__init__(parent)
+        self._obj = None
         self._tags: list = None
         self.cat_tags: dict = None
         self._h_layout = QHBoxLayout(self)
@@ -825,6 +829,7 @@ def __create_tags(self):
                 self._tags.append(tag)
                 self.cat_tags[tag] = self.cat_tags.setdefault(tag, 0) + 1
         self._tags.sort(key=lambda x: x.lower())
+        self.__touch()
         self.__refresh()
 
     def __on_text_change(self):
@@ -840,6 +845,7 @@ def __on_text_change(self):
     def __delete(self, tag_name):
         index = self._tags.index(tag_name)
         self._tags.remove(tag_name)
+        self.__touch()
         self._h_layout.itemAt(index + 1).widget().setParent(None)
         self._line_edit.setFocus()
 
@@ -858,9 +864,14 @@ def __refresh(self):
                 self._h_layout.addWidget(label)
         self._line_edit.setFocus()
 
+    def __touch(self):
+        if hasattr(self._obj, "touch"):  # Tags are changed in place
+            self._obj.touch()
+
     def from_list(self, obj):
         """Update the list of tags based on a iterable object.
         """
+        self._obj = None
         self._tags = obj
         self.__refresh()
 
@@ -871,6 +882,7 @@ def from_obj(self, obj):
             obj (_Question): _description_
         """
         self.from_list(obj.tags)
+        self._obj = obj
 
     def get_attr(self):
         """ Return attribute updated when new tag is added.
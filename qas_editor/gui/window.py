@@ -20,7 +20,6 @@
 from __future__ import annotations
 
 import copy
-import glob
 from importlib import resources
 from typing import TYPE_CHECKING, List
 
@@ -28,11 +27,11 @@
 from PyQt5.QtGui import QIcon, QStandardItem, QStandardItemModel
 from PyQt5.QtWidgets import (QAbstractItemView, QAction, QFileDialog, QFrame,
                              QGridLayout, QGroupBox, QHBoxLayout, QLabel,
-                             QMainWindow, QMenu, QPushButton, QScrollArea,
-                             QShortcut, QSplitter, QStatusBar, QTreeView,
-                             QVBoxLayout, QWidget)
+                             QMainWindow, QMenu, QMessageBox, QPushButton,
+                             QScrollArea, QShortcut, QSplitter, QStatusBar,
+                             QTreeView, QVBoxLayout, QWidget)
 
-from ..category import EXTS, Category
+from ..category import EXTS, WRITE_EXTS, Category
 from ..enums import Grading, Numbering, RespFormat, ShowUnits, Synchronise
 from ..question import _Question
 from .layout import AutoUpdateVBox, GCollapsible, GHintsList, GOptions
@@ -224,6 +223,7 @@ def _block_datatree(self) -> QVBoxLayout:
         self.data_view.setStyleSheet("margin: 5px 5px 0px 5px")
         self.data_view.setHeaderHidden(True)
         self.data_view.doubleClicked.connect(self._update_item)
+        self.data_view.expanded.connect(self._expand_item)
         self.data_view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.data_view.customContextMenuRequested.connect(self._data_view_cxt)
         self.data_view.setDragEnabled(True)
@@ -565,6 +565,23 @@ def _new_item(data: Category | _Question, parent: QStandardItem):
             parent.appendRow(item)
         return item
 
+    @action_handler
+    def _expand_item(self, model_index: QModelIndex):
+        data = model_index.data(257)
+        if not isinstance(data, Category) or getattr(data, "loaded", True):
+            return
+        item = self.root_item.itemFromIndex(model_index)
+        for row in reversed(range(item.rowCount())):
+            if item.child(row).data() is None:  # Placeholder of the arrow
+                item.removeRow(row)
+        gtags = self.tagbar.cat_tags or {}
+        for row, question in enumerate(data.questions):
+            self._new_item(question, item)
+            item.insertRow(row, item.takeRow(item.rowCount() - 1))
+            for tag in question.tags:
+                gtags[tag] = gtags.setdefault(tag, 0) + 1
+        self.tagbar.set_gtags(gtags)
+
     @action_handler
     def _open_about(self, _):
         popup = PAbout(self)
@@ -600,13 +617,23 @@ def _read_file(self, _):
             return
         if len(files) == 1:
             self.path = files[0]
-        self.top_quiz = Category.read_files(files)
+        errors = []
+        self.top_quiz = Category.read_files(files, jobs=None, errors=errors)
         gtags = {}
         self.top_quiz.get_tags(gtags)
         self.tagbar.set_gtags(gtags)
         self.root_item.clear()
         self._update_tree_item(self.top_quiz, self.root_item)
         self.data_view.expandAll()
+        if errors:
+            dlg = QMessageBox(self)
+            dlg.setIcon(QMessageBox.Warning)
+            dlg.setWindowTitle("Open file")
+            dlg.setText(f"{len(errors)} of {len(files)} files could not be "
+                        "read and were skipped.")
+            dlg.setDetailedText("\n".join(f"{path}: {err}"
+                                          for path, err in errors))
+            dlg.show()
 
     @action_handler
     def _read_folder(self, _):
@@ -615,18 +642,18 @@ def _read_folder(self, _):
         dialog.setFileMode(dir_mode)
         if not dialog.exec():
             return
-        self.top_quiz = Category()
+        # Questions are only parsed when their category is expanded
+        folders = dialog.selectedFiles()
+        if len(folders) == 1:
+            self.top_quiz = Category.read_folder(folders[0])
+        else:  # Each selected folder is a subcategory, as before
+            self.top_quiz = Category()
+            for folder in folders:
+                self.top_quiz.add_subcat(Category.read_folder(folder))
         self.path = None
-        for folder in dialog.selectedFiles():
-            cat = folder.rsplit("/", 1)[-1]
-            quiz = Category.read_files(glob.glob(f"{folder}/*"), cat)
-            self.top_quiz.add_subcat(quiz)
-        gtags = {}
-        self.top_quiz.get_tags(gtags)
-        self.tagbar.set_gtags(gtags)
+        self.tagbar.set_gtags({})
         self.root_item.clear()
         self._update_tree_item(self.top_quiz, self.root_item)
-        self.data_view.expandAll()
 
     @action_handler
     def _rename_category(self, *_):
@@ -640,6 +667,8 @@ def _rename_category(self, *_):
     @action_handler
     def _update_item(self, model_index: QModelIndex) -> None:
         item = model_index.data(257)
+        if item is None:  # Placeholder of a category not loaded yet
+            return
         if isinstance(item, _Question):
             for key in self._items:
                 attr = key.get_attr()
@@ -659,15 +688,23 @@ def _update_item(self, model_index: QModelIndex) -> None:
 
     def _update_tree_item(self, data: Category, parent: QStandardItem):
         item = self._new_item(data, parent)
-        for k in data.questions:
-            self._new_item(k, item)
+        if getattr(data, "loaded", True):
+            for k in data.questions:
+                self._new_item(k, item)
+        else:  # Qt only shows the expand arrow of items with children
+            placeholder = QStandardItem("...")
+            placeholder.setEditable(False)
+            placeholder.setDragEnabled(False)
+            placeholder.setDropEnabled(False)
+            item.appendRow(placeholder)
         for k in data:
             self._update_tree_item(data[k], item)
 
     @action_handler
     def _write_quiz(self, quiz: Category, save_as: bool):
         if save_as or self.path is None:
-            path, ext = QFileDialog.getSaveFileName(self, "Save file", "", EXTS)
+            path, ext = QFileDialog.getSaveFileName(self, "Save file", "",
+                                                    WRITE_EXTS)
             if not path:
                 return (None, None)
         else:
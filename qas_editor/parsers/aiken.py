@@ -20,25 +20,38 @@
 from __future__ import annotations
 
 import glob
+import itertools
 import logging
 import os
 import re
-from typing import TYPE_CHECKING, Type
+from typing import TYPE_CHECKING, Iterator, Type
 
 from .. import processors as pcsr
 from ..answer import ChoiceItem, ChoiceOption
 from ..enums import Language
 from ..question import QQuestion
-from .text import FText, PlainParser
+from ..utils import parallel_map, read_block, split_blocks
+from .text import FText, FTextPool, PlainParser
 
 if TYPE_CHECKING:
     from ..category import Category
 
 LOG = logging.getLogger(__name__)
 _PATTERN = re.compile(r"[A-Z]+\) (.+)")
+_BORDER = re.compile(rb"(?m)^ANSWER:[^\n]*\n")
+_CHUNKS_PER_JOB = 4
 
 
-def _from_question(buffer, line: str, path: str, name: str, language: Language):
+def _option(pool: FTextPool, path: str, text: str) -> ChoiceOption:
+    def _parse():
+        parser = PlainParser(path)
+        parser.parse(text)
+        return FText(parser)
+    return ChoiceOption(pool.ftext(text, _parse))
+
+
+def _from_question(buffer, line: str, path: str, name: str, language: Language,
+                   pool: FTextPool):
     question = QQuestion({language: name}, None, None)
     simple_choice = ChoiceItem()
     header = line
@@ -46,9 +59,7 @@ def _from_question(buffer, line: str, path: str, name: str, language: Language):
     for _line in buffer:
         match = _PATTERN.match(_line)
         if match:
-            parser = PlainParser(path)
-            parser.parse(match[1])
-            simple_choice.options.append(ChoiceOption(FText(parser)))
+            simple_choice.options.append(_option(pool, path, match[1]))
             break
         header += _line
     target = 0
@@ -57,9 +68,7 @@ def _from_question(buffer, line: str, path: str, name: str, language: Language):
         if not match:
             target = ord(_line[8].upper())-65
             break
-        parser = PlainParser(path)
-        parser.parse(match[1])
-        simple_choice.options.append(ChoiceOption(FText(parser)))
+        simple_choice.options.append(_option(pool, path, match[1]))
     question.body[language].text.append(header.strip())
     question.body[language].text.append(simple_choice)
     args = {"values": {target: {"value": 100}}}
@@ -67,29 +76,90 @@ def _from_question(buffer, line: str, path: str, name: str, language: Language):
     return question
 
 
+def _iter_aiken(ifile, path: str, language: Language, pool: FTextPool):
+    for line in ifile:
+        if line != "\n":     # Named by read_aiken, that knows the file order
+            yield _from_question(ifile, line, path, "", language, pool)
+
+
+def _iter_files(file_path: str, path: str, language: Language):
+    pool = FTextPool()
+    for _path in glob.glob(file_path):
+        with open(_path, encoding="utf-8") as ifile:
+            yield from _iter_aiken(ifile, path, language, pool)
+
+
+def _read_chunk(args: tuple) -> list:
+    file_path, start, end, path, language = args
+    with read_block(file_path, start, end) as ifile:
+        return list(_iter_aiken(ifile, path, language, FTextPool()))
+
+
+def _index(file_path: str) -> Iterator[tuple]:
+    """(offset, length, name, category path, type) of each question. A
+    question ends at the first line after its options, as in _from_question.
+    """
+    pos = cnt = 0
+    with open(file_path, "rb") as ifile:
+        for line in ifile:
+            start, pos = pos, pos + len(line)
+            if line in (b"\n", b"\r\n"):
+                continue
+            options = False
+            for line in ifile:
+                pos += len(line)
+                if _PATTERN.match(line.decode("utf-8")):
+                    options = True
+                elif options:
+                    break
+            yield start, pos - start, f"aiken_{cnt}", None, "multichoice"
+            cnt += 1
+
+
+def _load(file_path: str, entry: tuple, language: Language = Language.EN_US
+          ) -> QQuestion:
+    offset, length, name = entry[:3]
+    with read_block(file_path, offset, offset + length) as ifile:
+        question = next(_iter_aiken(ifile, os.path.dirname(file_path),
+                                    language, FTextPool()))
+    question.name[language] = name
+    return question
+
+
 # -----------------------------------------------------------------------------
 
 
-def read_aiken(cls: Type[Category], file_path: str, category: str, 
-               language: Language) -> Category:
+def read_aiken(cls: Type[Category], file_path: str, category: str = None,
+               language: Language = Language.EN_US, jobs: int = 1) -> Category:
     """_summary_
     Args:
         file_path (str): _description_
         category (str, optional): _description_. Defaults to "$".
+        jobs (int, optional): number of worker processes. If not 1, the
+            files are split after the ANSWER lines, and the blocks are
+            parsed in parallel. None uses all the CPUs.
     Returns:
         Quiz: _description_
     """
     quiz = cls(category)
     path = os.path.dirname(file_path)
-    cnt = 0
-    for _path in glob.glob(file_path):
-        with open(_path, encoding="utf-8") as ifile:
-            for line in ifile:
-                if line == "\n":
-                    continue
-                question = _from_question(ifile, line, path, f"aiken_{cnt}", language)
-                quiz.add_question(question)
-                cnt += 1
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        questions = _iter_files(file_path, path, language)
+    else:
+        chunks = [(_path, start, end, path, language)
+                  for _path in glob.glob(file_path)
+                  for start, end in split_blocks(_path, jobs * _CHUNKS_PER_JOB,
+                                                 _BORDER)]
+        results = parallel_map(_read_chunk, chunks, jobs)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        questions = itertools.chain.from_iterable(results)
+    for cnt, question in enumerate(questions):  # Names follow the file order
+        question.name[language] = f"aiken_{cnt}"
+        quiz.add_question(question)
     return quiz
 
 
@@ -103,10 +173,10 @@ def _to_aiken(cat: Category, writer):
         for question in cat.questions:
             if (len(question.body[language]) == 2 and
                         isinstance(question.body[language][1], ChoiceItem)):
-                writer(f"{question.body[language].text[0]}\n")
+                writer(f"{question.body[language][0]}\n")
                 correct = "ANSWER: None\n\n"
-                proc = question.body[language].text[1].processor
-                opts = question.body[language].text[1].options
+                proc = question.body[language][1].processor
+                opts = question.body[language][1].options
                 for num, ans in enumerate(opts):
                     writer(f"{chr(num+65)}) {ans}\n")
                     if proc.func(num)["value"] == 100.0:
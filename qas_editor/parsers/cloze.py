@@ -19,6 +19,7 @@
 """
 from __future__ import annotations
 
+import itertools
 import logging
 import os
 import re
@@ -28,22 +29,33 @@
 from ..answer import ChoiceItem, ChoiceOption, EntryItem
 from ..enums import EmbeddedFormat, Language, Orientation
 from ..question import QQuestion
-from .text import FText, PlainParser
+from ..utils import parallel_map, read_block, split_blocks
+from .text import FText, FTextPool, PlainParser
 
 if TYPE_CHECKING:
     from ..category import Category
 
 
 _LOG = logging.getLogger(__name__)
+_SPECIAL = re.compile(r"[\\~#}]")
+_CHUNKS_PER_JOB = 4
 
 
 class _Reader:
-    
-    _CLOZE_PATTERN = re.compile(r"(?!\\)\{(\d+)?(?:\:(.*?)\:)(.*?(?!\\)\})")
+    """Embedded answers are found in a single pass. Heads, like {1:SA:, are
+    searched with escaped chars, so an escaped brace is never a start, and
+    the answers are then split on the unescaped ~, # and }.
+    """
+
+    _HEADS = re.compile(r"\\.|\{(\d*):([A-Z_]+):", re.S)
+    _MARKS = re.compile(r"\\.|[~#}]", re.S)
+    _FRACTION = re.compile(r"%(-?\d+(?:\.\d+)?)%")
+    _UNESCAPE = re.compile(r"\\(.)", re.S)
 
     def __init__(self, rpath: str, lang: Language, embedded_name: bool) -> None:
         self.feeds = self.fmt = self.args = None
         self.rpath = rpath
+        self.pool = FTextPool()
         self.lang = lang
         self.embedded_name = embedded_name
         self.OPTIONS = {
@@ -61,13 +73,18 @@ def _parse_mc(self):
         if self.fmt in (EmbeddedFormat.MR, EmbeddedFormat.MC):
             tmp.orientation = Orientation.VER
         for key in self.args["values"]:
-            parser = PlainParser(self.rpath)
-            parser.parse(key)
-            tmp.options.append(ChoiceOption(FText(parser)))
+            tmp.options.append(ChoiceOption(self.pool.ftext(key, self._plain(key))))
         tmp.processor = prcs.Proc.from_template("mapper", self.args)
         return tmp
 
 
+    def _plain(self, text: str):
+        def _parse():
+            parser = PlainParser(self.rpath)
+            parser.parse(text)
+            return FText(parser)
+        return _parse
+
     def _parse_sa(self):
         tmp = EntryItem(self.feeds)
         self.args["case"] = "i" if self.fmt == EmbeddedFormat.SAC else None
@@ -81,6 +98,52 @@ def _parse_num(self):
         return tmp
 
 
+    def _answers(self, text: str, pos: int) -> tuple:
+        """Raw (answer, feedback) pairs from pos to the closing brace, and
+        the position after it. The pairs are None if it is not closed.
+        """
+        answers, answer = [], None
+        for mch in self._MARKS.finditer(text, pos):
+            mark = mch[0]
+            if len(mark) == 2:      # Escaped char
+                continue
+            if mark == "#":
+                if answer is None:  # A second one is part of the feedback
+                    answer, pos = text[pos:mch.start()], mch.end()
+                continue
+            if answer is None:
+                answers.append((text[pos:mch.start()], ""))
+            else:
+                answers.append((answer, text[pos:mch.start()]))
+            answer, pos = None, mch.end()
+            if mark == "}":
+                return answers, pos
+        return None, len(text)
+
+    def _set_args(self, answers: list, grade: int):
+        self.args, self.feeds = {"values": {}}, []
+        for answer, fdb in answers:
+            if not answer and not fdb:
+                continue
+            frac = 0.0
+            if answer[:1] == "=":
+                frac = grade
+                answer = answer[1:]
+            elif answer[:1] == "%":
+                mch = self._FRACTION.match(answer)
+                if mch:
+                    frac = float(mch[1])*grade/100
+                    answer = answer[mch.end():]
+            answer = self._UNESCAPE.sub(r"\1", answer)
+            fdb = self._UNESCAPE.sub(r"\1", fdb)
+            if self.fmt == EmbeddedFormat.NUM:
+                value, _, tol = answer.partition(":")
+                value, tol = float(value), float(tol or 0)
+                answer = (value-tol, value+tol)
+            self.args["values"][answer] = {"value": frac,
+                                           "feedback": len(self.feeds)}
+            self.feeds.append(self.pool.ftext(fdb, self._plain(fdb)))
+
     def _from_cloze_text(self, data: str):
         """Return a tuple with the Marked text and the data extracted.
         """
@@ -90,36 +153,26 @@ def _from_cloze_text(self, data: str):
             name = "Cloze"
             text = data
         question = QQuestion({self.lang: name})
-        start = 0
-        for imatch in self._CLOZE_PATTERN.finditer(text):
-            self.args, self.feeds = {"values": {}}, []
-            self.fmt = EmbeddedFormat(imatch[2])
-            grade, parser = int(imatch[1]), self.OPTIONS[self.fmt]
-            for idx, opt in enumerate(imatch[3].split("~")):
-                if not opt:
-                    continue
-                tmp = opt.strip("}~").split("#")
-                if len(tmp) == 2:
-                    tmp, fdb = tmp
-                else:
-                    tmp, fdb = tmp[0], ""
-                frac = 0.0
-                if tmp[0] == "=":
-                    frac = grade
-                    tmp = tmp[1:]
-                elif tmp[0] == "%":
-                    frac, tmp = tmp[1:].split("%")
-                    frac = float(frac)*grade/100
-                feedback = FText()
-                feedback.text.append(fdb)
-                if self.fmt == EmbeddedFormat.NUM:
-                    tmp = tuple(map(float, tmp.split(":")))
-                    tmp = (tmp[0]-tmp[1], tmp[0]+tmp[1])
-                self.args["values"][tmp] = {"value": frac, "feedback": idx}
-                self.feeds.append(feedback)
-            question.body[self.lang].text.append(text[start: imatch.start()])
-            question.body[self.lang].text.append(parser())
-            start = imatch.end()
+        start = pos = 0
+        while True:
+            head = self._HEADS.search(text, pos)
+            if head is None:
+                break
+            pos = head.end()
+            if head[2] is None:
+                continue
+            try:
+                self.fmt = EmbeddedFormat(head[2])
+            except ValueError:
+                _LOG.warning("Cloze: unknown answer type %s", head[2])
+                continue
+            answers, end = self._answers(text, pos)
+            if answers is None:     # So no later one is closed either
+                break
+            self._set_args(answers, int(head[1]) if head[1] else 1)
+            question.body[self.lang].text.append(text[start: head.start()])
+            question.body[self.lang].text.append(self.OPTIONS[self.fmt]())
+            start = pos = end
         question.body[self.lang].text.append(text[start:])
         return question
 
@@ -157,17 +210,25 @@ def _get_format(item: ChoiceItem|EntryItem):
     return fmt
 
 
+def _escape(text: str) -> str:
+    text = _SPECIAL.sub(r"\\\g<0>", text)
+    return "\\" + text if text[:1] in ("=", "%") else text
+
+
 def _get_options(item: ChoiceItem|EntryItem, grade: float, fmt: EmbeddedFormat):
     def to_item(key, value):
         feed = item.feedbacks[value['feedback']] if 'feedback' in value else FText()
+        feed = _escape(feed.get())
         if fmt == EmbeddedFormat.NUM:
             key = f"{sum(key)/2}:{round((key[1] - key[0])/2, 4)}"
+        else:
+            key = _escape(key)
         if value["value"] == grade:
-            return f"~={key}#{feed.get()}"
+            return f"~={key}#{feed}"
         if value["value"] == 0:
-            return f"~{key}#{feed.get()}"
+            return f"~{key}#{feed}"
         tmp = int(value['value']/grade*100)
-        return f"~%{tmp}%{key}#{feed.get()}"
+        return f"~%{tmp}%{key}#{feed}"
     text = ""
     if isinstance(item, EntryItem):
         for key, value in item.processor.args["values"].items():
@@ -184,7 +245,7 @@ def _to_cloze_text(buffer, qst: QQuestion, embedded_name: bool, lang: Language):
     """
     if embedded_name:
         buffer.write(qst.name[lang] + "\n")
-    for item in qst.body[lang].text:
+    for item in qst.body[lang]:
         if isinstance(item, str):
             buffer.write(item)
         elif isinstance(item, (ChoiceItem, EntryItem)):
@@ -198,17 +259,59 @@ def _to_cloze_text(buffer, qst: QQuestion, embedded_name: bool, lang: Language):
 # -----------------------------------------------------------------------------
 
 
-def read_cloze(cls: Type[Category], file_path: str, lang: Language,
-               multiquestion=None, embedded_name=False) -> Category:
+def _border(multiquestion: str) -> re.Pattern:
+    """Separators that overlap a previous one, like the 2nd in a run of 3
+    blank lines, are not where str.split cuts the file, so are skipped.
+    """
+    sep = multiquestion.encode("utf-8")
+    behind = "".join(f"(?<!{re.escape(sep[:num].decode('latin-1'))})"
+                     for num in range(1, len(sep))
+                     if sep[num:] == sep[:len(sep)-num])
+    return re.compile(behind.encode("latin-1") + re.escape(sep))
+
+
+def _read_chunk(args: tuple) -> list:
+    file_path, start, end, last, lang, multiquestion, embedded_name = args
+    reader = _Reader(os.path.dirname(file_path), lang, embedded_name)
+    with read_block(file_path, start, end) as buffer:
+        texts = buffer.read().split(multiquestion)
+    if not last:    # Blocks end right after a separator
+        texts.pop()
+    return [reader._from_cloze_text(text) for text in texts]
+
+
+def read_cloze(cls: Type[Category], file_path: str,
+               lang: Language = Language.EN_US,
+               multiquestion=None, embedded_name=False,
+               jobs: int = 1) -> Category:
     """_summary_
     Args:
         cls (Type[Category]): _description_
         file_path (str): _description_
         embedded (bool, optional): _description_. Defaults to False.
+        jobs (int, optional): number of worker processes. If not 1 and there
+            is a multiquestion separator, the file is split after them, and
+            the blocks are parsed in parallel. None uses all the CPUs.
     Returns:
         Category: _description_
     """
     top_quiz = cls()
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs != 1 and multiquestion is not None:
+        ranges = split_blocks(file_path, jobs * _CHUNKS_PER_JOB,
+                              _border(multiquestion))
+        chunks = [(file_path, start, end, num == len(ranges) - 1, lang,
+                   multiquestion, embedded_name)
+                  for num, (start, end) in enumerate(ranges)]
+        results = parallel_map(_read_chunk, chunks, jobs)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        for question in itertools.chain.from_iterable(results):
+            top_quiz.add_question(question)
+        _LOG.info(f"Created new Quiz instance from cloze file {file_path}")
+        return top_quiz
     reader = _Reader(os.path.dirname(file_path), lang, embedded_name)
     with open(file_path, "r", encoding="utf-8") as buffer:
         data = buffer.read()
@@ -223,25 +326,44 @@ def read_cloze(cls: Type[Category], file_path: str, lang: Language,
 
 def write_cloze(cat: Category, file_path: str, lang: Language,
                 multiquestion=None, embedded_name=False):
-    """_summary_
+    """Write the questions in a single file, separated by multiquestion, or
+    one file per question when it is None. In that case, files are named by
+    the question dbid, and saving again to the same path only rewrites the
+    questions that are dirty.
     Args:
         file_path (str): _description_
     """
-    def _to_cloze(buffer, _cat: Category, _cnt: int):
+    def _to_cloze(buffer, _cat: Category):
         for item in _cat.questions:
-            if multiquestion is not None:
-                _to_cloze_text(buffer, item, embedded_name, lang)
-                buffer.write(multiquestion)
-            else:
-                name = f"{file_path.rsplit('.', 1)[0]}__cnt.cloze"
+            _to_cloze_text(buffer, item, embedded_name, lang)
+            buffer.write(multiquestion)
+        for child in _cat:
+            _to_cloze(buffer, _cat[child])
+
+    def _to_files(_cat: Category):
+        for item in _cat.questions:
+            name = f"{stem}_{item.dbid}.cloze"
+            names.add(os.path.basename(name))
+            if not reuse or item.dirty or not os.path.isfile(name):
                 with open(name, "w", encoding="utf-8") as ofile:
                     _to_cloze_text(ofile, item, embedded_name, lang)
-                _cnt += 1
         for child in _cat:
-            _cnt = _to_cloze(buffer, _cat[child], _cnt)
-        return _cnt
+            _to_files(_cat[child])
+
     if multiquestion is not None:
         with open(file_path, "w", encoding="utf-8") as ofile:
-            _to_cloze(ofile, cat, 0)
-    else:
-        _to_cloze(None, cat, 0)
+            _to_cloze(ofile, cat)
+        return
+    cat.gen_dbids([])
+    target = os.path.abspath(file_path)
+    reuse = cat.saved_to == target
+    stem = file_path.rsplit('.', 1)[0]
+    names = set()
+    _to_files(cat)
+    if reuse:  # Remove the files of questions that are no longer there
+        folder, base = os.path.split(os.path.abspath(stem))
+        pattern = re.compile(rf"{re.escape(base)}_\d+\.cloze")
+        for name in os.listdir(folder):
+            if pattern.fullmatch(name) and name not in names:
+                os.remove(os.path.join(folder, name))
+    cat.mark_saved(target)
@@ -0,0 +1,396 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Bank stored as a folder tree, with one or more question files per folder and
+a folder per category, as teams usually keep them under version control.
+Subcategories are listed from the folders only when a category is used, and
+the questions of a folder are only parsed when its questions are. Saving
+back to the same folder rewrites only the files whose questions changed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import re
+import weakref
+from typing import Dict, List, Tuple
+
+from ..category import SERIALIZERS, Category, detect_format
+from ..question import QQuestion
+
+_LOG = logging.getLogger(__name__)
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def _digest(question: QQuestion) -> bytes:
+    return hashlib.sha1(pickle.dumps(question, pickle.HIGHEST_PROTOCOL)
+                        ).digest()
+
+
+def _flatten(cat: Category, questions: list) -> int:
+    """Add the questions of the tree to the list. Returns the number of
+    categories that hold questions.
+    """
+    questions.extend(cat.questions)
+    found = int(cat.get_size() > 0)
+    for name in cat:
+        found += _flatten(cat[name], questions)
+    return found
+
+
+class _DirCategory(Category):
+    """Category mapped to a folder. Its subcategories and questions are only
+    read from disk when first used.
+    """
+
+    def _get_questions(self):
+        if self._questions is None:
+            self._questions = self._bank.load_questions(self)
+        return self._questions
+
+    def _set_questions(self, value):
+        self._questions = value
+
+    def _get_categories(self):
+        if self._categories is None:
+            self._categories = self._bank.load_subcats(self)
+        return self._categories
+
+    def _set_categories(self, value):
+        self._categories = value
+
+    _Category__questions = property(_get_questions, _set_questions)
+    _Category__categories = property(_get_categories, _set_categories)
+
+    @property
+    def loaded(self) -> bool:
+        """If the question files of the folder were already parsed.
+        """
+        return self._questions is not None
+
+    def _in_memory(self):
+        return self._questions or (), (self._categories or {}).values()
+
+    def __getstate__(self):
+        state = {key: val for key, val in self.__dict__.items()
+                 if key not in ("_bank", "_path", "_files", "_questions",
+                                "_categories", "_dirty", "_saved_to")}
+        state["_Category__questions"] = self._get_questions()
+        state["_Category__categories"] = self._get_categories()
+        state["_Category__parent"] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self._bank = self._path = None
+        self._files = {}
+        self._questions = state.pop("_Category__questions")
+        self._categories = state.pop("_Category__categories")
+        super().__setstate__(state)
+
+
+class _Folder:
+    """Root folder of a bank and the origin of each question read from it,
+    so unchanged files are not written again.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        # Weak, so questions and categories dropped by the user are freed
+        self._sources: Dict[int, Tuple[weakref.ref, weakref.ref, str, bytes]]
+        self._sources = {}
+        self._cats: Dict[int, _DirCategory] = weakref.WeakValueDictionary()
+
+    def _new_cat(self, name: str, path: str) -> _DirCategory:
+        cat = _DirCategory.__new__(_DirCategory)
+        cat.__dict__.update(Category(name).__dict__)
+        del cat.__dict__["_Category__questions"]
+        del cat.__dict__["_Category__categories"]
+        cat._bank, cat._path, cat._files = self, path, {}
+        cat._questions = cat._categories = None
+        cat._listed = set()
+        cat._dirty = False
+        self._cats[id(cat)] = cat
+        return cat
+
+    def _source(self, question: QQuestion) -> tuple:
+        """(question, category, file name, digest) the question was last
+        read from or written to, or None.
+        """
+        item = self._sources.get(id(question))
+        if item is None or item[0]() is not question:
+            return None
+        return question, item[1](), item[2], item[3]
+
+    def _remember(self, question: QQuestion, cat: Category, name: str):
+        key = id(question)
+
+        def _drop(ref):
+            if self._sources.get(key, (None,))[0] is ref:
+                del self._sources[key]
+        self._sources[key] = (weakref.ref(question, _drop), weakref.ref(cat),
+                              name, _digest(question))
+
+    def load_tree(self) -> _DirCategory:
+        """Create the top category. Nothing else is read yet.
+        """
+        top = self._new_cat(os.path.basename(self.path), self.path)
+        top._saved_to = self.path
+        return top
+
+    def load_subcats(self, cat: _DirCategory) -> Dict[str, Category]:
+        """List the folders of a category, without reading their files.
+        """
+        cats = {}
+        with os.scandir(cat._path) as entries:
+            for entry in sorted(entries, key=lambda item: item.name):
+                if entry.is_dir() and not entry.name.startswith("."):
+                    child = self._new_cat(entry.name, entry.path)
+                    child.__dict__["_Category__parent"] = cat
+                    cats[entry.name] = child
+        cat._listed = set(cats)
+        return cats
+
+    def load_questions(self, cat: _DirCategory) -> List[QQuestion]:
+        """Parse the question files of a category. Files with an unknown
+        format are skipped. Categories inside a file are flattened, so such
+        files can not be written back (see <code>save</code>).
+        """
+        questions = []
+        with os.scandir(cat._path) as entries:
+            files = sorted((entry.name for entry in entries if
+                            entry.is_file() and not entry.name.startswith(".")))
+        for name in files:
+            path = os.path.join(cat._path, name)
+            fmt = detect_format(path)
+            if fmt is None:
+                _LOG.debug("Skipped %s, format not known.", path)
+                continue
+            try:
+                parsed = getattr(Category, SERIALIZERS[fmt][0])(path)
+            except Exception as err:  # pylint: disable=W0703
+                _LOG.error("Failed to parse file %s: %s", path, err)
+                continue
+            items = []
+            nested = _flatten(parsed, items) > 1
+            for question in items:
+                question._set_parent(cat)
+                question.mark_saved()
+                self._remember(question, cat, name)
+            cat._files[name] = (fmt, items, nested)
+            questions.extend(items)
+        return questions
+
+    def _new_name(self, cat: Category, path: str, question: QQuestion,
+                  ext: str) -> str:
+        title = next(iter(question.name.values()), "") if question.name \
+            else ""
+        stem = _UNSAFE.sub("_", str(title))[:60].strip("_.") or "question"
+        name, idx = f"{stem}.{ext}", 1
+        files = getattr(cat, "_files", {})
+        while name in files or os.path.exists(os.path.join(path, name)):
+            name, idx = f"{stem}_{idx}.{ext}", idx + 1
+        return name
+
+    def _write_file(self, cat: Category, path: str, name: str, fmt: str,
+                    questions: List[QQuestion]):
+        tmp = Category(cat.name)
+        tmp._Category__questions.extend(questions)
+        getattr(tmp, SERIALIZERS[fmt][1])(os.path.join(path, name))
+        for question in questions:
+            question.mark_saved()
+            self._remember(question, cat, name)
+        if isinstance(cat, _DirCategory) and cat._bank is self:
+            cat._files[name] = (fmt, list(questions), False)
+
+    def _groups(self, cat: Category) -> Tuple[Dict[str, List[QQuestion]],
+                                              List[QQuestion]]:
+        """Questions of the category by the file they were read from, and
+        the ones that are new to it.
+        """
+        groups: Dict[str, List[QQuestion]] = {}
+        new = []
+        for question in cat.questions:
+            source = self._source(question)
+            if source is not None and source[1] is cat:
+                groups.setdefault(source[2], []).append(question)
+            else:
+                new.append(question)
+        return groups, new
+
+    def _same(self, current: List[QQuestion], old: List[QQuestion]) -> bool:
+        return len(current) == len(old) and all(
+            a is b and self._source(a)[3] == _digest(a)
+            for a, b in zip(current, old))
+
+    def _check_nested(self, cat: _DirCategory):
+        """Refuse to save changes to files that hold several categories,
+        since they were flattened when read.
+        """
+        groups, _ = self._groups(cat)
+        for name, (_, old, nested) in cat._files.items():
+            if nested and not self._same(groups.get(name, []), old):
+                raise ValueError(f"{os.path.join(cat._path, name)} holds "
+                                 "several categories and can not be written"
+                                 " back. Split it into one file per folder.")
+
+    def _save_questions(self, cat: Category, path: str, fmt: str) -> int:
+        groups, new = self._groups(cat)
+        written = 0
+        for name, (old_fmt, old, _) in list(getattr(cat, "_files", {}
+                                                    ).items()):
+            current = groups.get(name, [])
+            if self._same(current, old):
+                continue
+            if not current:
+                os.remove(os.path.join(path, name))
+                del cat._files[name]
+            elif SERIALIZERS[old_fmt][1] is not None and \
+                    hasattr(Category, SERIALIZERS[old_fmt][1]):
+                self._write_file(cat, path, name, old_fmt, current)
+            else:  # Format can be read but not written, so convert it
+                os.remove(os.path.join(path, name))
+                del cat._files[name]
+                new.extend(current)
+                continue
+            written += 1
+        for question in new:
+            name = self._new_name(cat, path, question, SERIALIZERS[fmt][2])
+            self._write_file(cat, path, name, fmt, [question])
+            written += 1
+        return written
+
+    def save(self, top: Category, fmt: str):
+        """Write the tree to the folder. Categories are moved or removed
+        first, then only the changed question files are written. Nothing is
+        written if a changed file holds several categories.
+        """
+        live: List[Tuple[Category, str]] = []
+        stack = [(top, self.path)]
+        while stack:
+            cat, path = stack.pop()
+            live.append((cat, path))
+            mine = isinstance(cat, _DirCategory) and cat._bank is self
+            if mine and cat.loaded:
+                self._check_nested(cat)
+            if not mine or cat._categories is not None:
+                for name in cat:
+                    stack.append((cat[name], os.path.join(path, name)))
+        alive = {id(cat) for cat, _ in live}
+        for cat in list(self._cats.values()):  # Removed, but still in use
+            if id(cat) not in alive and cat._bank is self:
+                self._detach(cat, alive)
+        mine = [(cat, path) for cat, path in live if
+                isinstance(cat, _DirCategory) and cat._bank is self]
+        for cat, path in mine:  # Parents come before their children
+            if cat._path != path:
+                os.rename(cat._path, path)
+                self._moved(cat, cat._path, path)
+        owned = {path for _, path in mine}
+        for cat, path in mine:  # Folders of the categories removed
+            if cat._categories is not None:
+                for name in cat._listed:
+                    if os.path.join(path, name) not in owned:
+                        self._remove_folder(os.path.join(path, name), owned)
+        written = 0
+        for cat, path in live:
+            os.makedirs(path, exist_ok=True)
+            if not isinstance(cat, _DirCategory) or cat._bank is not self \
+                    or cat.loaded:
+                written += self._save_questions(cat, path, fmt)
+            if isinstance(cat, _DirCategory) and cat._bank is self and \
+                    cat._categories is not None:
+                cat._listed = set(cat._categories)
+        top.mark_saved(self.path)
+        _LOG.debug("Wrote %s files to %s.", written, self.path)
+
+    def _detach(self, cat: _DirCategory, alive: set):
+        """Read what is left of a removed category, so it still works once
+        its folder is gone. Subcategories moved to the tree are kept.
+        """
+        stack = [cat]
+        while stack:
+            item = stack.pop()
+            item._get_questions()
+            stack.extend(child for child in item._get_categories().values()
+                         if isinstance(child, _DirCategory) and
+                         child._bank is self and id(child) not in alive)
+            item._bank = None
+            del self._cats[id(item)]
+
+    @staticmethod
+    def _remove_folder(path: str, owned: set):
+        """Remove the question files of a folder and of its subfolders, that
+        is, the files the bank reads. Other files, like images and notes,
+        are kept, and so are the folders that still hold them. Subfolders
+        in <code>owned</code> belong to live categories and are skipped.
+        """
+        if not os.path.isdir(path):
+            return
+        owned = [item for item in owned if item.startswith(path + os.sep)]
+        for root, folders, files in os.walk(path, topdown=False):
+            if any(root == item or root.startswith(item + os.sep)
+                   for item in owned):
+                continue
+            for name in files:
+                if not name.startswith(".") and \
+                        detect_format(os.path.join(root, name)) is not None:
+                    os.remove(os.path.join(root, name))
+            for name in folders:
+                if not os.listdir(os.path.join(root, name)):
+                    os.rmdir(os.path.join(root, name))
+        if os.listdir(path):
+            _LOG.info("Kept %s, it has files that are not questions.", path)
+        else:
+            os.rmdir(path)
+
+    def _moved(self, cat: _DirCategory, old: str, new: str):
+        stack = [cat]
+        while stack:
+            item = stack.pop()
+            item._path = new + item._path[len(old):]
+            if item._categories is not None:
+                stack.extend(child for child in item._categories.values()
+                             if isinstance(child, _DirCategory) and
+                             child._bank is self)
+
+
+# -----------------------------------------------------------------------------
+
+
+def read_folder(cls, folder: str) -> "Category":
+    """Open a bank stored as a folder tree. Nothing is parsed until used.
+    """
+    if not os.path.isdir(folder):
+        raise ValueError(f"Folder {folder} does not exist")
+    return _Folder(folder).load_tree()
+
+
+def write_folder(self: "Category", folder: str, fmt: str = "JSON"):
+    """Save the category as a folder tree. If it was opened from the same
+    folder, only the changed files are written. New questions are written
+    one per file in the format <i>fmt</i>, a key of SERIALIZERS.
+    """
+    bank = getattr(self, "_bank", None)
+    if not isinstance(bank, _Folder) or \
+            bank.path != os.path.abspath(folder):
+        if os.path.isdir(folder) and os.listdir(folder):
+            raise ValueError(f"Folder {folder} is not empty")
+        bank = _Folder(folder)
+    bank.save(self, fmt)
@@ -17,72 +17,155 @@
 ## Description
 
 """
+import functools
+import html
+import itertools
 import logging
+import mmap
 import os
 import re
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, Iterator
 
-from ..answer import (ChoiceItem, ChoiceOption, EntryItem, MatchItem,
+from ..answer import (ChoiceItem, ChoiceOption, EntryItem, Item, MatchItem,
                       MatchOption, TextItem)
 from ..enums import Language, TextFormat
 from ..processors import Proc
 from ..question import QQuestion
-from ..utils import gen_hier
-from .text import FText, PlainParser, XHTMLParser
+from ..utils import (File, QFilter, gen_hier, parallel_map, read_block,
+                     split_blocks)
+from .text import (FText, FTextPool, LinkRef, PlainParser, XHTMLParser,
+                   XItem)
 
 if TYPE_CHECKING:
     from ..category import Category
 _LOG = logging.getLogger(__name__)
 
 
+# The backslash goes first, so the ones added are not escaped again
+_ESCAPES = (("\\", "\\\\"), ("\n", "\\n"), (":", "\\:"), ("~", "\\~"),
+            ("=", "\\="), ("#", "\\#"), ("{", "\\{"), ("}", "\\}"))
+_SPECIAL = re.compile(r"[\\\n:~=#{}]")
+_UNESCAPE = re.compile(r"\\([\\:~=#{}n])")
+
+
 def _unescape(data: str) -> str:
-    for repl in (("\\:", ":"), ("\\~", "~"), ("\\=", "="), ("\\#", "#"), 
-                 ("\\{", "{"), ("\\}", "}")):
-        data = data.replace(*repl)
-    return data
+    return _UNESCAPE.sub(lambda mch: "\n" if mch[1] == "n" else mch[1], data)
+
 
 def _escape(data: str) -> str:
-    for repl in ((":", "\\:"), ("~", "\\~"), ("=", "\\="), ("#", "\\#"), 
-                 ("{", "\\{"), ("}", "\\}")):
-        data = data.replace(*repl)
+    """Most texts have nothing to escape, so they are only searched once.
+    Otherwise, str.replace is still faster than str.translate or re.sub
+    with a callback for the long HTML texts.
+    """
+    if _SPECIAL.search(data) is None:
+        return data
+    for char, repl in _ESCAPES:
+        if char in data:
+            data = data.replace(char, repl)
     return data
 
 
+def _attrs(attrs: list) -> list:
+    return [(key.rstrip("\\"), val if val is None else _unescape(val))
+            for key, val in attrs]
+
+
+class GiftPlainParser(PlainParser):
+
+    def parse(self, data: str):
+        super().parse(data)
+        self.ftext = [_unescape(text) for text in self.ftext]
+
+
 class GiftXHTMLParser(XHTMLParser):
+    """Attributes are written as key\\="value" in GIFT, with the value
+    escaped as well.
+    """
 
     def handle_startendtag(self, tag: str, attrs: list):
-        for idx, (key, val) in enumerate(attrs):
-            attrs[idx] = (key[:-1], val)
-        super().handle_startendtag(tag,attrs)
+        super().handle_startendtag(tag, _attrs(attrs))
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if tag in self.AUTOCLOSE:
+            return self.handle_startendtag(tag, attrs)
+        return super().handle_starttag(tag, _attrs(attrs))
 
     def handle_data(self, data: str):
         return super().handle_data(_unescape(data))
 
 
+@functools.lru_cache(maxsize=None)
+def _stops(chars: str) -> re.Pattern:
+    return re.compile(rf"\\[\s\S]|[{re.escape(chars)}]")
+
+
+# Escaped pairs are matched too, so the escaped char is never a stop
+_ITEM_STOPS = re.compile(r"\\([\s\S])|####|[=~}]")
+_NAME_STOPS = re.compile(r"\\[\s\S]|::")
+_BLOCK_STOPS = re.compile(r"\\[\s\S]?|\{")
+_ATTR_RGX = re.compile(r"\[(.+?)\]")
+_POOL_LIMIT = 1024
+_CHUNKS_PER_JOB = 4
+_WRITE_BUFFER = 1 << 20
+
+
 class _Reader:
 
-    PARSER = {TextFormat.PLAIN: PlainParser, TextFormat.HTML: GiftXHTMLParser}
+    PARSER = {TextFormat.PLAIN: GiftPlainParser,
+              TextFormat.HTML: GiftXHTMLParser}
     NUM_RGX = re.compile(r"=(%\d+%)?([.0-9-]+)(:|(?:\.\.))([.0-9-]+)")
-    ANY_RGX = re.compile(r"([=~])(%\d+%)?(.+)")
+    ANY_RGX = re.compile(r"([=~])(%-?\d+%)?(.+)")
     MTCH_RGX = re.compile(r"(.*?)(?<!\\) -> (.*)")
 
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, pool: FTextPool = None) -> None:
         self._pos = 0
         self._scp = False
         self._str = ""
         self._qst = self._lng = self._fmt = None
         self._rpath = path.replace("\\", "/")
+        self._pool = FTextPool() if pool is None else pool
 
     def _nxt(self):
         self._scp = (self._str[self._pos] == "\\") and not self._scp
         self._pos += 1
 
     def _next(self, comp: list) -> str:
+        """Moves to the next unescaped marker of comp, all single chars, and
+        returns the text skipped, starting at the current position.
+        """
         start = self._pos
         self._pos += 1
-        while not any(self._str[self._pos:self._pos+len(x)] == x for x in comp) or self._scp:
-            self._nxt()
-        return self._str[start:self._pos]
+        if self._scp:       # The char skipped escaped the next one
+            self._pos += 1
+            self._scp = False
+        for match in _stops("".join(comp)).finditer(self._str, self._pos):
+            if match.end() - match.start() == 1:
+                self._pos = match.start()
+                return self._str[start:self._pos]
+        raise IndexError(f"GIFT: none of {comp} found after {start}")
+
+    def _skip(self):
+        """Moves past misplaced text in a block, to the next marker.
+        """
+        start = self._pos
+        self._nxt()
+        pos = self._pos
+        if self._scp and not self._str.startswith("####", pos):
+            pos += 1            # Escaped, but "####" is a marker anyway
+            self._scp = False
+        if not self._scp:
+            for match in _ITEM_STOPS.finditer(self._str, pos):
+                if match[1] is None:
+                    pos = match.start()
+                    break
+                if self._str.startswith("####", match.start(1)):
+                    pos, self._scp = match.start(1), True
+                    break
+            else:
+                raise IndexError("GIFT: block is not closed")
+        self._pos = pos
+        _LOG.info("GIFT: Text may be incorrectly placed: %s",
+                  self._str[start:pos])
 
     def _handle_item(self):
         all_equals, options = True, []
@@ -97,16 +180,16 @@ def _handle_item(self):
                 else:
                     frac = 100
                 if self._str[self._pos] == "#" and self._str[self._pos:self._pos+4] != "####":
-                    fdbk = FText(self._parse_text(self._next(["=", "~", "#", "}"]).strip()))
+                    fdbk = self._next(["=", "~", "#", "}"])[1:]
+                    fdbk = self._ftext(fdbk.strip())
                 else:
                     fdbk = None
                 options.append((frac, mch[3].strip(), fdbk))
             elif self._str[self._pos:self._pos+4] == "####":
-                feedback = self._parse_text(self._next(["}"])[4:])
-                self._qst.feedback[self._lng].append(FText(feedback))
+                feedback = self._ftext(self._next(["}"])[4:])
+                self._qst.feedback[self._lng].append(feedback)
             else:
-                _LOG.info("GIFT: Char may be incorrectly placed: %s", self._str[self._pos])
-                self._nxt()
+                self._skip()
         return options, all_equals
 
     def _set_value_tolerance(self, mtype: str, val: str, tol: str):
@@ -121,6 +204,10 @@ def _parse_text(self, text: str):
         parser.parse(text)
         return parser
 
+    def _ftext(self, text: str) -> FText:
+        return self._pool.ftext((self._fmt, text),
+                                lambda: FText(self._parse_text(text)))
+
     def _from_qessay(self):
         self._qst.body[self._lng].text.append(TextItem())
 
@@ -130,18 +217,19 @@ def _from_qtruefalse(self):
             args["values"][0]["value"] = 100
         else:
             args["values"][1]["value"] = 100
+        for value in args["values"].values():
+            if self._str[self._pos] == "}" or \
+                    self._str.startswith("####", self._pos):
+                break
+            value["feedback"] = len(feeds)
+            feeds.append(self._ftext(self._next(("}", "#"))[1:]))
         if self._str[self._pos] != "}":
-            args["values"][0]["feedback"] = len(feeds)
-            feeds.append(FText(self._parse_text(self._next(("}", "#")))))
-        if self._str[self._pos] != "}":
-            args["values"][1]["feedback"] = len(feeds)
-            feeds.append(FText(self._parse_text(self._next(("}", "#")))))
-        if self._str[self._pos] != "}":
-            txt = FText(self._parse_text(self._next(("}",))[3:]))
+            txt = self._ftext(self._next(("}",))[4:])
             self._qst.feedback[self._lng].append(txt)
         item = ChoiceItem(feeds, Proc.from_template("mapper", args))
-        item.options.append(ChoiceOption(FText("True")))
-        item.options.append(ChoiceOption(FText("False")))
+        for text in ("True", "False"):
+            opt = self._pool.ftext(text, lambda text=text: FText(text))
+            item.options.append(ChoiceOption(opt))
         self._qst.body[self._lng].text.append(item)
 
     def _from_qnumerical(self):
@@ -156,7 +244,7 @@ def _from_qnumerical(self):
             while self._str[self._pos] != "}" and not self._scp:
                 if self._str[self._pos:self._pos+4] == "####":
                     txt = self._next(("=", "~", "}"))
-                    self._qst.feedback[self._lng].append(FText(self._parse_text(txt[4:])))
+                    self._qst.feedback[self._lng].append(self._ftext(txt[4:]))
                 else:
                     txt = self._next(("#", "=", "~", "}"))
                     if txt[0] in "~":
@@ -168,14 +256,14 @@ def _from_qnumerical(self):
                     arg = {"tol": tol, "grade": frac, "value": val}
                     if self._str[self._pos] == "#" and self._str[self._pos+1] != "#":
                         txt = self._next(("=", "~", "}", "#"))
-                        feeds.append(FText(self._parse_text(txt[1:])))
+                        feeds.append(self._ftext(txt[1:]))
                         arg["feedback"] = len(feeds)-1
                     args["values"].append(arg)
         item = EntryItem(feeds, Proc.from_template("numeric_value", args))
         self._qst.body[self._lng].text.append(item)
         
     def _from_match_opt(self, string: str, setx: list):
-        opt = MatchOption(FText(self._parse_text(string)))
+        opt = MatchOption(self._ftext(string))
         opt.match_max = 1
         setx.append(opt)
 
@@ -198,7 +286,7 @@ def _from_qshortanswer(self, options: list):
             if fdbk:
                 tmp["feedback"] = len(feeds)
                 feeds.append(fdbk)
-            args["values"][val] = tmp
+            args["values"][_unescape(val)] = tmp
         item = EntryItem(feeds, Proc.from_template("mapper", args))
         self._qst.body[self._lng].text.append(item)
 
@@ -207,7 +295,7 @@ def _from_qmultichoice(self, options: list):
         item.max_choices = 1
         args = {"values": {}}
         for idx, (frac, val, fdbk) in enumerate(options):
-            item.options.append(ChoiceOption(FText(self._parse_text(val.strip()))))
+            item.options.append(ChoiceOption(self._ftext(val.strip())))
             args["values"][idx] = {"value": frac, "feedback": len(item.feedbacks)}
             item.feedbacks.append(fdbk)
         item.processor = Proc.from_template("mapper", args)
@@ -235,27 +323,37 @@ def _from_block(self):
             self._from_qmultichoice(options)
 
     def get(self):
-        """Was initially using regex, but it does not handle escaped char in
-        every situation so I prefered implementing a char parse.
+        """Markers are found with compiled patterns that also match the
+        escaped pairs, so an escaped char is never taken as a marker.
         """
         name = "default"
         cformat = TextFormat.PLAIN
         if self._str[:2] == "::":
-            self._pos = 3
-            while self._str[self._pos:self._pos+2] != "::" or self._scp:
-                self._nxt()
+            for match in _NAME_STOPS.finditer(self._str, 3):
+                if match[0] == "::":
+                    self._pos = match.start()
+                    break
+            else:
+                raise IndexError("GIFT: question name is not closed")
             name = self._str[2:self._pos].replace("\\", "")
             self._pos += 2
         if self._str[self._pos] == "[":  # The types are limited, so we can consider
             self._pos += 1               # that if any '\' appears, it should be an
             start = self._pos            # error anyway.
-            while self._str[self._pos] != "]":
-                self._pos += 1
-            cformat = TextFormat(self._str[start:self._pos])
-            self._nxt()
+            end = self._str.find("]", start)
+            if end == -1:
+                raise IndexError("GIFT: text format is not closed")
+            cformat = TextFormat(self._str[start:end])
+            self._pos = end + 1
         start = self._pos
-        while self._pos < len(self._str) and self._str[self._pos] != "{" or self._scp:
-            self._nxt()
+        for match in _BLOCK_STOPS.finditer(self._str, start):
+            if match[0] == "{":
+                self._pos = match.start()
+                break
+            if match[0] == "\\":     # Escapes the end of the question
+                raise IndexError("GIFT: question ends with an escape")
+        else:
+            self._pos = len(self._str)
         lang = self._attr.get("lang", Language.EN_US)
         question = QQuestion({lang: name}, self._attr.get("id"), 
                              self._attr.get("tags"))
@@ -277,46 +375,395 @@ def reset(self, data: str, attrs: dict) -> None:
 # -----------------------------------------------------------------------------
 
 
-def read_gift(cls, file_path: str, comment=None) -> "Category":
+def _number(value: float) -> str:
+    return f"{float(value):.12f}".rstrip("0").rstrip(".")
+
+
+class _Writer:
+    """Builds the GIFT text of each question, in a single line per answer.
+    Texts are written in HTML if any of them has markup.
     """
+
+    def __init__(self, rpath: str, lang: Language = None):
+        self._rpath = rpath
+        self._lang = lang
+        self._html = False
+
+    def _path(self, file: File) -> str:
+        if "://" in file.path:
+            return file.path
+        return "@@PLUGINFILE@@/" + os.path.relpath(file.path, self._rpath)
+
+    def _markup(self, item) -> str:
+        if isinstance(item, str):
+            return html.escape(item, False)
+        attrs = dict(item.attrs or {})
+        if isinstance(item, LinkRef) and item.file is not None:
+            attrs.setdefault("href" if item.tag == "a" else "src",
+                             self._path(item.file))
+        text = "".join(f" {key}" if val is None else
+                       f" {key}=\"{html.escape(str(val))}\""
+                       for key, val in attrs.items())
+        if isinstance(item, XItem) and item._children is None or \
+                item.tag in XHTMLParser.AUTOCLOSE:
+            return f"<{item.tag}{text}/>"
+        if isinstance(item, LinkRef):
+            return f"<{item.tag}{text}></{item.tag}>"
+        children = "".join(map(self._markup, item))
+        return f"<{item.tag}{text}>{children}</{item.tag}>"
+
+    def _item(self, item) -> str:
+        if isinstance(item, str):
+            return _escape(html.escape(item, False) if self._html else item)
+        if isinstance(item, (XItem, LinkRef)):
+            return _escape(self._markup(item))
+        return _escape(str(item))
+
+    def _text(self, ftext: FText) -> str:
+        return "" if ftext is None else "".join(map(self._item, ftext))
+
+    def _feedback(self, item: Item, value: dict) -> str:
+        idx = value.get("feedback")
+        if idx is None or item.feedbacks[idx] is None:
+            return ""
+        return "#" + self._text(item.feedbacks[idx])
+
+    def _from_truefalse(self, item: ChoiceItem, values: dict) -> str:
+        text = ["T" if values[0]["value"] == 100 else "F"]
+        feeds = [values[0].get("feedback"), values[1].get("feedback")]
+        while feeds and feeds[-1] is None:
+            feeds.pop()
+        for idx in feeds:
+            text.append("#")
+            if idx is not None:
+                text.append(self._text(item.feedbacks[idx]))
+        return "".join(text)
+
+    def _from_choice(self, item: ChoiceItem) -> str:
+        values = item.processor.args["values"]
+        if [self._text(opt.text) for opt in item.options] == ["True", "False"]:
+            return self._from_truefalse(item, values)
+        text = []
+        for idx, opt in enumerate(item.options):
+            value = values.get(idx, {"value": 0})
+            frac = value["value"]
+            mark = "=" if frac == 100 else "~" if frac == 0 else \
+                   f"~%{round(frac)}%"
+            text.append(f"\n\t{mark}{self._text(opt.text)}"
+                        f"{self._feedback(item, value)}")
+        return "".join(text)
+
+    def _from_entry(self, item: EntryItem) -> str:
+        text = []
+        for key, value in item.processor.args["values"].items():
+            frac = value["value"]
+            mark = "=" if frac == 100 else f"=%{round(frac)}%"
+            text.append(f"\n\t{mark}{_escape(key)}"
+                        f"{self._feedback(item, value)}")
+        return "".join(text)
+
+    def _from_numeric(self, item: EntryItem) -> str:
+        text = ["#"]
+        for value in item.processor.args["values"]:
+            text.append(f"\n\t=%{round(value['grade'])}%"
+                        f"{_number(value['value'])}:{_number(value['tol'])}"
+                        f"{self._feedback(item, value)}")
+        return "".join(text)
+
+    def _from_matching(self, item: MatchItem) -> str:
+        return "".join(f"\n\t={self._text(src.text).strip()} -> "
+                       f"{self._text(dst.text)}"
+                       for src, dst in zip(item.set_from, item.set_to))
+
+    def _block(self, item: Item) -> str:
+        source = None if item.processor is None else item.processor.source
+        if isinstance(item, TextItem):
+            return ""
+        if isinstance(item, ChoiceItem) and source == "mapper":
+            return self._from_choice(item)
+        if isinstance(item, EntryItem) and source == "mapper":
+            return self._from_entry(item)
+        if isinstance(item, EntryItem) and source == "numeric_value":
+            return self._from_numeric(item)
+        if isinstance(item, MatchItem) and source == "matching":
+            return self._from_matching(item)
+        return None
+
+    def _has_markup(self, question: QQuestion, lang: Language) -> bool:
+        texts = [question.body[lang], *question.feedback[lang]]
+        for item in question.body[lang]:
+            if isinstance(item, Item):
+                texts.extend(item.feedbacks)
+            if isinstance(item, ChoiceItem):
+                texts.extend(opt.text for opt in item.options)
+            elif isinstance(item, MatchItem):
+                texts.extend(opt.text for opt in item.set_from + item.set_to)
+        return any(isinstance(val, (XItem, LinkRef)) for text in texts
+                   if text is not None for val in text)
+
+    def question(self, question: QQuestion) -> str:
+        """GIFT text of the question, ending with a blank line.
+        """
+        lang = self._lang or next(iter(question.name), None)
+        if lang not in question.body:
+            _LOG.warning("GIFT: %s has no text in %s", question, lang)
+            return ""
+        self._html = self._has_markup(question, lang)
+        attrs = []
+        if isinstance(question.dbid, int):
+            attrs.append(f"[id:{question.dbid}]")
+        if question.tags:
+            attrs.append(f"[tags:{' '.join(question.tags)}]")
+        if lang != Language.EN_US:
+            attrs.append(f"[lang:{lang.value}]")
+        text = [f"// {' '.join(attrs)}\n"] if attrs else []
+        if question.name.get(lang):
+            text.append(f"::{_escape(question.name[lang])}::")
+        if self._html:
+            text.append("[html]")
+        block = None
+        for item in question.body[lang]:
+            if not isinstance(item, Item):
+                text.append(self._item(item))
+            elif block is not None:
+                _LOG.warning("GIFT: only one answer block per question, "
+                             "%s was not written", item)
+            else:
+                block = self._block(item)
+                if block is None:
+                    _LOG.warning("GIFT: %s can not be written", item)
+                    continue
+                text.extend(("{", block))
+                for feedback in question.feedback[lang]:
+                    text.append(f"\n\t####{self._text(feedback)}")
+                text.append("\n}")
+        text.append("\n\n")
+        return "".join(text)
+
+    def write(self, write: Callable[[str], int], cat: "Category", path: str):
+        """Writes the questions of the category and its subcategories.
+        """
+        questions = list(cat.questions)
+        if questions or not len(cat):
+            write(f"$CATEGORY: {path}\n\n")
+        for question in questions:
+            write(self.question(question))
+        for name in cat:
+            self.write(write, cat[name], f"{path}/{name}")
+
+
+# -----------------------------------------------------------------------------
+
+
+def _iter_gift(ifile, rpath: str, pool: FTextPool, qfilter: QFilter = None,
+               path: str = None) -> Iterator[tuple]:
+    parser = _Reader(rpath, pool)
+    attrs = {}
+    for line in ifile:
+        tmp = line.strip()
+        if not tmp or tmp[:2] == "//":
+            attrs.clear()
+            for match in _ATTR_RGX.findall(tmp):
+                if match[:5] == "tags:":
+                    attrs["tags"] = pool.tags(match[5:].split())
+                elif match[:3] == "id:":
+                    attrs["id"] = int(match[3:])
+                elif match[:5] == "lang:":
+                    try:
+                        attrs["lang"] = Language(match[5:])
+                    except:
+                        _LOG.error("GIFT: Language is not valid")
+            continue
+        if tmp[:10] == "$CATEGORY:":
+            path = tmp[10:].strip()
+            yield path, None
+            continue
+        lines = [tmp]
+        for line in ifile:
+            lines.append(line.strip())
+            if line == "\n":
+                break
+        text = "".join(lines)
+        if qfilter is None or qfilter.accepts(path, _hint(text),
+                                              attrs.get("tags"),
+                                              attrs.get("id")):
+            parser.reset(text, attrs)
+            yield path, parser.get()
+        attrs = {}      # The blank line after it was already consumed
+
+
+def iter_gift(file_path: str, pool: FTextPool = None,
+              filter: QFilter = None) -> Iterator[tuple]:
+    """Reads a GIFT file one question at a time, so only the question being
+    parsed is kept in memory.
+    Args:
+        file_path (str): path of the GIFT file.
+        pool (FTextPool, optional): pool shared by the questions read. By
+            default, one limited to the last _POOL_LIMIT fragments.
+        filter (QFilter, optional): questions to read. The others are
+            skipped before being parsed.
+    Returns:
+        Iterator[tuple]: (category path, question) pairs, in file order. The
+            path is None until a $CATEGORY is found. Each $CATEGORY also
+            yields its path with None, so empty categories are not lost.
+    """
+    if pool is None:
+        pool = FTextPool(limit=_POOL_LIMIT)
+    with open(file_path, "r", encoding="utf-8") as ifile:
+        yield from _iter_gift(ifile, os.path.dirname(file_path), pool, filter)
+
+
+def _category_at(file_path: str, start: int) -> str:
+    """Category in effect at a byte of the file, from the last $CATEGORY
+    line before it.
+    """
+    with open(file_path, "rb") as ifile, \
+            mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        pos = start
+        while True:
+            pos = data.rfind(b"$CATEGORY:", 0, pos)
+            if pos == -1:
+                return None
+            if not data[data.rfind(b"\n", 0, pos) + 1:pos].strip():
+                end = data.find(b"\n", pos)
+                end = len(data) if end == -1 else end
+                return data[pos + 10:end].strip().decode("utf-8")
+
+
+def _read_chunk(args: tuple) -> list:
+    file_path, start, end, qfilter = args
+    path = None
+    if start and qfilter is not None and qfilter.path is not None:
+        path = _category_at(file_path, start)
+    with read_block(file_path, start, end) as ifile:
+        return list(_iter_gift(ifile, os.path.dirname(file_path),
+                               FTextPool(), qfilter, path))
+
+
+def read_gift(cls, file_path: str, comment=None, jobs: int = 1,
+              filter: QFilter = None) -> "Category":
+    """Reads a GIFT file.
+    Args:
+        file_path (str): path of the GIFT file.
+        jobs (int, optional): number of worker processes. If not 1, the file
+            is split on blank lines, where questions end, and the blocks are
+            parsed in parallel. None uses all the CPUs.
+        filter (QFilter, optional): questions to read. The others are
+            skipped before being parsed, and categories not matching its
+            path are not created.
+    Returns:
+        Category: the top category.
     """
     top_quiz: "Category" = cls()
     quiz = top_quiz
-    parser = _Reader(os.path.dirname(file_path))
-    attrs = {}
-    with open(file_path, "r", encoding="utf-8") as ifile:
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        records = iter_gift(file_path, FTextPool(), filter)
+    else:
+        chunks = [(file_path, start, end, filter) for start, end in
+                  split_blocks(file_path, jobs * _CHUNKS_PER_JOB)]
+        results = parallel_map(_read_chunk, chunks, jobs)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        records = itertools.chain.from_iterable(results)
+    for path, question in records:  # Categories carry over block borders
+        if question is None:
+            # Questions of the categories skipped were filtered out too
+            if filter is None or filter.match_path(path):
+                quiz = gen_hier(cls, top_quiz, path)
+        else:
+            quiz.add_question(question)
+    return top_quiz
+
+
+def _hint(text: str) -> str:
+    """Question type told by the answer block, with the same rules as
+    _Reader._from_block, but without parsing it. Like the reader, the first
+    char of the block is checked as is, without skipping spaces.
+    """
+    for match in _BLOCK_STOPS.finditer(text):
+        if match[0] == "{":
+            break
+    else:
+        return "description"
+    pos = match.end()
+    if text[pos:pos+1] in ("T", "F"):
+        return "truefalse"
+    if text[pos:pos+1] == "#" and text[pos:pos+4] != "####":
+        return "numerical"
+    marks = []
+    for item in _ITEM_STOPS.finditer(text, pos):
+        if item[1] is not None:
+            continue
+        if item[0] in ("}", "####"):  # General feedback goes to the end
+            break
+        marks.append(item)
+    if not marks:
+        return "essay"
+    for item in _stops("=~#}").finditer(text, marks[0].end()):
+        if len(item[0]) == 1:
+            break
+    if " -> " in text[marks[0].end():item.start()]:
+        return "matching"
+    if all(item[0] == "=" for item in marks):
+        return "shortanswer"
+    return "multichoice"
+
+
+def _index(file_path: str) -> Iterator[tuple]:
+    """(offset, length, name, category path, type) of each question. Lines
+    are split like in _iter_gift, and the comment line right before a
+    question, that holds its attributes, is kept in its range.
+    """
+    path = head = None
+    pos = 0
+    with open(file_path, "rb") as ifile:
         for line in ifile:
+            start, pos = pos, pos + len(line)
             tmp = line.strip()
-            if not tmp or tmp[:2] == "//":
-                attrs.clear()
-                for match in re.findall("\[(.+?)\]", tmp):
-                    if match[:5] == "tags:":
-                        attrs["tags"] = match[5:].split()
-                    elif match[:3] == "id:":
-                        attrs["id"] = int(match[3:])
-                    elif match[:5] == "lang:":
-                        try:
-                            attrs["lang"] = Language(match[5:])
-                        except:
-                            _LOG.error("GIFT: Language is not valid")
+            if not tmp or tmp[:2] == b"//":
+                head = start if tmp else None
                 continue
-            if tmp[:10] == "$CATEGORY:":
-                quiz = gen_hier(cls, top_quiz, tmp[10:].strip())
+            if tmp[:10] == b"$CATEGORY:":
+                path = tmp[10:].strip().decode("utf-8")
                 continue
+            lines = [tmp]
             for line in ifile:
-                tmp += line.strip()
-                if line == "\n":
+                pos += len(line)
+                lines.append(line.strip())
+                if line in (b"\n", b"\r\n"):
                     break
-            parser.reset(tmp, attrs)
-            quiz.add_question(parser.get())
-    return top_quiz
-
-
-def write_gift(self, file_path: str) -> None:
-    """_summary_
-
+            text = b"".join(lines).decode("utf-8")
+            name = "default"
+            if text[:2] == "::":
+                for match in _NAME_STOPS.finditer(text, 3):
+                    if match[0] == "::":
+                        name = text[2:match.start()].replace("\\", "")
+                        break
+            start = start if head is None else head
+            yield start, pos - start, name, path, _hint(text)
+            head = None
+
+
+def _load(file_path: str, entry: tuple) -> QQuestion:
+    offset, length = entry[:2]
+    with read_block(file_path, offset, offset + length) as ifile:
+        records = _iter_gift(ifile, os.path.dirname(file_path), FTextPool())
+        return next(qst for _, qst in records if qst is not None)
+
+
+def write_gift(self: "Category", file_path: str, lang: Language = None):
+    """Writes the questions in GIFT, streaming them to the file. Choice,
+    entry and matching items have their processors written back as the
+    =/~/%n% answers, so the file can be read again with read_gift.
     Args:
-        file_path (str): _description_
+        file_path (str): path of the GIFT file.
+        lang (Language, optional): language of the texts written. By
+            default, the first language of each question.
     """
-    # TODO
-    raise NotImplementedError("Gift not implemented")
+    writer = _Writer(os.path.dirname(os.path.abspath(file_path)), lang)
+    with open(file_path, "w", encoding="utf-8",
+              buffering=_WRITE_BUFFER) as ofile:
+        writer.write(ofile.write, self, self.name)
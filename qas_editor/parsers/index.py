@@ -0,0 +1,133 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Index of the questions of a large GIFT, Aiken or Moodle XML file. The byte
+range, name, category path and type of each question are found by a scan
+that builds no question, and kept in a sidecar file next to the source. It
+is rebuilt when the size or modification time of the source change. Single
+questions can then be loaded without parsing the rest of the file.
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import os
+from collections import Counter
+from typing import TYPE_CHECKING, Iterator, List, NamedTuple
+
+from ..category import detect_format
+
+if TYPE_CHECKING:
+    from ..question import QQuestion
+_LOG = logging.getLogger(__name__)
+
+VERSION = 1
+_SUFFIX = ".qidx"
+_MODULES = {"GIFT": "gift", "Aiken": "aiken", "Moodle": "moodle"}
+
+
+class IndexEntry(NamedTuple):
+    """A question of the source file.
+    """
+    offset: int
+    length: int
+    name: str
+    path: str
+    qtype: str
+
+
+class SourceIndex:
+    """Questions of a source file, indexed by their position in it.
+    """
+
+    def __init__(self, file_path: str, fmt: str = None, sidecar: str = None):
+        """
+        Args:
+            file_path (str): path of the source file.
+            fmt (str, optional): key of SERIALIZERS. Detected by default.
+            sidecar (str, optional): path of the index file. By default, the
+                source path with a .qidx suffix.
+        """
+        if fmt is None:
+            fmt = detect_format(file_path)
+        if fmt not in _MODULES:
+            raise ValueError(f"Format {fmt} of {file_path} can not be indexed")
+        self.file_path = file_path
+        self.format = fmt
+        self.sidecar = sidecar or f"{file_path}{_SUFFIX}"
+        self._module = importlib.import_module(f".{_MODULES[fmt]}",
+                                               __package__)
+        stat = os.stat(file_path)
+        self._source = [stat.st_size, stat.st_mtime_ns]
+        self.entries = self._read()
+        self.rebuilt = self.entries is None
+        if self.rebuilt:
+            self.entries = [IndexEntry(*item) for item in
+                            self._module._index(file_path)]
+            self._write()
+
+    def __getitem__(self, num: int) -> IndexEntry:
+        return self.entries[num]
+
+    def __iter__(self) -> Iterator[IndexEntry]:
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _read(self) -> List[IndexEntry]:
+        try:
+            with open(self.sidecar, "rb") as ifile:
+                data = json.load(ifile)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("qas-index") != VERSION \
+                or data.get("format") != self.format \
+                or data.get("source") != self._source:
+            return None
+        return [IndexEntry(*item) for item in data["entries"]]
+
+    def _write(self):
+        data = {"qas-index": VERSION, "format": self.format,
+                "source": self._source, "entries": self.entries}
+        try:
+            with open(self.sidecar, "w", encoding="utf-8") as ofile:
+                json.dump(data, ofile, ensure_ascii=False,
+                          separators=(",", ":"))
+        except OSError as err:
+            _LOG.warning("Could not save the index of %s: %s",
+                         self.file_path, err)
+
+    def names(self) -> List[str]:
+        """Names of the questions, in file order.
+        """
+        return [entry.name for entry in self.entries]
+
+    def stats(self) -> dict:
+        """Number of questions, and of questions per type and per category
+        path, from the index alone.
+        """
+        return {"questions": len(self.entries),
+                "types": dict(Counter(item.qtype for item in self.entries)),
+                "categories": dict(Counter(item.path for item in self.entries))}
+
+    def load(self, num: int) -> QQuestion:
+        """Parse a single question, reading only its bytes from the source.
+        """
+        return self._module._load(self.file_path, self.entries[num])
@@ -17,12 +17,22 @@
 ## Description
 
 """
+import contextlib
+import functools
+import io
+import itertools
 import logging
+import mmap
 import os
+import re
+import sys
+import tarfile
 import zipfile
 from importlib import util
-from typing import TYPE_CHECKING, List
+from typing import (TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterator,
+                    List, Tuple)
 from xml.etree import ElementTree as et
+from xml.parsers import expat
 
 from ..answer import (ACalculated, Answer, ANumerical, DragGroup, DragImage,
                       DragItem, DropZone, SelectOption, Subquestion)
@@ -33,17 +43,23 @@
                         QDaDText, QEmbedded, QEssay, QMatching, QMissingWord,
                         QMultichoice, QNumerical, QProblem, QRandomMatching,
                         QShortAnswer, QTrueFalse)
-from ..utils import Dataset, File, Hint, TList, Unit, gen_hier, serialize_fxml
-from .text import FText, XHTMLParser
+from ..utils import (Dataset, File, FragmentCache, Hint, QFilter, TList, Unit,
+                     gen_hier, parallel_map, serialize_fxml)
+from .text import FText, FTextPool, XHTMLParser
 
 if TYPE_CHECKING:
     from ..category import Category, _Question
     from ..question import _QHasOptions, _QHasUnits
 EXTRAS_FORMULAE = util.find_spec("sympy") is not None
-if EXTRAS_FORMULAE:
-    from sympy.parsing.latex import parse_latex
-    from sympy.parsing.sympy_parser import parse_expr
 _LOG = logging.getLogger(__name__)
+_POOL = FTextPool()
+_WRITER_VERSION = 1     # Bump when the output changes to expire cached XML
+_WRITE_BUFFER = 1 << 20
+_MOODLE_START = re.compile(r"\{=?")
+_LATEX_START = re.compile(r"\(")
+_MOODLE_EXP = re.compile(r"\\(.)|[{}]", re.S)
+_QUESTION_START = re.compile(rb"<question[\s>]")
+_CHUNKS_PER_JOB = 4
 
 
 class MoodleXHTMLParser(XHTMLParser):
@@ -54,10 +70,6 @@ def __init__(self, rpath: str, convert_charrefs: bool = True,
         self.pos = self.lst = 0
         self.scp = False
 
-    def _nxt(self, data):
-        self.scp = (data[self.pos] == "\\") and not self.scp
-        self.pos += 1 
-
     def _wrapper(self, data: str, callback, size=1):
         if data[self.lst: self.pos]:
             self._stack[-1].append(data[self.lst: self.pos])
@@ -75,11 +87,19 @@ def handle_data(self, data: str):
             data = self._update_fileref(data)
         elif EXTRAS_FORMULAE:
             while self.pos < len(data):
-                if data[self.pos:self.pos+2] == "{=" and not self.scp:
+                # Only an escaped "(" can start a marker after an escape was
+                # left open, and only "{" otherwise. Jump to the next one.
+                match = (_LATEX_START if self.scp else _MOODLE_START).search(
+                    data, self.pos)
+                if match is None:
+                    self.pos = len(data)
+                    break
+                self.pos = match.start()
+                if self.scp:
+                    self._wrapper(data, self._get_latex_exp)  # After "\("
+                elif match.group() == "{=":
                     self._wrapper(data, self._get_moodle_exp, 2)
-                elif data[self.pos] == "(" and self.scp: 
-                    self._wrapper(data, self._get_latex_exp)  # This is correct: "\("
-                elif data[self.pos] == "{" and not self.scp:
+                else:
                     self._wrapper(data, self._get_moodle_var)
                 self.pos += 1
         if data[self.lst: self.pos]:
@@ -87,67 +107,121 @@ def handle_data(self, data: str):
 
     def _get_moodle_exp(self, data: str):
         cnt = 0
-        while data[self.pos] != "}" or cnt != 0:
-            if data[self.pos] == "{" and not self.scp:
-                cnt += 1
-            elif data[self.pos] == "}" and not self.scp:
-                cnt -= 1
-            self._nxt(data)
+        for match in _MOODLE_EXP.finditer(data, self.pos):
+            escaped = match.group(1)
+            if escaped is None:
+                if match.group() == "{":
+                    cnt += 1
+                elif cnt:
+                    cnt -= 1
+                else:
+                    self.pos = match.start()
+                    self.scp = False
+                    break
+            elif escaped == "}" and cnt == 0:  # Also ends the expression
+                self.pos = match.start(1)
+                self.scp = True
+                break
+        else:
+            raise IndexError("Expression is not closed")
         expr = data[self.lst: self.pos]
         expr = expr.replace("{","").replace("}","").replace("pi()","pi")
+        from sympy.parsing.sympy_parser import parse_expr
         return parse_expr(expr)
 
     def _get_moodle_var(self, data: str):
-        while data[self.pos] != "}":
-            self._nxt(data)
-        return parse_expr(data[self.lst: self.pos])
+        end = data.find("}", self.pos)
+        if end == -1:
+            raise IndexError("Variable is not closed")
+        name = data[self.pos: end]
+        self.scp = (len(name) - len(name.rstrip("\\"))) % 2 == 1
+        self.pos = end
+        from sympy.parsing.sympy_parser import parse_expr
+        return parse_expr(name)
 
     def _get_latex_exp(self, data: str):
-        while data[self.pos] == ")" and self.scp:  # This is correct: "\("
-            self._nxt(data)
+        if data[self.pos] == ")":  # This is correct: "\("
+            self.scp = False
+            self.pos += 1
+            if self.pos == len(data):
+                raise IndexError("Latex expression is not closed")
+        from sympy.parsing.latex import parse_latex
         return parse_latex(data[self.lst: self.pos])
 
 # -----------------------------------------------------------------------------
 
 
-def _from_xml(root: et.Element, tags: dict) -> dict:
-    if root is None:
-        return None
-    results = {}
-    for obj in root:
-        if obj.tag in tags:
-            cast_type, name, *_ = tags[obj.tag]
-            if not isinstance(cast_type, type):
-                tmp = cast_type(obj, {})
-            else:
-                tmp = obj.text.strip() if obj.text else ""
-                if not tmp:
-                    text = obj.find("text")
-                    if text is not None:
-                        tmp = text.text
-                if cast_type == bool:
-                    tmp = tmp.lower() in ["true", "1", "t", ""]
-                elif tmp or cast_type == str:
-                    tmp = cast_type(tmp)
-            if len(tags[obj.tag]) == 3 and tags[obj.tag][2]:
-                if name not in results:
-                    results[name] = []
-                results[name].append(tmp)
-            else:
-                results[name] = tmp
-                tags.pop(obj.tag)
-    for key in tags:
-        cast_type, name, *_ = tags[key]
-        if cast_type == bool:  # Some tags act like False when missing
-            results[name] = False
-    return results
+def _text_of(obj: et.Element) -> str:
+    text = obj.text.strip() if obj.text else ""
+    if not text:
+        child = obj.find("text")
+        if child is not None:
+            text = child.text
+    return text
+
+
+def _bool_of(obj: et.Element) -> bool:
+    return _text_of(obj).lower() in ("true", "1", "t", "")
+
 
+def _caster(cast) -> Callable[[et.Element], Any]:
+    if not isinstance(cast, type):
+        return cast
+    if cast is bool:
+        return _bool_of
+    if cast is str:
+        return lambda obj: str(_text_of(obj))
+    def _cast(obj: et.Element):
+        text = _text_of(obj)
+        return cast(text) if text else text
+    return _cast
 
-def _from_B64File(root: et.Element, *_):
+
+class _Schema:
+    """Decoder of the children of an element, compiled once at import. Maps
+    each child tag to a converter and the name of the argument it sets.
+    Fields flagged as multiple are collected in lists, and only the first
+    child of the other fields is used. Missing boolean fields are False.
+    """
+
+    __slots__ = ("fields", "flags")
+
+    def __init__(self, fields: dict, base: "_Schema" = None):
+        self.fields = {} if base is None else base.fields.copy()
+        for tag, (cast, name, *multiple) in fields.items():
+            self.fields[tag] = (_caster(cast), name, any(multiple))
+        self.flags = tuple(name for cast, name, multiple in
+                           self.fields.values()
+                           if cast is _bool_of and not multiple)
+
+    def decode(self, root: et.Element) -> dict:
+        """Single pass over the children of the root.
+        """
+        results = {}
+        fields = self.fields
+        for obj in root:
+            field = fields.get(obj.tag)
+            if field is None:
+                continue
+            cast, name, multiple = field
+            if multiple:
+                if name in results:
+                    results[name].append(cast(obj))
+                else:
+                    results[name] = [cast(obj)]
+            elif name not in results:
+                results[name] = cast(obj)
+        for name in self.flags:
+            if name not in results:  # Some tags act like False when missing
+                results[name] = False
+        return results
+
+
+def _from_B64File(root: et.Element):
     return File(root.get("name"), root.text)
 
 
-def _from_DatasetItems(root: et.Element, *_):
+def _from_DatasetItems(root: et.Element):
     data = {}
     for item in root:
         number = int(item.find("number").text)
@@ -156,27 +230,35 @@ def _from_DatasetItems(root: et.Element, *_):
     return data
 
 
-def _from_Datasets(root: et.Element, tags: dict):
-    data = []
-    for obj in root:
-        tags["status"] = (Status, "status")
-        tags["name"] = (str, "name")
-        tags["type"] = (str, "ctype")
-        tags["distribution"] = (Distribution, "distribution")
-        tags["minimum"] = (str, "minimum")
-        tags["maximum"] = (str, "maximum")
-        tags["decimals"] = (str, "decimals")
-        tags["dataset_items"] = (_from_DatasetItems, "items")
-        data.append(Dataset(**_from_xml(obj, tags)))
-    return data
+_DATASET = _Schema({
+    "status": (Status, "status"),
+    "name": (str, "name"),
+    "type": (str, "ctype"),
+    "distribution": (Distribution, "distribution"),
+    "minimum": (str, "minimum"),
+    "maximum": (str, "maximum"),
+    "decimals": (str, "decimals"),
+    "dataset_items": (_from_DatasetItems, "items")
+})
+
+
+def _from_Datasets(root: et.Element):
+    return [Dataset(**_DATASET.decode(obj)) for obj in root]
 
 
-def _from_FText(root: et.Element, tags: dict):
-    tags["text"] = (str, "text")
-    tags["file"] = (_from_B64File, "file", True)
-    data = _from_xml(root, tags)
+_FTEXT = _Schema({
+    "text": (str, "text"),
+    "file": (_from_B64File, "file", True)
+})
+
+
+def _from_FText(root: et.Element):
+    data = _FTEXT.decode(root)
     data["formatting"] = TextFormat(root.get("format"))
     efiles = data.pop("file", [])
+    if not efiles:
+        key = (data["formatting"], data.get("text"))
+        return _POOL.ftext(key, lambda: FText.from_string(**data))
     ftext = FText.from_string(**data)
     for file in efiles:
         for tmp in ftext.text:
@@ -185,31 +267,43 @@ def _from_FText(root: et.Element, tags: dict):
     return ftext
 
 
-def _from_Hint(root: et.Element, tags: dict) -> "Hint":
-    tags["text"] = (str, "text")
-    tags["options"] = (bool, "state_incorrect")
-    tags["shownumcorrect"] = (bool, "show_correct")
-    tags["clearwrong"] = (bool, "clear_wrong")
-    data = _from_xml(root, tags)
+_HINT = _Schema({
+    "text": (str, "text"),
+    "options": (bool, "state_incorrect"),
+    "shownumcorrect": (bool, "show_correct"),
+    "clearwrong": (bool, "clear_wrong")
+})
+
+
+def _from_Hint(root: et.Element) -> "Hint":
+    data = _HINT.decode(root)
     data["formatting"] = TextFormat(root.get("format"))
     return Hint(**data)
 
 
-def _from_SelectOption(root: et.Element, tags: dict):
-    tags["text"] = (str, "text")
-    tags["group"] = (str, "group")
-    return SelectOption(**_from_xml(root, tags))
+_SELECTOPTION = _Schema({
+    "text": (str, "text"),
+    "group": (str, "group")
+})
+
+
+def _from_SelectOption(root: et.Element):
+    return SelectOption(**_SELECTOPTION.decode(root))
 
 
-def _from_Subquestion(root: et.Element, tags: dict):
-    tags["text"] = (str, "text")
-    tags["answer"] = (str, "answer")
-    data = _from_xml(root, tags)
+_SUBQUESTION = _Schema({
+    "text": (str, "text"),
+    "answer": (str, "answer")
+})
+
+
+def _from_Subquestion(root: et.Element):
+    data = _SUBQUESTION.decode(root)
     data["formatting"] = TextFormat(root.get("format"))
     return Subquestion(**data)
 
 
-def _from_units(root: et.Element, *_) -> Unit:
+def _from_units(root: et.Element) -> Unit:
     units = []
     for elem in root:
         multiplier = float(elem.find("multiplier").text)
@@ -218,49 +312,64 @@ def _from_units(root: et.Element, *_) -> Unit:
     return units
 
 
-def _from_Tags(root: et.Element, *_):
+def _from_Tags(root: et.Element):
     _tags = TList[str]()
     for elem in root:
-        _tags.append(elem.find("text").text)
+        _tags.append(sys.intern(elem.find("text").text))
     return _tags
 
 
 # -----------------------------------------------------------------------------
 
 
-def _from_Answer(root: et.Element, tags: dict, go_up=False):
-    tags["text"] = (str, "text")
-    tags["feedback"] = (_from_FText, "feedback")
-    data = _from_xml(root, tags)
+_ANSWER = _Schema({
+    "text": (str, "text"),
+    "feedback": (_from_FText, "feedback")
+})
+_ANUMERICAL = _Schema({
+    "tolerance": (float, "tolerance")
+}, _ANSWER)
+_ACALCULATED = _Schema({
+    "tolerancetype": (TolType, "ttype"),
+    "correctanswerformat": (TolFormat, "aformat"),
+    "correctanswerlength": (int, "alength")
+}, _ANUMERICAL)
+
+
+def _answer_data(root: et.Element, schema: _Schema) -> dict:
+    data = schema.decode(root)
     data["formatting"] = TextFormat(root.get("format", "auto"))
     data["fraction"] = float(root.get("fraction", 0))
-    return data if go_up else Answer(**data)
+    return data
+
 
+def _from_Answer(root: et.Element):
+    return Answer(**_answer_data(root, _ANSWER))
 
-def _from_ANumerical(root: et.Element, tags: dict, go_up=False):
-    tags["tolerance"] = (float, "tolerance")
-    data = _from_Answer(root, tags, True)
-    return data if go_up else ANumerical(**data)
 
+def _from_ANumerical(root: et.Element):
+    return ANumerical(**_answer_data(root, _ANUMERICAL))
 
-def _from_ACalculated(root: et.Element, tags: dict):
-    tags["tolerancetype"] = (TolType, "ttype")
-    tags["correctanswerformat"] = (TolFormat, "aformat")
-    tags["correctanswerlength"] = (int, "alength")
-    return ACalculated(**_from_ANumerical(root, tags, True))
 
+def _from_ACalculated(root: et.Element):
+    return ACalculated(**_answer_data(root, _ACALCULATED))
 
-def _from_draggroup(root: et.Element, tags: dict):
-    tags["text"] = (str, "text")
-    tags["group"] = (str, "group")
-    tags["unlimited"] = (bool, "unlimited")
-    data = _from_xml(root, tags)
+
+_DRAGGROUP = _Schema({
+    "text": (str, "text"),
+    "group": (str, "group"),
+    "unlimited": (bool, "unlimited")
+})
+
+
+def _from_draggroup(root: et.Element):
+    data = _DRAGGROUP.decode(root)
     unlimited = data.pop("unlimited")
     data["no_of_drags"] = -1 if unlimited else 1
     return DragGroup(**data)
 
 
-def _from_dropzone(root: et.Element, *_):
+def _from_dropzone(root: et.Element):
     data = {a.tag: a for a in root}
     res = {}
     if "coords" in data and "shape" in data:
@@ -279,37 +388,74 @@ def _from_dropzone(root: et.Element, *_):
     return DropZone(**res)
 
 
-# -----------------------------------------------------------------------------
+_DRAGIMAGE = _Schema({
+    "no": (int, "number"),
+    "text": (str, "text"),
+    "infinite": (bool, "unlimited"),
+    "draggroup": (int, "group"),
+    "file": (_from_B64File, "image")
+})
+
+
+def _from_dragimage(root: et.Element):
+    data = _DRAGIMAGE.decode(root)
+    unlimited = data.pop("unlimited")
+    data["no_of_drags"] = -1 if unlimited else 1
+    return DragImage(**data)
 
 
-def _from_question(root: et.Element, tags: dict):
-    tags["name"] = (str, "name")
-    tags["questiontext"] = (_from_FText, "question")
-    tags["generalfeedback"] = (_from_FText, "remarks")
-    tags["defaultgrade"] = (float, "default_grade")
-    tags["idnumber"] = (int, "dbid")
-    tags["tags"] = (_from_Tags, "tags")
-    return _from_xml(root, tags)
+_DRAGITEM = _Schema({
+    "no": (int, "number"),
+    "text": (str, "text"),
+    "infinite": (bool, "infinite"),
+    "noofdrags": (int, "no_of_drags")
+})
 
 
-def _from_penalty_to_maxtries(value, _):
-    value = float(value.text)
-    return int(1/value if value else value)
+def _from_dragitem(root: et.Element):
+    data = _DRAGITEM.decode(root)
+    if data.pop("infinite", False):
+        data["no_of_drags"] = -1
+    return DragItem(**data)
+
+
+# -----------------------------------------------------------------------------
 
 
-def _from_question_mt(root: et.Element, tags: dict):
-    tags["hint"] = (_from_Hint, "hints", True)
-    tags["penalty"] = (_from_penalty_to_maxtries, "max_tries")
-    return _from_question(root, tags)
+def _from_penalty_to_maxtries(value: et.Element):
+    value = float(value.text)
+    return int(1/value if value else value)
 
 
-def _from_question_mtcs(root: et.Element, tags: dict):
-    tags["correctfeedback"] = (_from_FText, "if_correct")
-    tags["partiallycorrectfeedback"] = (_from_FText, "if_incomplete")
-    tags["incorrectfeedback"] = (_from_FText, "if_incorrect")
-    tags["shownumcorrect"] = (bool, "show_ans")
-    tags["shuffleanswers"] = (bool, "shuffle")
-    data = _from_question_mt(root, tags)
+_QUESTION = _Schema({
+    "name": (str, "name"),
+    "questiontext": (_from_FText, "question"),
+    "generalfeedback": (_from_FText, "remarks"),
+    "defaultgrade": (float, "default_grade"),
+    "idnumber": (int, "dbid"),
+    "tags": (_from_Tags, "tags")
+})
+_QUESTION_MT = _Schema({
+    "hint": (_from_Hint, "hints", True),
+    "penalty": (_from_penalty_to_maxtries, "max_tries")
+}, _QUESTION)
+_QUESTION_MTCS = _Schema({
+    "correctfeedback": (_from_FText, "if_correct"),
+    "partiallycorrectfeedback": (_from_FText, "if_incomplete"),
+    "incorrectfeedback": (_from_FText, "if_incorrect"),
+    "shownumcorrect": (bool, "show_ans"),
+    "shuffleanswers": (bool, "shuffle")
+}, _QUESTION_MT)
+_QUESTION_MTUH = _Schema({
+    "unitgradingtype": (Grading, "grading_type"),
+    "unitpenalty": (str, "unit_penalty"),
+    "unitsleft": (bool, "left"),
+    "showunits": (ShowUnits, "show_unit")
+}, _QUESTION_MT)
+
+
+def _from_question_mtcs(root: et.Element, schema: _Schema):
+    data = schema.decode(root)
     data["feedbacks"] = {}
     if "if_correct" in data:
         data["feedbacks"][100.0] = data.pop("if_correct")
@@ -320,140 +466,161 @@ def _from_question_mtcs(root: et.Element, tags: dict):
     return data
 
 
-def _from_question_mtuh(root: et.Element, tags: dict):
-    tags["unitgradingtype"] = (Grading, "grading_type")
-    tags["unitpenalty"] = (str, "unit_penalty")
-    tags["unitsleft"] = (bool, "left")
-    tags["showunits"] = (ShowUnits, "show_unit")
-    return _from_question_mt(root, tags)
+_QCALCULATED = _Schema({
+    "synchronize": (Synchronise, "synchronize"),
+    "units": (_from_units, "units", False),
+    "dataset_definitions": (_from_Datasets, "datasets"),
+    "answer": (_from_ACalculated, "options", True)
+}, _QUESTION_MTUH)
+
+
+def _from_qcalculated(root: et.Element):
+    return QCalculated(**_QCALCULATED.decode(root))
 
 
-def _from_qcalculated(root: et.Element, tags: dict, go_up=False):
-    tags["synchronize"] = (Synchronise, "synchronize")
-    tags["units"] = (_from_units, "units", False)
-    tags["dataset_definitions"] = (_from_Datasets, "datasets")
-    tags["answer"] = (_from_ACalculated, "options", True)
-    data = _from_question_mtuh(root, tags)
-    return data if go_up else QCalculated(**data)
+_QCALCMULTICHOICE = _Schema({
+    "synchronize": (Synchronise, "synchronize"),
+    "single": (bool, "single"),
+    "answernumbering": (Numbering, "numbering"),
+    "dataset_definitions": (_from_Datasets, "datasets"),
+    "answer": (_from_ACalculated, "options", True)
+}, _QUESTION_MTCS)
 
 
-def _from_qcalcmultichoice(root: et.Element, tags: dict):
-    tags["synchronize"] = (Synchronise, "synchronize")
-    tags["single"] = (bool, "single")
-    tags["answernumbering"] = (Numbering, "numbering")
-    tags["dataset_definitions"] = (_from_Datasets, "datasets")
-    tags["answer"] = (_from_ACalculated, "options", True)
-    return QCalculatedMC(**_from_question_mtcs(root, tags))
+def _from_qcalcmultichoice(root: et.Element):
+    return QCalculatedMC(**_from_question_mtcs(root, _QCALCMULTICHOICE))
 
 
-def _from_qcloze(root: et.Element, tags: dict):
-    data = _from_question_mt(root, tags)
+def _from_qcloze(root: et.Element):
+    data = _QUESTION_MT.decode(root)
     text, opts = QEmbedded.from_cloze_text(data["question"].text[0])
     data["question"].text = text
     data["options"] = opts
     return QEmbedded(**data)
 
 
-def _from_qdescription(root: et.Element, tags: dict):
-    return QProblem(**_from_question(root, tags))
+def _from_qdescription(root: et.Element):
+    return QProblem(**_QUESTION.decode(root))
 
 
-def _from_ddwtos(root: et.Element, tags: dict):
-    tags["dragbox"] = (_from_draggroup, "options", True)
-    return QDaDText(**_from_question_mtcs(root, tags))
+_DDWTOS = _Schema({
+    "dragbox": (_from_draggroup, "options", True)
+}, _QUESTION_MTCS)
 
 
-def _from_dragimage(root: et.Element, tags: dict):
-    tags["no"] = (int, "number")
-    tags["text"] = (str, "text")
-    tags["infinite"] = (bool, "unlimited")
-    tags["draggroup"] = (int, "group")
-    tags["file"] = (_from_B64File, "image")
-    data = _from_xml(root, tags)
-    unlimited = data.pop("unlimited")
-    data["no_of_drags"] = -1 if unlimited else 1
-    return DragImage(**data)
+def _from_ddwtos(root: et.Element):
+    return QDaDText(**_from_question_mtcs(root, _DDWTOS))
 
 
-def _from_ddimageortext(root: et.Element, tags: dict):
-    tags["file"] = (_from_B64File, "background")
-    tags["drag"] = (_from_dragimage, "options", True)
-    tags["drop"] = (_from_dropzone, "zones", True)
-    return QDaDImage(**_from_question_mtcs(root, tags))
+_DDIMAGEORTEXT = _Schema({
+    "file": (_from_B64File, "background"),
+    "drag": (_from_dragimage, "options", True),
+    "drop": (_from_dropzone, "zones", True)
+}, _QUESTION_MTCS)
 
 
-def _from_dragitem(root: et.Element, tags: dict):
-    tags["no"] = (int, "number")
-    tags["text"] = (str, "text")
-    tags["infinite"] = (bool, "infinite")
-    tags["noofdrags"] = (int, "no_of_drags")
-    data = _from_xml(root, tags)
-    if data.pop("infinite", False):
-        data["no_of_drags"] = -1
-    return DragItem(**data)
+def _from_ddimageortext(root: et.Element):
+    return QDaDImage(**_from_question_mtcs(root, _DDIMAGEORTEXT))
+
+
+_DDMARKER = _Schema({
+    "file": (_from_B64File, "background"),
+    "showmisplaced": (bool, "highlight"),
+    "drag": (_from_dragitem, "options", True),
+    "drop": (_from_dropzone, "zones", True)
+}, _QUESTION_MTCS)
+
+
+def _from_ddmarker(root: et.Element):
+    return QDaDMarker(**_from_question_mtcs(root, _DDMARKER))
+
+
+_QESSAY = _Schema({
+    "responseformat": (RespFormat, "rsp_format"),
+    "responserequired": (bool, "rsp_required"),
+    "responsefieldlines": (int, "lines"),
+    "minwordlimit": (int, "min_words"),
+    "maxwordlimit": (int, "max_words"),
+    "attachments": (int, "attachments"),
+    "attachmentsrequired": (bool, "atts_required"),
+    "maxbytes": (int, "max_bytes"),
+    "filetypeslist": (str, "file_types"),
+    "graderinfo": (_from_FText, "grader_info"),
+    "responsetemplate": (_from_FText, "template")
+}, _QUESTION)
+
+
+def _from_qessay(root: et.Element):
+    return QEssay(**_QESSAY.decode(root))
+
 
-def _from_ddmarker(root: et.Element, tags: dict):
-    tags["file"] = (_from_B64File, "background")
-    tags["showmisplaced"] = (bool, "highlight")
-    tags["drag"] = (_from_dragitem, "options", True)
-    tags["drop"] = (_from_dropzone, "zones", True)
-    return QDaDMarker(**_from_question_mtcs(root, tags))
+_QMATCHING = _Schema({
+    "subquestion": (_from_Subquestion, "options", True)
+}, _QUESTION_MTCS)
 
 
-def _from_qessay(root: et.Element, tags: dict):
-    tags["responseformat"] = (RespFormat, "rsp_format")
-    tags["responserequired"] = (bool, "rsp_required")
-    tags["responsefieldlines"] = (int, "lines")
-    tags["minwordlimit"] = (int, "min_words")
-    tags["minwordlimit"] = (int, "max_words")
-    tags["attachments"] = (int, "attachments")
-    tags["attachmentsrequired"] = (bool, "atts_required")
-    tags["maxbytes"] = (int, "max_bytes")
-    tags["filetypeslist"] = (str, "file_types")
-    tags["graderinfo"] = (_from_FText, "grader_info")
-    tags["responsetemplate"] = (_from_FText, "template")
-    return QEssay(**_from_question(root, tags))
+def _from_qmatching(root: et.Element):
+    return QMatching(**_from_question_mtcs(root, _QMATCHING))
 
 
-def _from_qmatching(root: et.Element, tags: dict):
-    tags["subquestion"] = (_from_Subquestion, "options", True)
-    return QMatching(**_from_question_mtcs(root, tags))
+_QRANDOMMATCHING = _Schema({
+    "choose": (int, "choose"),
+    "subcats": (bool, "subcats")
+}, _QUESTION_MTCS)
 
 
-def _from_QRandomMatching(root: et.Element, tags: dict):
-    tags["choose"] = (int, "choose")
-    tags["subcats"] = (bool, "subcats")
-    return QRandomMatching(**_from_question_mtcs(root, tags))
+def _from_QRandomMatching(root: et.Element):
+    return QRandomMatching(**_from_question_mtcs(root, _QRANDOMMATCHING))
 
 
-def _from_QMissingWord(root: et.Element, tags: dict):
-    tags["selectoption"] = (_from_SelectOption, "options", True)
-    return QMissingWord(**_from_question_mtcs(root, tags))
+_QMISSINGWORD = _Schema({
+    "selectoption": (_from_SelectOption, "options", True)
+}, _QUESTION_MTCS)
 
 
-def _from_QMultichoice(root: et.Element, tags: dict):
-    tags["single"] = (bool, "single")
-    tags["showstandardinstruction"] = (bool, "show_instr")
-    tags["answernumbering"] = (Numbering, "numbering")
-    tags["answer"] = (_from_Answer, "options", True)
-    return QMultichoice(**_from_question_mtcs(root, tags))
+def _from_QMissingWord(root: et.Element):
+    return QMissingWord(**_from_question_mtcs(root, _QMISSINGWORD))
 
 
-def _from_QNumerical(root: et.Element, tags: dict):
-    tags["answer"] = (_from_ANumerical, "options", True)
-    tags["units"] = (_from_units, "units", False)
-    return QNumerical(**_from_question_mtuh(root, tags))
+_QMULTICHOICE = _Schema({
+    "single": (bool, "single"),
+    "showstandardinstruction": (bool, "show_instr"),
+    "answernumbering": (Numbering, "numbering"),
+    "answer": (_from_Answer, "options", True)
+}, _QUESTION_MTCS)
 
 
-def _from_QShortAnswer(root: et.Element, tags: dict):
-    tags["usecase"] = (str, "use_case")
-    tags["answer"] = (_from_Answer, "options", True)
-    return QShortAnswer(**_from_question_mt(root, tags))
+def _from_QMultichoice(root: et.Element):
+    return QMultichoice(**_from_question_mtcs(root, _QMULTICHOICE))
 
 
-def _from_QTrueFalse(root: et.Element, tags: dict):
-    tags["answer"] = (_from_Answer, "options", True)
-    data = _from_question(root, tags)
+_QNUMERICAL = _Schema({
+    "answer": (_from_ANumerical, "options", True),
+    "units": (_from_units, "units", False)
+}, _QUESTION_MTUH)
+
+
+def _from_QNumerical(root: et.Element):
+    return QNumerical(**_QNUMERICAL.decode(root))
+
+
+_QSHORTANSWER = _Schema({
+    "usecase": (str, "use_case"),
+    "answer": (_from_Answer, "options", True)
+}, _QUESTION_MT)
+
+
+def _from_QShortAnswer(root: et.Element):
+    return QShortAnswer(**_QSHORTANSWER.decode(root))
+
+
+_QTRUEFALSE = _Schema({
+    "answer": (_from_Answer, "options", True)
+}, _QUESTION)
+
+
+def _from_QTrueFalse(root: et.Element):
+    data = _QTRUEFALSE.decode(root)
     opt = data.pop("options")
     if opt[0].text.lower() == "true":
         data["correct"] = opt[0].fraction == 100
@@ -843,36 +1010,349 @@ def _to_qtruefalse(qst: QTrueFalse) -> et.Element:
 }
 
 
-def read_moodle(cls, file_path: str, category: str = None) -> "Category":
-    """[summary]
+def _wanted(elem: et.Element, path: str, qfilter: QFilter) -> bool:
+    idnumber = elem.findtext("idnumber")
+    tags = [tag.findtext("text") for tag in elem.iterfind("tags/tag")]
+    return qfilter.accepts(path, elem.get("type"), tags,
+                           int(idnumber) if idnumber else None)
+
+
+def _iter_quiz(source, qfilter: QFilter = None, path: str = None,
+               ids: dict = None) -> Iterator[tuple]:
+    """Categories and questions of a Moodle XML, in file order. Questions
+    not accepted by qfilter are dropped before being decoded. path is the
+    category in effect at the start of the source. If ids is given, the id
+    attribute of each question, as in backups, is added to it by id().
+    """
+    depth = 0
+    root = None
+    try:
+        for event, elem in et.iterparse(source, ("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if elem.tag == "question":
+                if elem.get("type") == "category":
+                    path = elem[0][0].text
+                    yield "category", path
+                elif qfilter is None or _wanted(elem, path, qfilter):
+                    question = _QTYPE[elem.get("type")](elem)
+                    if ids is not None and elem.get("id", "").isdigit():
+                        ids[id(question)] = int(elem.get("id"))
+                    yield "question", question
+            root.clear()        # Drops the processed children of the quiz
+    finally:
+        _POOL.clear()
+
+
+def _split_quiz(file_path: str, parts: int) -> Tuple[int, List[int], int]:
+    """Splits the questions of a Moodle XML in balanced byte ranges, cut
+    where a top level question starts. Returns the end of the header, the
+    start of each range and the start of the closing tag.
+    """
+    with open(file_path, "rb") as ifile, \
+            mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        match = _QUESTION_START.search(data)
+        end = data.rfind(b"</quiz>")
+        if match is None or end < match.start():
+            return 0, [], 0
+        header = match.start()
+        step = max((end - header) // parts, 1)
+        starts = [header]
+        pos = header + step
+        while True:
+            match = _QUESTION_START.search(data, pos, end)
+            if match is None:
+                break
+            pos = match.end()
+            # Only cut after the end of the previous question, so markup in
+            # the texts is not taken as a border.
+            if _after_question(data[max(match.start() - 256, 0):
+                                    match.start()]):
+                starts.append(match.start())
+                pos = match.start() + step
+    return header, starts, end
+
+
+def _after_question(data: bytes) -> bool:
+    """If the bytes end with a closing question tag, followed only by spaces
+    and comments, like the "<!-- question: 1 -->" Moodle writes before
+    each question.
+    """
+    data = data.rstrip()
+    while data.endswith(b"-->"):
+        pos = data.rfind(b"<!--")
+        if pos == -1:
+            return False
+        data = data[:pos].rstrip()
+    return data.endswith(b"</question>")
+
+
+def _category_at(file_path: str, start: int) -> str:
+    """Category in effect at a byte of the file, from the last category
+    question before it.
+    """
+    with open(file_path, "rb") as ifile, \
+            mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        pos = data.rfind(b'<question type="category"', 0, start)
+        if pos == -1:
+            return None
+        end = data.find(b"</question>", pos) + len(b"</question>")
+        return et.fromstring(data[pos:end])[0][0].text
+
+
+def _read_chunk(args: tuple) -> list:
+    file_path, header, start, end, qfilter = args
+    with open(file_path, "rb") as ifile:
+        data = ifile.read(header)
+        ifile.seek(start)
+        data += ifile.read(end - start) + b"</quiz>"
+    path = None
+    if qfilter is not None and qfilter.path is not None:
+        path = _category_at(file_path, start)
+    return list(_iter_quiz(io.BytesIO(data), qfilter, path))
+
+
+def _index(file_path: str) -> List[tuple]:
+    """(offset, length, name, category path, type) of each question. Only
+    expat events are handled, and only the name and category texts are
+    kept, so no element tree or question is built.
+    """
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    found, tags, text = [], [], []
+    current = {"path": None}
+
+    def _start(tag: str, attrs: dict):
+        tags.append(tag)
+        if len(tags) == 2 and tag == "question":
+            current.update(start=parser.CurrentByteIndex, name=None,
+                           type=attrs.get("type"))
+        elif len(tags) == 4 and tag == "text":
+            text.clear()
+
+    def _end(tag: str):
+        if len(tags) == 4 and tag == "text":
+            if tags[2] == "name":
+                current["name"] = "".join(text)
+            elif tags[2] == "category":
+                current["path"] = "".join(text)
+        elif len(tags) == 2 and tag == "question" and \
+                current["type"] != "category":
+            found.append((current["start"], parser.CurrentByteIndex,
+                          current["name"], current["path"], current["type"]))
+        tags.pop()
+
+    def _text(data: str):
+        if len(tags) == 4:
+            text.append(data)
+
+    parser.StartElementHandler = _start
+    parser.EndElementHandler = _end
+    parser.CharacterDataHandler = _text
+    with open(file_path, "rb") as ifile:
+        parser.ParseFile(ifile)
+        with mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # The end events are at the start of the end tags
+            return [(start, data.find(b">", end) + 1 - start, name, path,
+                     qtype) for start, end, name, path, qtype in found]
+
+
+def _load(file_path: str, entry: tuple) -> "_Question":
+    offset, length = entry[:2]
+    with open(file_path, "rb") as ifile, \
+            mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = _QUESTION_START.search(data).start()
+        data = data[:header] + data[offset:offset+length] + b"</quiz>"
+    records = _iter_quiz(io.BytesIO(data))
+    return next(value for kind, value in records if kind == "question")
+
+
+def read_moodle(cls, file_path: str, category: str = None,
+                jobs: int = 1, filter: QFilter = None) -> "Category":
+    """Reads a Moodle XML file, given by path or as a binary stream. The file
+    is streamed, and each question is built and dropped from the tree as
+    soon as its end tag is read, so the memory used is bound by the largest
+    question, not by the file.
+    Args:
+        jobs (int, optional): number of worker processes. If not 1, the file
+            is split where top level questions start, and the chunks are
+            decoded in parallel. None uses all the CPUs.
+        filter (QFilter, optional): questions to read. The others are
+            dropped before being decoded, and categories not matching its
+            path are not created.
     Returns:
-        [type]: [description]
+        Category: the top category.
     """
-    data_root = et.parse(file_path)
     top_quiz: Category = cls(category)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or not isinstance(file_path, str):
+        records = _iter_quiz(file_path, filter)
+    else:
+        header, starts, end = _split_quiz(file_path, jobs * _CHUNKS_PER_JOB)
+        chunks = [(file_path, header, start, stop, filter) for start, stop in
+                  zip(starts, starts[1:] + [end])]
+        results = parallel_map(_read_chunk, chunks, jobs)
+        for result in results:
+            if isinstance(result, et.ParseError):
+                _LOG.warning("Could not split %s, reading it in a single "
+                             "process: %s", file_path, result)
+                results = [_iter_quiz(file_path, filter)]
+                break
+            if isinstance(result, Exception):
+                raise result
+        records = itertools.chain.from_iterable(results)
+    top_quiz = _build_quiz(cls, top_quiz, records, filter)
+    _LOG.debug("Parsed %s questions from %s.", top_quiz.get_size(True), file_path)
+    return top_quiz
+
+
+def _build_quiz(cls, top_quiz: "Category", records: Iterator[tuple],
+                qfilter: QFilter = None) -> "Category":
     quiz = top_quiz
-    for elem in data_root.getroot():
-        if elem.tag != "question":
-            continue
-        if elem.get("type") == "category":
-            quiz = gen_hier(cls, top_quiz, elem[0][0].text)
+    for kind, value in records:     # Categories carry over chunk borders
+        if kind == "category":
+            # Questions of the categories skipped were filtered out too
+            if qfilter is None or qfilter.match_path(value):
+                quiz = gen_hier(cls, top_quiz, value)
         else:
-            question = _QTYPE[elem.get("type")](elem, {})
-            quiz.add_question(question)
-    _LOG.debug("Parsed %s questions from %s.", top_quiz.get_size(True), file_path)
+            quiz.add_question(value)
     if top_quiz.get_size() == 0 and len(top_quiz) == 1:
         top_quiz = top_quiz.pop_subcat([name for name in top_quiz][0])
     return top_quiz
 
 
+class _Backup:
+    """A Moodle backup, either a zip or a tar like the .mbz files created by
+    Moodle. Members are streamed from the archive, never extracted. The pool
+    of files is indexed from files.xml, and each file is only read when its
+    data is needed. The archive must stay in place until then.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._zip = zipfile.is_zipfile(path)
+
+    @contextlib.contextmanager
+    def open(self, name: str) -> Iterator[BinaryIO]:
+        """Binary stream of a member of the archive.
+        """
+        if self._zip:
+            with zipfile.ZipFile(self.path) as archive:
+                with archive.open(name) as ifile:
+                    yield ifile
+            return
+        with tarfile.open(self.path, "r|*") as archive:  # Read in order
+            for member in archive:
+                if member.name in (name, f"./{name}"):
+                    yield archive.extractfile(member)
+                    return
+        raise KeyError(f"There is no item named '{name}' in the archive")
+
+    def read(self, name: str) -> bytes:
+        """Data of a member of the archive.
+        """
+        with self.open(name) as ifile:
+            return ifile.read()
+
+    def index(self) -> Dict[Tuple[str, str, int, str, str], str]:
+        """Pool member of each file listed in files.xml, by component, file
+        area, item id, path and name. Files with the same path and name
+        often belong to different questions, so all of them are kept.
+        """
+        pool = {}
+        try:
+            with self.open("files.xml") as ifile:
+                for _, elem in et.iterparse(ifile):
+                    if elem.tag != "file":
+                        continue
+                    name = elem.findtext("filename")
+                    digest = elem.findtext("contenthash")
+                    if name and name != "." and digest:
+                        itemid = elem.findtext("itemid") or ""
+                        key = (elem.findtext("component"),
+                               elem.findtext("filearea"),
+                               int(itemid) if itemid.isdigit() else None,
+                               elem.findtext("filepath") or "/", name)
+                        pool[key] = f"files/{digest[:2]}/{digest}"
+                    elem.clear()
+        except KeyError:
+            _LOG.debug("No files.xml in %s.", self.path)
+        return pool
+
+
+def _member(entries: list, qid: int) -> str:
+    """Pool member of a file of the question qid, from the entries of the
+    pool with the same path and name. The areas of the question itself are
+    tried first. Otherwise, the path must point to a single member.
+    """
+    members = {member for key, member in entries
+               if key[0] == "question" and key[2] == qid}
+    if qid is None or len(members) != 1:
+        members = {member for _, member in entries}
+    if len(members) == 1:
+        return members.pop()
+    if members:
+        _LOG.debug("File %s of question %s is not unique in the backup.",
+                   entries[0][0][3] + entries[0][0][4], qid)
+    return None
+
+
+def _files_of(item, seen: set, skip: type) -> Iterator[File]:
+    if id(item) in seen or isinstance(item, (str, int, float, type, skip)):
+        return
+    seen.add(id(item))
+    if isinstance(item, File):
+        yield item
+        return
+    if isinstance(item, (list, tuple)):
+        values = item
+    elif isinstance(item, dict):
+        values = item.values()
+    elif hasattr(item, "__dict__"):
+        values = vars(item).values()
+    else:
+        return
+    for value in values:
+        yield from _files_of(value, seen, skip)
+
+
 def read_moodle_backup(cls, file_path: str) -> "Category":
-    """[summary]
+    """Reads the questions of a Moodle backup (.mbz), either zipped or in
+    tar format. The questions are streamed from the archive, and the files
+    referenced by them are only read from it when their data is needed.
     Returns:
-        [type]: [description]
+        Category: the top category.
     """
-    with zipfile.ZipFile(file_path, "r") as ifile:
-        data = ifile.extract("questions.xml")
-        top_quiz: Category = read_moodle(cls, data)
+    backup = _Backup(file_path)
+    ids = {}
+    with backup.open("questions.xml") as ifile:
+        top_quiz: Category = _build_quiz(cls, cls(), _iter_quiz(ifile,
+                                                               ids=ids))
+    pool = backup.index()
+    if pool:
+        paths: Dict[str, list] = {}
+        for key, member in pool.items():
+            paths.setdefault(key[3] + key[4], []).append((key, member))
+        seen = set()
+        stack = [top_quiz]
+        while stack:
+            cat = stack.pop()
+            stack.extend(cat[name] for name in cat)
+            for question in cat.questions:
+                qid = ids.get(id(question))
+                for file in _files_of(question, seen, cls):  # Not parents
+                    member = _member(paths.get(file.path, ()), qid)
+                    if file.data is None and member is not None:
+                        # Pool members are named by the hash of their data
+                        file.defer(functools.partial(backup.read, member),
+                                   member)
     return top_quiz
 
 
@@ -898,16 +1378,30 @@ def read_moodle_backup(cls, file_path: str) -> "Category":
 }
 
 
-def write_moodle(self: "Category", file_path: str, pretty=False):
-    """Generates XML compatible with Moodle and saves to a file.
+def write_moodle(self: "Category", file_path: str, pretty=False,
+                 cache: str = None):
+    """Generates XML compatible with Moodle and saves to a file. Questions
+    are serialized and written one at a time.
 
     Args:
         file_path (str): filename where the XML will be saved
         pretty (bool): saves XML pretty printed.
+        cache (str): optional file used to keep the XML of each question
+            between sessions. Questions that did not change since the last
+            export are not serialized again. Use one cache per bank, since
+            entries not used by the export are removed.
     """
-    def _txrecursive(cat: "Category", root: et.Element):
-        question = et.Element("question")           # Add category on the top
-        if cat.get_size() > 0:
+    def _serialize(elem: et.Element) -> str:
+        buffer = []
+        serialize_fxml(buffer.append, elem, True, pretty, 1)
+        return "".join(buffer)
+
+    def _to_fragment(question) -> str:
+        return _serialize(_QREF[type(question)](question))
+
+    def _txrecursive(cat: "Category", get) -> Iterator[str]:
+        if cat.get_size() > 0:                      # Add category on the top
+            question = et.Element("question")
             question.set("type", "category")
             category = et.SubElement(question, "category")
             catname = [cat.name]
@@ -917,17 +1411,34 @@ def _txrecursive(cat: "Category", root: et.Element):
                 tmp = tmp.parent
             catname.reverse()
             et.SubElement(category, "text").text = "/".join(catname)
-            root.append(question)
+            yield _serialize(question)
             for question in cat.questions:          # Add own questions first
-                root.append(_QREF[type(question)](question))
+                yield get(question)
         for name in cat:                            # Then add children data
-            _txrecursive(cat[name], root)
-    root = et.Element("quiz")
-    _txrecursive(self, root)
-    with open(file_path, "w") as ofile:
-        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n")
-        serialize_fxml(ofile.write, root, True, pretty)
-
-
-def write_moodle_backup(self: "Category", file_path: str, pretty=False):
-    pass
\ No newline at end of file
+            yield from _txrecursive(cat[name], get)
+
+    def _write(get):
+        # Each fragment is written and dropped as soon as it is generated.
+        fragments = _txrecursive(self, get)
+        first = next(fragments, None)
+        with open(file_path, "w", encoding="utf-8",
+                  buffering=_WRITE_BUFFER) as ofile:
+            ofile.write("<?xml version='1.0' encoding='utf-8'?>\n")
+            if first is None:
+                ofile.write("<quiz />")
+            else:
+                ofile.write("<quiz>\n" if pretty else "<quiz>")
+                ofile.write(first)
+                for fragment in fragments:
+                    ofile.write(fragment)
+                ofile.write("</quiz>")
+            if pretty:
+                ofile.write("\n")
+
+    if cache is None:
+        _write(_to_fragment)
+    else:
+        with FragmentCache(cache, "moodle", _WRITER_VERSION,
+                           pretty=pretty) as frags:
+            _write(functools.partial(frags.get, build=_to_fragment))
+            frags.prune()
@@ -40,6 +40,8 @@
 
 
 _LOG = logging.getLogger(__name__)
+_FOLDERS = ("about", "chapter", "course", "html", "problem", "sequential",
+            "static", "vertical", "policies")
 _POLICY = { "course/1": { "tabs": [
     {"course_staff_only": True, "name": "Home", "type": "course_info"},
     {"course_staff_only": False, "name": "Course", "type": "courseware"},
@@ -62,6 +64,8 @@ def __init__(self, category: Category, pretty: bool):
         self._files = {}
         self._moodle_dir = ""
         self._output_dir = ""
+        self._reuse = False
+        self._kept = 0
         self.cat = category
         self.pretty = pretty
 
@@ -168,33 +172,38 @@ def _to_qmultichoice(self, qst: QMultichoice) -> et.Element:
                 et.SubElement(opt_item, "choicehint").text = opt.feedback
         return page
     
-    def _txrecursive(self, cat: Category, dbids: dict, path: str, stack: tuple,
-                     elem: et.Element):
+    def _txrecursive(self, cat: Category, dbids: dict, elem: et.Element,
+                     stack: tuple):
         for file in cat.resources:
-            output = f"/static/{os.path.basename(file.path).replace(' ', '_')}"
-            shutil.copy(file.path, f"{path}/{output}")
-        if cat.get_size() > 0:
-            for qst in cat.questions:
-                tmp = self._QTYPE.get(qst.__class__)
-                if tmp is None:
-                    continue
-                with open(f'{self._output_dir}/problem/{qst.dbid}.xml', "w") as ofile:
+            output = f"static/{os.path.basename(file.path).replace(' ', '_')}"
+            shutil.copy(file.path, f"{self._output_dir}/{output}")
+        for qst in cat.questions:
+            tmp = self._QTYPE.get(qst.__class__)
+            if tmp is None:
+                continue
+            path = f"{self._output_dir}/problem/{qst.dbid}.xml"
+            if self._reuse and not qst.dirty and os.path.isfile(path):
+                self._kept += 1
+            else:
+                with open(path, "w") as ofile:
                     ofile.write("<?xml version='1.0' encoding='utf-8'?>\n")
                     serialize_fxml(ofile.write, tmp(qst), True, True)
-                dbids[qst.dbid] = qst.name
-        if stack and elem:
+            dbids[qst.dbid] = qst.name
+        if stack and elem is not None:
             elem = et.SubElement(elem, stack[0], display_name=cat.name)
             stack = stack[1:] or stack
         for name in cat:                            # Then add children data
-            self._txrecursive(cat[name], dbids)
+            self._txrecursive(cat[name], dbids, elem, stack)
 
     def write(self, file_path: str):
         self.cat.gen_dbids([])   # We need that each question has a unique dbid
         _path = os.path.dirname(file_path)
-        shutil.rmtree(_path, True)
-        for folder in ('about', 'chapter', 'course', 'html', 'problem',
-                       'sequential', 'static', 'vertical', 'policies'):
-            os.makedirs(f"{_path}/{folder}")
+        self._output_dir = _path
+        # Problems of the previous save are kept if their question is clean
+        self._reuse = self.cat.saved_to == os.path.abspath(file_path)
+        self._kept = 0
+        for folder in _FOLDERS:
+            os.makedirs(f"{_path}/{folder}", exist_ok=True)
         dbids = {}
         stack = ("chapter", "sequential", "vertical")
         tmp = depth = self.cat.get_depth(True)
@@ -222,14 +231,21 @@ def write(self, file_path: str):
             tmp = cxml  
             for tag in substack:
                 tmp = et.SubElement(tmp, tag, display_name=f"QAS_{tag}")
+        names = {f"{dbid}.xml" for dbid in dbids}
+        for name in os.listdir(f"{_path}/problem"):   # Removed questions
+            if name not in names:
+                os.remove(f"{_path}/problem/{name}")
         with open(f"{_path}/course.xml", 'w') as ofile:
             serialize_fxml(ofile.write, cxml, True, True)
-        os.makedirs(f"{_path}/policies/1/")
+        os.makedirs(f"{_path}/policies/1/", exist_ok=True)
         with open(f"{_path}/policies/1/policy.json", 'w') as ofile:
             json.dump(_POLICY, ofile)
         with tarfile.open(file_path, 'w:gz') as tar:
-            for _dir in os.listdir(_path):
-                tar.add(f"{_path}/{_dir}", arcname=os.path.basename(_dir))
+            for name in (*_FOLDERS, "course.xml"):  # Not other files there
+                tar.add(f"{_path}/{name}", arcname=name)
+        self.cat.mark_saved(os.path.abspath(file_path))
+        _LOG.debug("Kept %s of %s problems in %s.", self._kept, len(dbids),
+                   _path)
 
 
 
@@ -332,5 +348,5 @@ def write_olx(self: "Category", file_path: str, pretty=False, course=True):
     Returns:
         [type]: [description]
     """
-    tmp = _OlxExporter(self, pretty, course)
+    tmp = _OlxExporter(self, pretty)
     tmp.write(file_path)
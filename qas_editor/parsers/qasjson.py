@@ -0,0 +1,526 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Native save format. The whole model is converted to plain JSON values, so
+any class of the package can be stored without a writer of its own:
+- instances: {"$c": "module.Class", ...state}, plus "$i" when the same
+  instance is referenced again later as {"$r": id};
+- dicts with keys that are not strings, or that start with "$":
+  {"$d": [[key, value], ...]}. Tuples and sets use "$u" and "$s";
+- enums: {"$e": "module.Enum", "n": member name};
+- processors: {"$p": template, "args": args} or {"$p": None, "code": src};
+- sympy expressions: {"$x": srepr}.
+
+Processors written by hand (Proc.from_str) have no template, and their code
+is all there is to save, so it is stored as is and compiled again when the
+file is read. Only open files with such processors from trusted sources.
+
+Large banks can also be saved as a folder of JSON Lines shards, each line
+holding the category path and a single question, plus a manifest with the
+categories and the question count and sha256 of each shard. Saving again to
+the same folder only rewrites the shards whose questions changed.
+"""
+
+from __future__ import annotations
+
+import ast
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import weakref
+from enum import Enum
+from importlib import util
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Tuple
+
+from ..processors import Proc
+from ..utils import parallel_map
+
+if TYPE_CHECKING:
+    from ..category import Category
+
+EXTRAS_ORJSON = util.find_spec("orjson") is not None
+if EXTRAS_ORJSON:
+    import orjson
+
+_LOG = logging.getLogger(__name__)
+_PACKAGE = __package__.rsplit(".", 1)[0]
+_BUFFER = 1 << 16
+_MANIFEST = "manifest.json"
+# sympy classes built from a string by srepr. No other call may get one, as
+# some classes parse strings with sympify.
+_SREPR_TEXT = {"Symbol", "Dummy", "Wild", "Function", "Str", "Float",
+               "Integer", "Rational"}
+_CAT_SKIP = ("_Category__questions", "_Category__categories",
+             "_Category__parent")
+VERSION = 1
+# Questions in each shard of the last save of a tree, by id and path, with
+# the manifest entry of the shard as it was then
+_LAYOUTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _qualname(cls: type) -> str:
+    module = cls.__module__
+    if not module.startswith(_PACKAGE + "."):
+        raise TypeError(f"Can not serialize {cls} from outside the package")
+    return f"{module[len(_PACKAGE) + 1:]}.{cls.__qualname__}"
+
+
+def _custom_state(cls: type) -> bool:
+    return getattr(cls, "__getstate__", None) is not \
+        getattr(object, "__getstate__", None)
+
+
+class _Encoder:
+    """Converts the model to plain JSON values.
+    """
+
+    def __init__(self, hooks: Dict[type, Callable[[Any], dict]] = None):
+        self._seen: Dict[int, dict] = {}
+        self._stack = set()
+        self._refs = 0
+        self._hooks = hooks or {}
+
+    def encode(self, item) -> Any:
+        """Convert a single value, recursively.
+        """
+        if item is None or isinstance(item, (str, bool, int, float)):
+            return item
+        if isinstance(item, list):
+            return [self.encode(value) for value in item]
+        if isinstance(item, dict):
+            if all(isinstance(key, str) and key[:1] != "$" for key in item):
+                return {key: self.encode(value) for key, value in item.items()}
+            return {"$d": [[self.encode(key), self.encode(value)]
+                           for key, value in item.items()]}
+        if isinstance(item, tuple):
+            return {"$u": [self.encode(value) for value in item]}
+        if isinstance(item, (set, frozenset)):
+            return {"$s": [self.encode(value) for value in item]}
+        if isinstance(item, Enum):
+            return {"$e": _qualname(type(item)), "n": item.name}
+        if isinstance(item, Proc):
+            if item.source in Proc.TEMPLATES:
+                return {"$p": item.source, "args": self.encode(item.args)}
+            if item.source is None:
+                raise TypeError("Processor has no template or source")
+            return {"$p": None, "code": item.source}  # See the module doc
+        if hasattr(item, "free_symbols"):  # sympy, which is imported lazily
+            from sympy import srepr
+            return {"$x": srepr(item)}
+        for cls, hook in self._hooks.items():
+            if isinstance(item, cls):
+                return hook(item)
+        return self._encode_object(item)
+
+    def _encode_object(self, item) -> dict:
+        key = id(item)
+        if key in self._seen:
+            node = self._seen[key]
+            if "$i" not in node:
+                node["$i"] = self._refs
+                self._refs += 1
+            return {"$r": node["$i"]}
+        if key in self._stack:
+            raise ValueError(f"Reference cycle found in {item}")
+        self._stack.add(key)
+        cls = type(item)
+        state = item.__getstate__() if _custom_state(cls) else vars(item)
+        node = {"$c": _qualname(cls)}
+        for name, value in state.items():
+            if name != "__orig_class__":  # Set by typing generics
+                node[name] = self.encode(value)
+        self._stack.discard(key)
+        self._seen[key] = node
+        return node
+
+
+class _Decoder:
+    """Rebuilds the model from plain JSON values.
+    """
+
+    def __init__(self, hooks: Dict[str, Callable[[dict], Any]] = None):
+        self._refs: Dict[int, Any] = {}
+        self._classes: Dict[str, type] = {}
+        self._hooks = hooks or {}
+
+    def _class(self, name: str) -> type:
+        if name not in self._classes:
+            module, qualname = name.split(".", 1)
+            item = importlib.import_module(f"{_PACKAGE}.{module}")
+            for attr in qualname.split("."):
+                item = getattr(item, attr)
+            self._classes[name] = item
+        return self._classes[name]
+
+    def decode(self, item) -> Any:
+        """Convert a single value, recursively.
+        """
+        if isinstance(item, list):
+            return [self.decode(value) for value in item]
+        if not isinstance(item, dict):
+            return item
+        if "$c" in item:
+            return self._decode_object(item)
+        if "$r" in item:
+            return self._refs[item["$r"]]
+        if "$d" in item:
+            return {self.decode(key): self.decode(value)
+                    for key, value in item["$d"]}
+        if "$u" in item:
+            return tuple(self.decode(value) for value in item["$u"])
+        if "$s" in item:
+            return {self.decode(value) for value in item["$s"]}
+        if "$e" in item:
+            return self._class(item["$e"])[item["n"]]
+        if "$p" in item:
+            if item["$p"] is None:
+                return Proc.from_str(item["code"])
+            return Proc.from_template(item["$p"], self.decode(item["args"]))
+        if "$x" in item:
+            return _from_srepr(item["$x"])
+        for key, hook in self._hooks.items():
+            if key in item:
+                return hook(item)
+        return {key: self.decode(value) for key, value in item.items()}
+
+    def _decode_object(self, node: dict):
+        cls = self._class(node["$c"])
+        state = {key: self.decode(value) for key, value in node.items()
+                 if key[:1] != "$"}
+        item = cls.__new__(cls)
+        if hasattr(item, "__setstate__"):
+            item.__setstate__(state)
+        else:
+            item.__dict__.update(state)
+        if "$i" in node:
+            self._refs[node["$i"]] = item
+        return item
+
+
+def _from_srepr(text: str):
+    """Rebuilds a sympy expression from its srepr. Unlike sympify, which
+    evaluates any Python code, only calls to sympy classes with literal
+    arguments are accepted.
+    """
+    import sympy
+    tree = ast.parse(text, mode="eval")
+    texts = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in _SREPR_TEXT:
+            texts.update(id(arg) for arg in node.args)
+            texts.update(id(arg.value) for arg in node.keywords)
+    names = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            value = getattr(sympy, node.id, None)
+            if node.id[:1] == "_" or not (isinstance(value, sympy.Basic) or
+                                          isinstance(value, type) and
+                                          issubclass(value, (sympy.Basic,
+                                                     sympy.MatrixBase))):
+                raise ValueError(f"Not a sympy class: {node.id}")
+            names[node.id] = value
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, (str, bytes)) and id(node) not in texts:
+                raise ValueError(f"Unexpected text in expression: {text}")
+        elif not isinstance(node, (ast.Expression, ast.Call, ast.keyword,
+                                   ast.Tuple, ast.List, ast.UnaryOp,
+                                   ast.USub, ast.Load)):
+            raise ValueError(f"Not a sympy expression: {text}")
+    return eval(compile(tree, "<srepr>", "eval"),  # pylint: disable=W0123
+                {"__builtins__": {}}, names)
+
+
+def _dumps(data) -> bytes:
+    if EXTRAS_ORJSON:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, check_circular=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes):
+    return orjson.loads(data) if EXTRAS_ORJSON else json.loads(data)
+
+
+def to_json(item, hooks: Dict[type, Callable[[Any], dict]] = None) -> Any:
+    """Convert an instance of the model to plain JSON values.
+    Args:
+        item: the instance.
+        hooks (dict, optional): functions used to encode instances of the
+            given classes instead of the default one. They should return a
+            dict with a marker key starting with "$".
+    """
+    return _Encoder(hooks).encode(item)
+
+
+def from_json(data, hooks: Dict[str, Callable[[dict], Any]] = None) -> Any:
+    """Rebuild an instance of the model from plain JSON values.
+    Args:
+        data: the plain values.
+        hooks (dict, optional): functions used to decode the dicts with the
+            given marker key, as written by the to_json hooks.
+    """
+    return _Decoder(hooks).decode(data)
+
+
+# -----------------------------------------------------------------------------
+
+
+def read_json(cls, file_path: str) -> "Category":
+    """Read a category saved with write_json.
+    """
+    with open(file_path, "rb") as ifile:
+        data = ifile.read()
+    data = _loads(data)
+    if not isinstance(data, dict) or data.get("qas-json") != VERSION:
+        raise ValueError(f"File {file_path} is not a QAS JSON file")
+    top_quiz = from_json(data["root"])
+    if not isinstance(top_quiz, cls):
+        raise TypeError(f"File {file_path} does not contain a {cls.__name__}")
+    _LOG.debug("Parsed %s questions from %s.", top_quiz.get_size(True),
+               file_path)
+    return top_quiz
+
+
+def write_json(self: "Category", file_path: str, pretty=False):
+    """Save the category, with all its questions and sub-categories.
+    """
+    data = {"qas-json": VERSION, "root": to_json(self)}
+    if EXTRAS_ORJSON:
+        with open(file_path, "wb") as ofile:
+            ofile.write(orjson.dumps(data, option=orjson.OPT_INDENT_2
+                                     if pretty else 0))
+        return
+    encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False,
+                               indent=2 if pretty else None,
+                               separators=None if pretty else (",", ":"))
+    with open(file_path, "w", encoding="utf-8", buffering=_BUFFER) as ofile:
+        for chunk in encoder.iterencode(data):
+            ofile.write(chunk)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _walk(cat: "Category", path: List[str]) -> Iterator[Tuple[list, "Category"]]:
+    path = path + [cat.name]
+    yield path, cat
+    for name in cat:
+        yield from _walk(cat[name], path)
+
+
+def _read_manifest(folder: str) -> dict:
+    with open(os.path.join(folder, _MANIFEST), "rb") as ifile:
+        data = _loads(ifile.read())
+    if not isinstance(data, dict) or data.get("qas-jsonl") != VERSION:
+        raise ValueError(f"Folder {folder} has no valid QAS JSONL manifest")
+    return data
+
+
+def _write_manifest(folder: str, data: dict):
+    with open(os.path.join(folder, _MANIFEST), "wb") as ofile:
+        ofile.write(_dumps(data))
+
+
+def _shard_name(index: int) -> str:
+    return f"{index:05d}.jsonl"
+
+
+def _write_shards(folder: str, items: Iterator[Tuple[list, Any]],
+                  shards: List[dict], shard_size: int):
+    """Append the (path, question) items to the shards, filling the last one
+    before creating new ones. The shard entries are updated in place.
+    """
+    ofile = digest = None
+    try:
+        for path, question in items:
+            if ofile is None or shards[-1]["count"] >= shard_size:
+                if ofile is not None:
+                    ofile.close()
+                    shards[-1]["sha256"] = digest.hexdigest()
+                if not shards or shards[-1]["count"] >= shard_size:
+                    name = _shard_name(len(shards))
+                    shards.append({"name": name, "count": 0, "sha256": None})
+                    digest = hashlib.sha256()
+                else:  # Appending to the last shard, which was not full
+                    digest = hashlib.sha256()
+                    with open(os.path.join(folder, shards[-1]["name"]),
+                              "rb") as ifile:
+                        for chunk in iter(lambda: ifile.read(_BUFFER), b""):
+                            digest.update(chunk)
+                ofile = open(os.path.join(folder, shards[-1]["name"]), "ab",
+                             buffering=_BUFFER)
+            line = _dumps({"path": path, "question": to_json(question)})
+            line += b"\n"
+            ofile.write(line)
+            digest.update(line)
+            shards[-1]["count"] += 1
+    finally:
+        if ofile is not None:
+            ofile.close()
+            shards[-1]["sha256"] = digest.hexdigest()
+
+
+def _write_shard(folder: str, name: str, items: List[Tuple[list, Any]]
+                 ) -> dict:
+    """Write a whole shard, replacing it if it exists.
+    """
+    digest = hashlib.sha256()
+    with open(os.path.join(folder, name), "wb", buffering=_BUFFER) as ofile:
+        for path, question in items:
+            line = _dumps({"path": path, "question": to_json(question)})
+            line += b"\n"
+            ofile.write(line)
+            digest.update(line)
+    return {"name": name, "count": len(items), "sha256": digest.hexdigest()}
+
+
+def _layout(items: List[Tuple[list, Any]]) -> tuple:
+    return tuple((id(question), tuple(path)) for path, question in items)
+
+
+def _read_shard(folder: str, shard: dict) -> List[Tuple[list, Any]]:
+    """Read a single shard. Module level so it can run in worker processes.
+    """
+    with open(os.path.join(folder, shard["name"]), "rb") as ifile:
+        data = ifile.read()
+    if hashlib.sha256(data).hexdigest() != shard["sha256"]:
+        raise ValueError(f"Shard {shard['name']} does not match its hash")
+    items = []
+    for line in data.splitlines():
+        line = _loads(line)
+        items.append((line["path"], from_json(line["question"])))
+    if len(items) != shard["count"]:
+        raise ValueError(f"Shard {shard['name']} has {len(items)} questions,"
+                         f" {shard['count']} expected")
+    return items
+
+
+def _add_categories(cls, top: "Category", categories: List[dict]):
+    """Create the categories listed in the manifest that are not in top yet.
+    Returns a map from their path to each category.
+    """
+    cats = {tuple(path): cat for path, cat in _walk(top, [])}
+    for item in categories:
+        path = tuple(item["path"])
+        if path in cats:
+            continue
+        cat = cls.__new__(cls)
+        state = from_json(item["state"])
+        state.update({"_Category__questions": [], "_Category__categories": {},
+                      "_Category__parent": None})
+        cat.__setstate__(state)
+        cats[path[:-1]].add_subcat(cat)
+        cats[path] = cat
+    return cats
+
+
+def read_jsonl_shards(cls, folder: str, jobs=1) -> "Category":
+    """Read a bank saved with write_jsonl_shards. Shards are read in worker
+    processes when jobs is not 1, and merged in the manifest order.
+    Args:
+        folder (str): folder with the manifest and the shards.
+        jobs (int, optional): number of processes. None uses all the CPUs.
+    """
+    manifest = _read_manifest(folder)
+    root = manifest["categories"][0]
+    top_quiz = cls.__new__(cls)
+    state = from_json(root["state"])
+    state.update({"_Category__questions": [], "_Category__categories": {},
+                  "_Category__parent": None})
+    top_quiz.__setstate__(state)
+    cats = _add_categories(cls, top_quiz, manifest["categories"][1:])
+    reader = functools.partial(_read_shard, folder)
+    layout = []
+    for shard, items in zip(manifest["shards"],
+                            parallel_map(reader, manifest["shards"], jobs)):
+        if isinstance(items, Exception):
+            raise ValueError(f"Failed to read {shard['name']}") from items
+        for path, question in items:
+            cats[tuple(path)].add_question(question)
+        layout.append((_layout(items), shard))
+    top_quiz.mark_saved(os.path.abspath(folder))
+    _LAYOUTS[top_quiz] = layout
+    _LOG.debug("Parsed %s questions from %s.", top_quiz.get_size(True), folder)
+    return top_quiz
+
+
+def write_jsonl_shards(self: "Category", folder: str, shard_size=1000):
+    """Save the category as a folder of JSON Lines shards, with at most
+    shard_size questions each. If the folder was the last output of this
+    category, shards whose questions are the same and are not dirty are
+    kept, unless their manifest entry changed since (as after
+    append_jsonl_shards). Any other shard of a previous save is replaced.
+    """
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.abspath(folder)
+    old, layout = [], None
+    if os.path.exists(os.path.join(folder, _MANIFEST)):
+        manifest = _read_manifest(folder)
+        old = manifest["shards"]
+        if self.saved_to == target and manifest["shard_size"] == shard_size:
+            layout = _LAYOUTS.get(self)
+    categories = []
+    for path, cat in _walk(self, []):
+        state = {key: val for key, val in cat.__getstate__().items()
+                 if key not in _CAT_SKIP}
+        categories.append({"path": path, "state": to_json(state)})
+    items = [(path, question) for path, cat in _walk(self, [])
+             for question in cat.questions]
+    shards, keys = [], []
+    for idx in range(0, len(items), shard_size):
+        chunk = items[idx: idx + shard_size]
+        keys.append(_layout(chunk))
+        pos = len(shards)
+        if layout is not None and pos < min(len(layout), len(old)) and \
+                layout[pos] == (keys[-1], old[pos]) and \
+                not any(question.dirty for _, question in chunk):
+            shards.append(old[pos])
+        else:
+            shards.append(_write_shard(folder, _shard_name(pos), chunk))
+        keys[-1] = (keys[-1], shards[-1])
+    for shard in old[len(shards):]:
+        os.remove(os.path.join(folder, shard["name"]))
+    _write_manifest(folder, {"qas-jsonl": VERSION, "shard_size": shard_size,
+                             "categories": categories, "shards": shards})
+    self.mark_saved(target)
+    _LAYOUTS[self] = keys
+
+
+def append_jsonl_shards(self: "Category", folder: str):
+    """Append the questions of this category to a bank saved with
+    write_jsonl_shards, without rewriting it. Only the last shard is read
+    (to update its hash), and the categories are matched by path from the
+    bank root. The name of this category is replaced by the name of that
+    root, so the questions of this category go to the root of the bank.
+    """
+    manifest = _read_manifest(folder)
+    known = {tuple(item["path"][1:]) for item in manifest["categories"]}
+    root = manifest["categories"][0]["path"][0]
+    for path, cat in _walk(self, []):
+        if tuple(path[1:]) not in known:
+            state = {key: val for key, val in cat.__getstate__().items()
+                     if key not in _CAT_SKIP}
+            manifest["categories"].append({"path": [root] + path[1:],
+                                           "state": to_json(state)})
+    items = (([root] + path[1:], question) for path, cat in _walk(self, [])
+             for question in cat.questions)
+    _write_shards(folder, items, manifest["shards"], manifest["shard_size"])
+    _write_manifest(folder, manifest)
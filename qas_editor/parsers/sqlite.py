@@ -0,0 +1,453 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+SQLite question bank. Only the category tree is loaded when a bank is
+opened. The questions of a category are loaded when it is first used, and
+their bodies and files only when accessed, so the memory used depends on
+what is open and not on the size of the bank. Changes are written back in a
+single transaction by write_sqlite.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import weakref
+from typing import Dict, List, Set, Tuple
+
+from ..category import Category
+from ..question import QQuestion
+from ..utils import File
+from .qasjson import from_json, to_json
+
+_LOG = logging.getLogger(__name__)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY, parent INTEGER, position INTEGER NOT NULL,
+    name TEXT NOT NULL, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY, category INTEGER NOT NULL,
+    position INTEGER NOT NULL, dbid INTEGER, name TEXT NOT NULL,
+    tags TEXT NOT NULL, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS bodies (
+    question INTEGER PRIMARY KEY, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, state TEXT NOT NULL, data TEXT);
+CREATE INDEX IF NOT EXISTS questions_category ON questions (category);
+"""
+_CAT_SKIP = ("_Category__questions", "_Category__categories",
+             "_Category__parent")
+_LAZY = ("_body", "_feedback", "_procs", "_notes")
+_EAGER_SKIP = ("_name", "_tags", "dbid", "_QQuestion__parent",
+               "_dirty") + _LAZY
+
+
+def _cat_state(cat: Category) -> dict:
+    """Attributes of the category itself, without questions or children.
+    """
+    state = cat.__dict__ if isinstance(cat, _SqlCategory) else \
+        cat.__getstate__()
+    return {key: val for key, val in state.items() if key not in _CAT_SKIP
+            and key not in ("_bank", "_rowid", "_loaded", "_dirty",
+                            "_saved_to")}
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, check_circular=False,
+                      separators=(",", ":"))
+
+
+class _SqlFile(File):
+    """File whose data is only read from the bank when used.
+    """
+
+    def _get_data(self):
+        if self._data is None and self._bank is not None:
+            self._data = self._bank.load_file(self._rowid)
+        return self._data
+
+    def _set_data(self, value):
+        self._data = value
+        self._modified = True
+
+    data = property(_get_data, _set_data)
+
+    def __getstate__(self):
+        state = {key: val for key, val in self.__dict__.items()
+                 if key not in ("_bank", "_rowid", "_modified", "_data")}
+        state["data"] = self.data
+        return state
+
+    def __setstate__(self, state: dict):
+        self._bank = self._rowid = None
+        self._data = state.pop("data")
+        self._modified = False
+        self.__dict__.update(state)
+
+
+def _lazy(attr: str):
+    def _get(self):
+        if self._state is None:
+            self._load()
+        return self._state[attr]
+
+    def _set(self, value):
+        if self._state is None:
+            if self._rowid is not None:
+                self._load()
+            else:
+                self._state = {}
+        self._state[attr] = value
+    return property(_get, _set)
+
+
+class _SqlQuestion(QQuestion):
+    """Question whose body, feedbacks, processors and notes are only read
+    from the bank when accessed.
+    """
+
+    _body = _lazy("_body")
+    _feedback = _lazy("_feedback")
+    _procs = _lazy("_procs")
+    _notes = _lazy("_notes")
+
+    def _load(self):
+        self._state = self._bank.load_body(self._rowid)
+        for text in self._texts():
+            text.mark_saved()
+
+    @property
+    def dirty(self) -> bool:
+        return super().dirty if self._state is not None else self._dirty
+
+    @property
+    def loaded(self) -> bool:
+        """If the body was already read from the bank.
+        """
+        return self._state is not None
+
+    def mark_saved(self):
+        if self._state is not None:
+            super().mark_saved()
+        self._dirty = False
+
+    def __getstate__(self):
+        state = {key: val for key, val in self.__dict__.items()
+                 if key not in ("_bank", "_rowid", "_state", "_dirty")}
+        for attr in _LAZY:
+            state[attr] = getattr(self, attr)
+        state["_QQuestion__parent"] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self._bank = self._rowid = None
+        self._state = {attr: state.pop(attr) for attr in _LAZY}
+        self.__dict__.update(state)
+
+
+class _SqlCategory(Category):
+    """Category whose questions are only read from the bank when used.
+    """
+
+    def _get_questions(self):
+        if self._loaded is None:
+            self._loaded = self._bank.load_questions(self)
+        return self._loaded
+
+    def _set_questions(self, value):
+        self._loaded = value
+
+    _Category__questions = property(_get_questions, _set_questions)
+
+    @property
+    def loaded(self) -> bool:
+        """If the questions were already read from the bank.
+        """
+        return self._loaded is not None
+
+    def _in_memory(self):
+        return self._loaded or (), self._Category__categories.values()
+
+    def __getstate__(self):
+        state = {key: val for key, val in self.__dict__.items()
+                 if key not in ("_bank", "_rowid", "_loaded", "_dirty",
+                                "_saved_to")}
+        state["_Category__questions"] = self._get_questions()
+        state["_Category__parent"] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self._bank = self._rowid = None
+        self._loaded = state.pop("_Category__questions")
+        super().__setstate__(state)
+
+
+class _Bank:
+    """Connection to a bank file and the rows of the instances it read or
+    wrote, so they can be updated in place on the next save. Instances are
+    only weakly referenced, so the ones dropped by the user are freed.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+        self._rows: Dict[int, Tuple[weakref.ref, int]] = {}
+        self._files: Dict[int, _SqlFile] = weakref.WeakValueDictionary()
+        self._cat_questions: Dict[int, Set[int]] = {}
+
+    def _rowid(self, item) -> int:
+        row = self._rows.get(id(item))
+        return row[1] if row is not None and row[0]() is item else None
+
+    def _remember(self, item, rowid: int):
+        key = id(item)
+
+        def _drop(ref):
+            if self._rows.get(key, (None,))[0] is ref:
+                del self._rows[key]
+        self._rows[key] = (weakref.ref(item, _drop), rowid)
+
+    def _file_hook(self, node: dict) -> _SqlFile:
+        rowid = node["$f"]
+        if rowid in self._files:
+            return self._files[rowid]
+        state, = self.conn.execute("SELECT state FROM files WHERE id=?",
+                                   (rowid,)).fetchone()
+        item = _SqlFile.__new__(_SqlFile)
+        item.__dict__.update(from_json(json.loads(state)))
+        item._bank, item._rowid = self, rowid
+        item._data, item._modified = None, False
+        self._remember(item, rowid)
+        self._files[rowid] = item
+        return item
+
+    def load_body(self, rowid: int) -> dict:
+        """Read the lazy part of a question.
+        """
+        state, = self.conn.execute("SELECT state FROM bodies WHERE question=?",
+                                   (rowid,)).fetchone()
+        return from_json(json.loads(state), {"$f": self._file_hook})
+
+    def load_file(self, rowid: int) -> str:
+        """Read the data of a file.
+        """
+        return self.conn.execute("SELECT data FROM files WHERE id=?",
+                                 (rowid,)).fetchone()[0]
+
+    def load_questions(self, cat: _SqlCategory) -> List[_SqlQuestion]:
+        """Read the question stubs of a category. Bodies are read later.
+        """
+        questions = []
+        rows = self.conn.execute("SELECT id, dbid, name, tags, state FROM "
+                                 "questions WHERE category=? ORDER BY "
+                                 "position", (cat._rowid,))
+        for rowid, dbid, name, tags, state in rows:
+            question = _SqlQuestion.__new__(_SqlQuestion)
+            question.__dict__.update(from_json(json.loads(state)))
+            question.dbid = dbid
+            question._name = from_json(json.loads(name))
+            question._tags = json.loads(tags)
+            question._bank, question._rowid = self, rowid
+            question._state = None
+            question._dirty = False
+            question._set_parent(cat)
+            self._remember(question, rowid)
+            questions.append(question)
+        self._cat_questions[cat._rowid] = {item._rowid for item in questions}
+        return questions
+
+    def load_tree(self) -> _SqlCategory:
+        """Read the category tree, without any question.
+        """
+        cats: Dict[int, _SqlCategory] = {}
+        rows = self.conn.execute("SELECT id, parent, state FROM categories "
+                                 "ORDER BY parent, position").fetchall()
+        for rowid, _, state in rows:
+            cat = _SqlCategory.__new__(_SqlCategory)
+            cat.__dict__.update(from_json(json.loads(state)))
+            cat.__dict__.update({"_Category__categories": {},
+                                 "_Category__parent": None})
+            cat._bank, cat._rowid, cat._loaded = self, rowid, None
+            cat._dirty = False
+            cats[rowid] = cat
+            self._remember(cat, rowid)
+        top = None
+        for rowid, parent, _ in rows:
+            if parent is None:
+                top = cats[rowid]
+            else:
+                cats[parent].add_subcat(cats[rowid])
+        if top is None:
+            raise ValueError(f"Bank {self.path} has no categories")
+        top._saved_to = self.path
+        return top
+
+    def _encode_file(self, item: File) -> dict:
+        rowid = self._rowid(item)
+        if rowid is None:
+            state = {key: val for key, val in item.__getstate__().items()
+                     if key != "data"}  # Also reads deferred data
+            rowid = self.conn.execute(
+                "INSERT INTO files (state, data) VALUES (?, ?)",
+                (_dumps(to_json(state)), item.data)).lastrowid
+            self._remember(item, rowid)
+        elif isinstance(item, _SqlFile) and item._modified:
+            self.conn.execute("UPDATE files SET data=? WHERE id=?",
+                              (item._data, rowid))
+            item._modified = False
+        return {"$f": rowid}
+
+    def _save_question(self, question: QQuestion, cat_id: int, pos: int,
+                       updates: list, bodies: list, clean: bool) -> int:
+        hooks = {File: self._encode_file}
+        if isinstance(question, _SqlQuestion) and not question.loaded and \
+                question._bank is not self:
+            question._load()    # Its body is only in the bank it came from
+        if isinstance(question, _SqlQuestion):
+            state = question.__getstate__() if question.loaded else \
+                dict(question.__dict__)
+        else:
+            state = question.__getstate__()
+        eager = {key: val for key, val in state.items()
+                 if key not in _EAGER_SKIP and
+                 key not in ("_bank", "_rowid", "_state")}
+        row = (cat_id, pos, question.dbid, _dumps(to_json(question.name)),
+               _dumps(question.tags), _dumps(to_json(eager)))
+        rowid = self._rowid(question)
+        new = rowid is None
+        if new:
+            rowid = self.conn.execute(
+                "INSERT INTO questions (category, position, dbid, name, tags, "
+                "state) VALUES (?, ?, ?, ?, ?, ?)", row).lastrowid
+            self._remember(question, rowid)
+        else:
+            updates.append(row + (rowid,))
+        if isinstance(question, _SqlQuestion) and not question.loaded:
+            pass  # The body in the bank is still the current one
+        elif new or not clean or question.dirty:
+            body = {attr: state[attr] for attr in _LAZY}
+            bodies.append((rowid, _dumps(to_json(body, hooks))))
+        return rowid
+
+    def save(self, top: Category):
+        """Write the changes of the tree in a single transaction. Categories
+        of this bank whose questions were never loaded are not touched, and
+        neither are the bodies of questions that are not dirty. Categories
+        and bodies of other banks are read from them and copied.
+        """
+        clean = top.saved_to == self.path
+        updates, bodies = [], []
+        keep_cats: Set[int] = set()
+        kept: Set[int] = set()
+        loaded: Dict[int, Set[int]] = {}
+        with self.conn:
+            stack = [(top, None, 0)]
+            while stack:
+                cat, parent, pos = stack.pop()
+                row = (parent, pos, cat.name, _dumps(to_json(_cat_state(cat))))
+                rowid = self._rowid(cat)
+                if rowid is None:
+                    rowid = self.conn.execute(
+                        "INSERT INTO categories (parent, position, name, "
+                        "state) VALUES (?, ?, ?, ?)", row).lastrowid
+                    self._remember(cat, rowid)
+                else:
+                    self.conn.execute("UPDATE categories SET parent=?, "
+                                      "position=?, name=?, state=? WHERE "
+                                      "id=?", row + (rowid,))
+                keep_cats.add(rowid)
+                if not isinstance(cat, _SqlCategory) or cat.loaded or \
+                        cat._bank is not self:
+                    loaded[rowid] = {
+                        self._save_question(question, rowid, idx, updates,
+                                            bodies, clean)
+                        for idx, question in enumerate(cat.questions)}
+                    kept.update(loaded[rowid])
+                for idx, name in enumerate(cat):
+                    stack.append((cat[name], rowid, idx))
+            self.conn.executemany("UPDATE questions SET category=?, "
+                                  "position=?, dbid=?, name=?, tags=?, "
+                                  "state=? WHERE id=?", updates)
+            self.conn.executemany("INSERT OR REPLACE INTO bodies (question, "
+                                  "state) VALUES (?, ?)", bodies)
+            removed = [(rowid,) for cat in loaded
+                       for rowid in self._cat_questions.get(cat, ())
+                       if rowid not in kept]
+            self.conn.executemany("DELETE FROM bodies WHERE question=?",
+                                  removed)
+            self.conn.executemany("DELETE FROM questions WHERE id=?", removed)
+            old = [row for row in self.conn.execute("SELECT id FROM "
+                   "categories").fetchall() if row[0] not in keep_cats]
+            self.conn.executemany("DELETE FROM bodies WHERE question IN ("
+                                  "SELECT id FROM questions WHERE "
+                                  "category=?)", old)
+            self.conn.executemany("DELETE FROM questions WHERE category=?",
+                                  old)
+            self.conn.executemany("DELETE FROM categories WHERE id=?", old)
+        self._cat_questions.update(loaded)
+        top.mark_saved(self.path)
+        _LOG.debug("Saved %s questions and %s categories to %s.",
+                   len(kept), len(keep_cats), self.path)
+
+
+# -----------------------------------------------------------------------------
+
+
+def read_sqlite(cls, file_path: str) -> "Category":
+    """Open a bank. Only the categories are read, questions are read when
+    their category is used.
+    """
+    if not os.path.isfile(file_path):
+        raise ValueError(f"Bank {file_path} does not exist")
+    return _Bank(file_path).load_tree()
+
+
+def _is_bank(file_path: str) -> bool:
+    conn = sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)
+    try:
+        names = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'")}
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return {"categories", "questions", "bodies", "files"} <= names
+
+
+def write_sqlite(self: "Category", file_path: str, overwrite: bool = False):
+    """Save the category to a bank. If it was opened from the same bank,
+    only the changes are written. Otherwise the bank is created from scratch.
+    Args:
+        file_path (str): path of the bank.
+        overwrite (bool, optional): replace a file that already exists at
+            file_path. Not needed for the bank this category was last saved
+            to. Defaults to False.
+    """
+    path = os.path.abspath(file_path)
+    bank = getattr(self, "_bank", None)
+    if bank is None or bank.path != path:
+        if os.path.exists(file_path):
+            if not overwrite and (self.saved_to != path or
+                                  not _is_bank(file_path)):
+                raise FileExistsError(f"{file_path} already exists and is "
+                                      "not the bank of this category")
+            os.remove(file_path)
+        bank = _Bank(file_path)
+    bank.save(self)
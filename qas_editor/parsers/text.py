@@ -20,15 +20,17 @@
 from __future__ import annotations
 
 import base64
+import copy
 import logging
 import os
 import shutil
 import subprocess
+import sys
 import tempfile
 from html import parser, unescape
 from importlib import util
 from io import BytesIO, TextIOWrapper
-from typing import Dict, List
+from typing import Callable, Dict, Hashable, List
 from urllib import parse
 from xml.sax import saxutils
 
@@ -36,15 +38,18 @@
 from ..utils import File, ParseError
 
 EXTRAS_FORMULAE = util.find_spec("sympy") is not None
-if EXTRAS_FORMULAE:
-    from matplotlib import figure, font_manager, mathtext
-    from matplotlib.backends import backend_agg
-    from pyparsing import ParseFatalException  # Part of matplotlib package
-    from sympy import Expr, printing
 
 _LOG = logging.getLogger(__name__)
 
 
+def _is_expr(item) -> bool:
+    """Check if item is a sympy expression without importing sympy. If it
+    was not imported yet, no expression could have been created anyway.
+    """
+    sympy = sys.modules.get("sympy")
+    return sympy is not None and isinstance(item, sympy.Expr)
+
+
 _latex_cache: Dict[str, str] = {}
 def render_latex(latex: str, path: str, scale=1.0):
     """TODO optimize. It has just too many calls. But at least it works...
@@ -78,6 +83,11 @@ def run_me(cmd):
             shutil.move(f"{path}/{name}", ".")
             res = f"{path}/{name}"
     elif EXTRAS_FORMULAE:
+        # Imported here since matplotlib alone takes longer to import than
+        # the whole package.
+        from matplotlib import figure, font_manager, mathtext
+        from matplotlib.backends import backend_agg
+        from pyparsing import ParseFatalException  # Part of matplotlib
         try:
             prop = font_manager.FontProperties(size=12)
             dpi = 120 * scale
@@ -364,42 +374,112 @@ def parse(self, data: str|TextIOWrapper) -> None:
 
 
 class FText:
-    """A formatted text.
+    """A formatted text. Instances created by <code>share</code> reuse the
+    same parsed fragment, which is only copied when a mutable view is
+    requested (copy-on-write).
     """
 
+    _dirty = True  # Default for instances restored from older states
+
     def __init__(self, parser: Parser|str = None, files: List[File] = None):
         self._text = []
         self._files = files if files is not None else []
+        self._shared = False
+        self._dirty = True
         if parser is not None:
             self.add(parser)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_dirty", None)  # Restored instances are dirty
+        return state
+
     def __iter__(self):
+        if not all(isinstance(item, str) for item in self._text):
+            self._unshare()  # Items handed out can be changed in place
+            self._dirty = True
         return iter(self._text)
 
     def __len__(self):
         return len(self._text)
 
     def __getitem__(self, idx: int):
-        return self._text[idx] 
+        if isinstance(self._text[idx], str):
+            return self._text[idx]
+        self._unshare()
+        self._dirty = True
+        return self._text[idx]
 
     @property
     def files(self):
-        """Files referenced in this FText instance.
+        """Files referenced in this FText instance. Accessing it marks the
+        instance as dirty, since the list can be modified.
         """
+        self._unshare()
+        self._dirty = True
         return self._files
 
     @files.setter
     def files(self, value):
         if isinstance(value, list):
+            self._unshare()
             self._files = value
+            self._dirty = True
+
+    @property
+    def dirty(self) -> bool:
+        """If the text may have changed since it was last saved.
+        """
+        return self._dirty
+
+    @property
+    def shared(self) -> bool:
+        """If the parsed fragment is still shared with other instances.
+        """
+        return self._shared
 
     @property
     def text(self) -> list:
         """A list of strings, file references, questions and math expressions 
-        (if EXTRAS_FORMULAE).
+        (if EXTRAS_FORMULAE). Since the list can be modified, accessing it
+        gives this instance its own copy of a shared fragment and marks it as
+        dirty. Iterate the instance itself to only read it. Items other than
+        strings are mutable, so handing them out also marks it as dirty.
         """
+        self._unshare()
+        self._dirty = True
         return self._text
 
+    def _unshare(self):
+        if not self._shared:
+            return
+        memo = {id(file): file for file in self._files}
+        self._text = copy.deepcopy(self._text, memo)
+        self._files = list(self._files)
+        self._shared = False
+
+    def share(self) -> FText:
+        """Return a new instance that reuses the parsed fragment of this one.
+        Both are marked as shared, so the first of them to be modified gets
+        its own copy of the fragment.
+        """
+        item = FText.__new__(FText)
+        item._text = self._text
+        item._files = self._files
+        item._shared = self._shared = True
+        item._dirty = True
+        return item
+
+    def touch(self):
+        """Mark the text as changed.
+        """
+        self._dirty = True
+
+    def mark_saved(self):
+        """Clear the dirty flag. Called by the writers after saving.
+        """
+        self._dirty = False
+
     @staticmethod
     def to_string(item, path: str, otype: Platform, ttype: TextFormat) -> str:
         """_summary_
@@ -418,7 +498,8 @@ def to_string(item, path: str, otype: Platform, ttype: TextFormat) -> str:
             res = chr(item.MARKER_INT)
         elif isinstance(item, LinkRef):
             res = item.get(path, otype)
-        elif EXTRAS_FORMULAE and isinstance(item, Expr):
+        elif EXTRAS_FORMULAE and _is_expr(item):
+            from sympy import printing
             if ttype == TextFormat.PLAIN:
                 res = str(printing.pretty(item))
             elif ttype in (TextFormat.LATEX, TextFormat.MD):
@@ -456,6 +537,8 @@ def get(self, mtype=MathType.ASCII, ftype=FileAddr.LOCAL,
         return data
 
     def add(self, parser: Parser|str):
+        self._unshare()
+        self._dirty = True
         if isinstance(parser, str):
             self._text.append(parser)
         else:
@@ -465,3 +548,55 @@ def add(self, parser: Parser|str):
                     if file not in self._files:
                         self._files.append(file)
 
+
+class FTextPool:
+    """Flyweight pool used by the readers. Banks usually repeat the same
+    feedbacks, options and tags across many questions, so each distinct
+    fragment is parsed and stored once, and the questions receive shared
+    <code>FText</code> instances (see <code>FText.share</code>).
+    """
+
+    def __init__(self, enabled: bool = True, limit: int = None):
+        """
+        Args:
+            enabled (bool, optional): if False, nothing is shared.
+            limit (int, optional): maximum number of fragments kept. The
+                oldest are dropped past it, which bounds the memory used by
+                streaming readers. None keeps all of them.
+        """
+        self.enabled = enabled
+        self.limit = limit
+        self._ftexts: Dict[Hashable, FText] = {}
+
+    def __len__(self):
+        return len(self._ftexts)
+
+    def clear(self):
+        """Drop the pooled fragments. Instances already handed out are kept.
+        """
+        self._ftexts.clear()
+
+    def ftext(self, key: Hashable, factory: Callable[[], FText]) -> FText:
+        """Return a shared instance of the fragment identified by key. The
+        factory is only called the first time the key is seen.
+        Args:
+            key (Hashable): what identifies the fragment, usually the format
+                and the raw text.
+            factory (Callable[[], FText]): creates the fragment.
+        """
+        if not self.enabled:
+            return factory()
+        proto = self._ftexts.get(key)
+        if proto is None:
+            if self.limit is not None and len(self._ftexts) >= self.limit:
+                del self._ftexts[next(iter(self._ftexts))]
+            proto = self._ftexts[key] = factory()
+        return proto.share()
+
+    def tags(self, tags: List[str]) -> List[str]:
+        """Interned copy of a list of tags. The list itself is not shared,
+        since questions modify their tags in place.
+        """
+        if not self.enabled:
+            return list(tags)
+        return [sys.intern(tag) for tag in tags]
@@ -28,6 +28,7 @@
 from __future__ import annotations
 
 import ast
+import functools
 import inspect
 import re
 import types
@@ -113,6 +114,21 @@ def processor(dbid, status):
 """
 
 
+@functools.lru_cache(maxsize=1024)
+def _compile(code: str) -> types.CodeType:
+    """Compiles the processor. Banks have many processors with the same code
+    (same template and args), so the code objects are cached.
+    """
+    the_code = compile(code, '<string>', 'exec')
+    item = None
+    for item in the_code.co_consts:
+        if hasattr(item, "co_name") and item.co_name == "processor":
+            break
+    if item is None:
+        raise ValueError("Function was not found. Is it called 'processor'?")
+    return item
+
+
 class Proc:
     """_summary_
     """
@@ -131,16 +147,26 @@ def __init__(self, func: Callable, args: dict = None, source: str = None) -> Non
         self.args = args
         self.source = source
 
+    def __getstate__(self):
+        # Functions compiled from code can not be pickled, but they can be
+        # rebuilt from their template or source.
+        state = self.__dict__.copy()
+        if self.source is not None:
+            del state["func"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if "func" not in state:
+            if self.source in self.TEMPLATES:
+                code = self.TEMPLATES[self.source].format(args=self.args)
+            else:
+                code = self.source
+            self.func = self._from(code)
+
     @staticmethod
     def _from(code: str):
-        the_code = compile(code, '<string>', 'exec')
-        item = None
-        for item in the_code.co_consts:
-            if hasattr(item, "co_name") and item.co_name == "processor":
-                break
-        if item is None:
-            raise ValueError("Function was not found. Is it called 'processor'?")
-        return types.FunctionType(item, globals())
+        return types.FunctionType(_compile(code), globals())
 
     def to_string(self):
         """_summary_
@@ -22,7 +22,7 @@
 import logging
 import random
 import re
-from typing import TYPE_CHECKING, Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
 
 from .answer import (ACalculated, Answer, ANumerical, DragGroup, DragImage,
                      DragItem, DropZone, EmbeddedItem, SelectOption,
@@ -48,6 +48,7 @@ class _Question:
     types of Questions.
     """
     QNAME = None
+    _dirty = True  # Default for instances restored from older states
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -79,11 +80,41 @@ def __init__(self, name="qstn", default_grade=1.0, question: FText = None,
         self._tags = TList[str](tags)
         self._free_hints = TList[FText](free_hints)
         self.__parent = None
+        self._dirty = True
         _LOG.debug("New question (%s) created.", self)
 
     def __str__(self) -> str:
         return f"{self.QNAME}: '{self.name}' @{hex(id(self))}"
 
+    def __getstate__(self):
+        # The parent links the question back to the whole tree. It is
+        # restored by the category that holds the question when unpickled.
+        state = self.__dict__.copy()
+        state["_Question__parent"] = None
+        state.pop("_dirty", None)  # Restored instances are dirty
+        return state
+
+    def _set_parent(self, value: Category):
+        self.__parent = value
+
+    @property
+    def dirty(self) -> bool:
+        """If the question changed since it was last saved.
+        """
+        return self._dirty
+
+    def touch(self):
+        """Mark the question and its categories as changed.
+        """
+        self._dirty = True
+        if self.__parent is not None:
+            self.__parent.touch()
+
+    def mark_saved(self):
+        """Clear the dirty flag. Called by the writers after saving.
+        """
+        self._dirty = False
+
     # question = FText.prop("_question", "Question text")
     # remarks = FText.prop("_remarks", "Solution or global feedback")
 
@@ -515,6 +546,8 @@ class QQuestion:
     Moodle, which was the previous one.
     """
 
+    _dirty = True  # Default for instances restored from older states
+
     def __init__(self, name: Dict[Language, str], dbid: int=None, tags: List[str]=None):
         """[summary]
         Args:
@@ -534,11 +567,51 @@ def __init__(self, name: Dict[Language, str], dbid: int=None, tags: List[str]=No
             self._feedback[key] = []
         self._tags = [] if tags is None else tags
         self.__parent = None
+        self._dirty = True
         _LOG.debug("New question (%s) created.", self)
 
     def __str__(self) -> str:
         return f"'{self.name}_{self.dbid}' @{hex(id(self))}"
 
+    def __getstate__(self):
+        # The parent links the question back to the whole tree. It is
+        # restored by the category that holds the question when unpickled.
+        state = self.__dict__.copy()
+        state["_QQuestion__parent"] = None
+        state.pop("_dirty", None)  # Restored instances are dirty
+        return state
+
+    def _set_parent(self, value: Category):
+        self.__parent = value
+
+    def _texts(self) -> Iterator[FText]:
+        yield from self._body.values()
+        for texts in self._feedback.values():
+            yield from texts
+
+    @property
+    def dirty(self) -> bool:
+        """If the question changed since it was last saved. Texts track their
+        own changes. Other attributes changed in place, like tags, need a
+        call to <code>touch</code>.
+        """
+        return self._dirty or any(text.dirty for text in self._texts())
+
+    def touch(self):
+        """Mark the question and its categories as changed.
+        """
+        self._dirty = True
+        if self.__parent is not None:
+            self.__parent.touch()
+
+    def mark_saved(self):
+        """Clear the dirty flags of the question and its texts. Called by the
+        writers after saving.
+        """
+        self._dirty = False
+        for text in self._texts():
+            text.mark_saved()
+
     @property
     def body(self) -> Dict[Language, FText]:
         """Question body
@@ -20,14 +20,23 @@
 from __future__ import annotations
 
 import base64
+import fnmatch
+import gc
+import hashlib
+import io
 import logging
 import mimetypes
+import mmap
 import os
+import pickle
 import re
+import sqlite3
 import unicodedata
+from concurrent import futures
 from enum import Enum
 from importlib import util
-from typing import Dict, Generic, Iterable, List, Tuple, TypeVar
+from typing import (Any, Callable, Dict, Generic, Iterable, List, Tuple,
+                    TypeVar)
 from urllib import request
 from xml.etree import ElementTree as et
 
@@ -57,35 +66,146 @@ def gen_hier(cls, top, category: str):
     return quiz
 
 
+def _pickled(func: Callable, item) -> bytes:
+    return pickle.dumps(func(item), pickle.HIGHEST_PROTOCOL)
+
+
+def _unpickle(data: bytes):
+    """Results are large trees where every object is alive, even with the
+    cycles of the parent links, so the collector would only slow down their
+    loading. It is paused meanwhile, and left as it was.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def parallel_map(func: Callable, items: list, jobs: int = 1) -> list:
+    """Call func for each item, in worker processes if jobs is not 1. Both
+    func and its arguments/results have to be picklable in that case.
+    Args:
+        func (Callable): a module level function with a single argument.
+        items (list): arguments of each call.
+        jobs (int, optional): number of processes. None uses all the CPUs.
+    Returns:
+        list: results in the same order as items. Calls that raised have the
+            exception in place of the result.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(items))
+    results = []
+    if jobs <= 1:
+        for item in items:
+            try:
+                results.append(func(item))
+            except Exception as err:  # pylint: disable=W0703
+                results.append(err)
+        return results
+    with futures.ProcessPoolExecutor(jobs) as pool:
+        tasks = [pool.submit(_pickled, func, item) for item in items]
+        for task in tasks:
+            err = task.exception()
+            results.append(_unpickle(task.result()) if err is None else err)
+    return results
+
+
+BLANK_LINE = re.compile(rb"\n\r?\n")
+
+
+def split_blocks(file_path: str, parts: int,
+                 border: re.Pattern = BLANK_LINE) -> List[Tuple[int, int]]:
+    """Splits a text file in about parts byte ranges, each cut right after
+    a match of border, so no block is shared by two ranges. The file is
+    mapped, and only searched around each cut.
+    Args:
+        file_path (str): path of the file.
+        parts (int): number of ranges wanted.
+        border (re.Pattern, optional): bytes pattern matching the end of a
+            block. Defaults to a blank line.
+    Returns:
+        List[Tuple[int, int]]: contiguous (start, end) ranges.
+    """
+    with open(file_path, "rb") as ifile:
+        size = os.fstat(ifile.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            step = max(size // max(parts, 1), 1)
+            ranges, start = [], 0
+            while start < size:
+                match = border.search(data, start + step)
+                end = size if match is None else match.end()
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+
+def read_block(file_path: str, start: int, end: int) -> io.TextIOWrapper:
+    """Text of a byte range given by split_blocks, with universal new lines
+    like a file opened in text mode.
+    """
+    with open(file_path, "rb") as ifile:
+        ifile.seek(start)
+        data = ifile.read(end - start)
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8")
+
+
+_FLUSH_PARTS = 4096
+
+
 def serialize_fxml(write, elem, short_empty, pretty, level=0):
-    """Serializes an XML root item, adding formating
+    """Serializes an XML root item, adding formating. The tree is walked
+    with an explicit stack, and the output is given to write in large chunks.
     """
-    tag = elem.tag
-    text = elem.text
-    if pretty:
-        write(level * "  ")
-    write(f"<{tag}")
-    for key, value in elem.attrib.items():
-        value = _escape_attrib_html(value)
-        write(f" {key}=\"{value}\"")
-    if (isinstance(text, str) and text) or text is not None or \
-            len(elem) or not short_empty:
-        if len(elem) and pretty:
-            write(">\n")
+    newline = "\n" if pretty else ""
+    parts = []
+    attribs = {}
+    stack = [elem]
+    while stack:
+        elem = stack.pop()
+        if elem.__class__ is str:                   # Closing tag and tail
+            parts.append(elem)
+            level -= 1
+            continue
+        tag = elem.tag
+        text = elem.text
+        indent = level * "  " if pretty else ""
+        attrib = elem.items()
+        if attrib:                                  # Repeat a lot in banks
+            items = tuple(attrib)
+            attrib = attribs.get(items)
+            if attrib is None:
+                attrib = attribs[items] = "".join([
+                    f" {key}=\"{_escape_attrib_html(value)}\""
+                    for key, value in items])
         else:
-            write(">")
-        write(_escape_cdata(text))
-        for child in elem:
-            serialize_fxml(write, child, short_empty, pretty, level+1)
-        if len(elem) and pretty:
-            write(level * "  ")
-        write(f"</{tag}>")
-    else:
-        write(" />")
-    if pretty:
-        write("\n")
-    if elem.tail:
-        write(_escape_cdata(elem.tail))
+            attrib = ""
+        if text is None:
+            text = ""
+        elif text.__class__ is not str or "&" in text or "<" in text or \
+                ">" in text:                        # Plain text is kept
+            text = _escape_cdata(text)
+        tail = _escape_cdata(elem.tail) if elem.tail else ""
+        if len(elem):
+            parts.append(f"{indent}<{tag}{attrib}>{newline}{text}")
+            stack.append(f"{indent}</{tag}>{newline}{tail}")
+            stack.extend(elem[::-1])
+            level += 1
+        elif short_empty and elem.text is None:
+            parts.append(f"{indent}<{tag}{attrib} />{newline}{tail}")
+        else:
+            parts.append(f"{indent}<{tag}{attrib}>{text}</{tag}>{newline}"
+                         f"{tail}")
+        if len(parts) > _FLUSH_PARTS:
+            write("".join(parts))
+            parts.clear()
+    if parts:
+        write("".join(parts))
 
 
 def _escape_cdata(data):
@@ -153,6 +273,166 @@ def clean_q_name(string: str):
 
 # -----------------------------------------------------------------------------
 
+_VOLATILE = ("_shared", "_dirty", "_saved_to", "_loader")
+
+
+class _Fingerprint(pickle.Pickler):
+    """Pickles the saved state of the items of this package, without the
+    flags that do not change what is written. Deferred files are not read,
+    their source stands for their data.
+    """
+
+    _PACKAGE = __name__.split(".", 1)[0]
+
+    def reducer_override(self, obj):
+        cls = type(obj)
+        if isinstance(obj, (type, Enum)) or \
+                not cls.__module__.startswith(self._PACKAGE):
+            return NotImplemented
+        if isinstance(obj, File):
+            state = vars(obj).copy()  # Its __getstate__ would read the data
+            if not obj.deferred:
+                state.pop("_source", None)
+            elif obj._source is None:
+                raise pickle.PicklingError(f"{obj.path} was not read yet")
+        else:
+            state = obj.__getstate__()
+        if isinstance(state, dict):
+            state = {key: val for key, val in state.items()
+                     if key not in _VOLATILE}
+        return object.__new__, (cls,), state
+
+
+class FragmentCache:
+    """Opt-in on-disk cache of the text a writer produces for each item,
+    shared between sessions. Entries are keyed by a fingerprint of the item
+    state (as saved, without its parent or change flags) plus the writer
+    name, version and options, so an item that changed, or a new writer
+    version, just misses. Use it as a context manager, the new entries are
+    stored on exit.
+    """
+
+    def __init__(self, path: str, writer: str, version: int, **options):
+        """
+        Args:
+            path (str): SQLite file holding the fragments. Created if needed.
+            writer (str): name of the writer.
+            version (int): version of the writer output. Bump it whenever
+                the writer changes what it outputs for the same item.
+            options: writer options that change the output.
+        """
+        self.path = path
+        self.hits = self.misses = 0
+        self._salt = hashlib.sha256(repr((writer, version,
+                                          sorted(options.items()))).encode()
+                                    ).digest()
+        self._new: List[Tuple[bytes, bytes, str]] = []
+        self._used: List[Tuple[bytes]] = []
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS fragments (key BLOB "
+                           "PRIMARY KEY, salt BLOB NOT NULL, data TEXT NOT "
+                           "NULL)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def fingerprint(self, item) -> bytes:
+        """Key of an item, or None if its state can not be pickled or it
+        has deferred files with no known source.
+        """
+        buffer = io.BytesIO()
+        try:
+            _Fingerprint(buffer, 4).dump(item)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+        return hashlib.sha256(self._salt + buffer.getvalue()).digest()
+
+    def get(self, item, build: Callable[[Any], str]) -> str:
+        """Cached text of the item. If missing, build(item) is called and its
+        result is stored when the cache is closed.
+        """
+        key = self.fingerprint(item)
+        if key is not None:
+            row = self._conn.execute("SELECT data FROM fragments WHERE key=?",
+                                     (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self._used.append((key,))
+                return row[0]
+        self.misses += 1
+        data = build(item)
+        if key is not None:
+            self._new.append((key, self._salt, data))
+            self._used.append((key,))
+        return data
+
+    def prune(self):
+        """Remove the entries of this writer and options that were not used
+        since the cache was opened. Call it after a full export.
+        """
+        with self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS used (key "
+                               "BLOB PRIMARY KEY)")
+            self._conn.executemany("INSERT OR IGNORE INTO used VALUES (?)",
+                                   self._used)
+            self._conn.execute("DELETE FROM fragments WHERE salt=? AND key "
+                               "NOT IN (SELECT key FROM used)", (self._salt,))
+            self._conn.execute("DELETE FROM used")
+
+    def close(self):
+        """Store the new entries and close the file.
+        """
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO fragments (key, "
+                                   "salt, data) VALUES (?, ?, ?)", self._new)
+        self._new.clear()
+        self._conn.close()
+        _LOG.debug("Fragment cache %s: %s hits, %s misses.", self.path,
+                   self.hits, self.misses)
+
+
+class QFilter:
+    """Questions wanted from a partial import. Readers that support it check
+    each question with what they know before parsing its body, so the ones
+    left out only cost the scan that finds them. Criteria left as None
+    accept all questions.
+    """
+
+    def __init__(self, path: str = None, tags: Iterable[str] = None,
+                 types: Iterable[str] = None, dbids: Iterable[int] = None):
+        """
+        Args:
+            path (str, optional): glob of the category path, like
+                "$course$/top/Algebra*". A "*" also matches a "/".
+            tags (Iterable[str], optional): questions with any of them.
+            types (Iterable[str], optional): Moodle type names, like
+                "multichoice" or "truefalse".
+            dbids (Iterable[int], optional): question ids.
+        """
+        self.path = path
+        self.tags = None if tags is None else frozenset(tags)
+        self.types = None if types is None else frozenset(types)
+        self.dbids = None if dbids is None else frozenset(dbids)
+
+    def match_path(self, path: str) -> bool:
+        """If questions of the category path can be accepted.
+        """
+        return self.path is None or fnmatch.fnmatchcase(path or "", self.path)
+
+    def accepts(self, path: str, qtype: str, tags: Iterable[str],
+                dbid: int) -> bool:
+        """If the question is wanted. A None type is not known by the
+        reader, and is not checked.
+        """
+        return (self.match_path(path) and
+                (self.types is None or qtype is None or qtype in self.types)
+                and (self.tags is None or not self.tags.isdisjoint(tags or ()))
+                and (self.dbids is None or dbid in self.dbids))
+
+
 class Compare:
     """An abstract class to be used as base for all serializable classes. Its
     main usage is to verify equality, and not to do the process itself.
@@ -161,7 +441,8 @@ class Compare:
     @staticmethod
     def _cmp_dict(itma: dict, itmb: dict, path: list):
         for key, value in itma.items():
-            if key in ("_QQuestion__parent", "_Category__parent"):
+            if key in ("_QQuestion__parent", "_Category__parent", "_shared",
+                       "_dirty", "_saved_to"):
                 continue
             path.append(str(key))
             Compare._itercmp(value, itmb.get(key), path)
@@ -253,6 +534,8 @@ class File:
         #Moodle            #QTI                #Relative paths
         "@@PLUGINFILE@@", "$IMS-CC-FILEBASE$", "", ".", ".."
     )
+    _loader: Callable[[], bytes] = None
+    _source: str = None
 
     def __init__(self, path: str, data: str = None, rpath: str="", **metadata):
         super().__init__()
@@ -288,6 +571,42 @@ def __eq__(self, __o: object) -> bool:
             return False
         return __o.path == self.path and __o._type and self._type
 
+    def __getattr__(self, name: str):
+        # Only reached for the data of deferred files, that is not set yet
+        if name == "data" and self.__dict__.get("_loader") is not None:
+            self.data = str(base64.b64encode(self._loader()), "utf-8")
+            self._loader = None
+            return self.data
+        raise AttributeError(name)
+
+    def __getstate__(self):
+        if self._loader is not None:   # The source may be gone when restored
+            self.get_data()
+        state = self.__dict__.copy()
+        state.pop("_loader", None)
+        state.pop("_source", None)
+        return state
+
+    def defer(self, loader: Callable[[], bytes], source: str = None):
+        """Make the file embedded, with data only read by loader when first
+        needed, either through <code>data</code> or get_data. Used for files
+        kept inside archives.
+        Args:
+            loader (Callable[[], bytes]): reads the data.
+            source (str, optional): identifies the data, like a hash of it,
+                so the file can be fingerprinted without being read.
+        """
+        self.__dict__.pop("data", None)
+        self._type = FileAddr.EMBEDDED
+        self._loader = loader
+        self._source = source
+
+    @property
+    def deferred(self) -> bool:
+        """If the data is still to be read by the loader.
+        """
+        return self._loader is not None
+
     def get_data(self):
         if self.data is None:
             if self._type == FileAddr.URL:
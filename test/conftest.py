@@ -0,0 +1,38 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Benchmarks compare timings and memory, which depend on the machine and its
+load, and build large banks. They are marked with <code>bench</code> and
+only run with <code>--bench</code> or QAS_BENCH=1.
+"""
+import os
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--bench", action="store_true", default=False,
+                     help="also run the benchmarks (marked bench)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--bench") or os.environ.get("QAS_BENCH") == "1":
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --bench")
+    for item in items:
+        if "bench" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,146 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+
+"""
+import os
+import zipfile
+
+from qas_editor import category, utils
+from qas_editor.parsers.text import FText, XItem
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_detect_text_formats():
+    detect = category.detect_format
+    assert detect(f"{TEST_PATH}/datasets/aiken/aiken_1.txt") == "Aiken"
+    assert detect(f"{TEST_PATH}/datasets/cloze/cloze.cloze") == "Cloze"
+    assert detect(f"{TEST_PATH}/datasets/gift/all.gift") == "GIFT"
+    assert detect(f"{TEST_PATH}/datasets/moodle/essay.xml") == "Moodle"
+    assert detect(f"{TEST_PATH}/datasets/anki/math.txt") is None
+
+
+def test_detect_ignores_extension(tmp_path):
+    with open(f"{TEST_PATH}/datasets/gift/essay.gift", "rb") as ifile:
+        data = ifile.read()
+    path = tmp_path / "essay.txt"
+    path.write_bytes(data)
+    assert category.detect_format(str(path)) == "GIFT"
+    path = tmp_path / "item.xml"
+    path.write_text("<?xml version='1.0'?>\n<assessmentItem identifier=\"a\"/>")
+    assert category.detect_format(str(path)) is None  # No QTI 2.1 reader
+
+
+def test_detect_archives(tmp_path):
+    path = str(tmp_path / "backup.mbz")
+    with zipfile.ZipFile(path, "w") as ofile:
+        ofile.write(f"{TEST_PATH}/datasets/moodle/essay.xml", "questions.xml")
+    assert category.detect_format(path) == "Moodle Backup"
+    assert category.detect_format(f"{TEST_PATH}/datasets/olx/test.tar.xz") == "OLX"
+    assert category.detect_format(f"{TEST_PATH}/datasets/ims/qti2v1.zip") is None
+    assert "(*.mbz)" in category.EXTS and "(*.mbz)" not in category.WRITE_EXTS
+
+
+def test_read_files_single_reader(monkeypatch):
+    calls = []
+    read_gift = category.Category.read_gift.__func__
+    def _read_gift(cls, file_path):
+        calls.append(file_path)
+        return read_gift(cls, file_path)
+    monkeypatch.setattr(category.Category, "read_gift",
+                        classmethod(_read_gift))
+    files = [f"{TEST_PATH}/datasets/gift/essay.gift",
+             f"{TEST_PATH}/datasets/aiken/aiken_1.txt",
+             f"{TEST_PATH}/datasets/anki/math.txt"]
+    control = category.Category.read_files(files)
+    assert calls == files[:1]
+    assert control.get_size(True) > 0
+
+
+def test_read_files_jobs():
+    files = [f"{TEST_PATH}/datasets/gift/essay.gift",
+             f"{TEST_PATH}/datasets/anki/math.txt",
+             f"{TEST_PATH}/datasets/aiken/aiken_1.txt"]
+    errors = []
+    control = category.Category.read_files(files)
+    test = category.Category.read_files(files, jobs=2, errors=errors)
+    assert [path for path, _ in errors] == files[1:2]
+    assert utils.Compare.compare(test, control)
+
+
+def test_read_files_filter():
+    files = [f"{TEST_PATH}/datasets/gift/all.gift",
+             f"{TEST_PATH}/datasets/aiken/aiken_1.txt"]
+    test = category.Category.read_files(files, filter=utils.QFilter(
+        path="*/Shorts"))
+    assert test.get_size(True) == 4
+    assert test["qas editor"]["Shorts"].get_size() == 4
+    test = category.Category.read_files(files, filter=utils.QFilter(
+        path="$course$"))
+    assert list(test) == []
+    assert test.get_size() == category.Category.read_files(files[1:]).get_size()
+
+
+def test_json_round_trip(tmp_path):
+    control = category.Category.read_files([
+        f"{TEST_PATH}/datasets/gift/all.gift",
+        f"{TEST_PATH}/datasets/aiken/aiken_1.txt"])
+    path = str(tmp_path / "bank.json")
+    control.write_json(path)
+    assert category.detect_format(path) == "JSON"
+    test = category.Category.read_json(path)
+    assert utils.Compare.compare(test, control)
+
+
+def test_dirty_tracking():
+    control = category.Category.read_aiken(
+        f"{TEST_PATH}/datasets/aiken/aiken_1.txt", "aiken")
+    top = category.Category("top")
+    top.add_subcat(control)
+    assert top.dirty and control.get_question(0).dirty
+    top.mark_saved("out")
+    assert not top.dirty and not control.dirty and top.saved_to == "out"
+    assert not any(question.dirty for question in control.questions)
+    question = control.get_question(1)
+    question.tags.append("edited")
+    assert not question.dirty
+    question.touch()
+    assert question.dirty and control.dirty and top.dirty
+    control.mark_saved("other")
+    assert not control.dirty and top.dirty and top.saved_to is None
+    top.mark_saved("out")
+    lang = list(question.body)[0]
+    control.get_question(2).body[lang].text.append("more")
+    assert control.get_question(2).dirty and control.dirty and top.dirty
+    top.mark_saved("out")
+    assert not control.get_question(2).dirty and not top.dirty
+    control.pop_question(control.get_question(0))
+    assert control.dirty
+
+
+def test_dirty_text_items():
+    text = FText("Plain ")
+    text.text.append(XItem("b"))
+    text.mark_saved()
+    assert text[0] == "Plain " and not text.dirty
+    text[1].append("bold")
+    assert text.dirty
+    text.mark_saved()
+    for _ in text:
+        pass
+    assert text.dirty
@@ -24,8 +24,8 @@
 from qas_editor import utils
 from qas_editor.enums import FileAddr, MathType, Platform
 from qas_editor.parsers.moodle import MoodleXHTMLParser
-from qas_editor.parsers.text import (FText, LinkRef, PlainParser, XHTMLParser,
-                                     XItem)
+from qas_editor.parsers.text import (FText, FTextPool, LinkRef, PlainParser,
+                                     XHTMLParser, XItem)
 
 TEST_PATH = os.path.dirname(__file__)
 SRC_PATH = os.path.abspath(os.path.join(TEST_PATH, '..'))
@@ -158,6 +158,14 @@ def test_moodle_ascii_embeeded():
     assert ftext[3] == "Something outside"
 
 
+def test_moodle_markers_scan():
+    parser = MoodleXHTMLParser("", True, False, None)
+    parser.parse("a {=2*{x}+{y}} b {x}{=({y})}" + "plain " * 100)
+    ftext = FText(parser)
+    assert ftext[:5] == ["a ", 2*X + Y, " b ", X, Y]
+    assert ftext[5] == "plain " * 100
+
+
 def test_moodle_ascii_img_ref():
     text = ("""and <p style="text-align: left;">file <img src="@@PLUGINFILE@@"""
         """/dessin.svg" alt="escargot" style="vertical-align: text-bottom;" """
@@ -172,3 +180,59 @@ def test_moodle_ascii_img_ref():
     assert ftext[1][1].attrs == {'alt': 'escargot',
             'style': 'vertical-align: text-bottom;', 'class': 'img-responsive',
             'width': '100', 'height': '141'}
+
+
+def test_shared_copy_on_write():
+    parser = XHTMLParser("", True, False, None)
+    parser.parse("<p>Your answer is <b>incorrect</b>.</p>")
+    proto = FText(parser)
+    first, second = proto.share(), proto.share()
+    assert first.shared and second.shared
+    assert len(first) == len(second) and second.shared
+    first.text.append("Try again")
+    assert not first.shared
+    assert len(first) == 2 and len(second) == 1
+    first[0][1].append("!")
+    assert len(second[0][1]) == 1
+    assert second.get(MathType.ASCII, FileAddr.EMBEDDED) == proto.get(
+            MathType.ASCII, FileAddr.EMBEDDED)
+
+
+def test_pool_reuses_fragments():
+    pool = FTextPool()
+    calls = []
+    def factory():
+        calls.append(1)
+        return FText("Correct!")
+    first = pool.ftext("Correct!", factory)
+    second = pool.ftext("Correct!", factory)
+    assert len(calls) == 1 and len(pool) == 1
+    assert first is not second and first[0] is second[0]
+    tags = pool.tags(["".join(["ma", "th"])])
+    assert tags[0] is pool.tags(["math"])[0]
+    assert pool.tags(tags) is not tags
+
+
+def test_pool_limit():
+    pool = FTextPool(limit=2)
+    for text in ("a", "b", "c"):
+        pool.ftext(text, lambda: FText(text))
+    assert len(pool) == 2
+    calls = []
+    pool.ftext("a", lambda: calls.append(1) or FText("a"))
+    assert calls == [1]     # The oldest was dropped
+
+
+def test_shared_items_handed_out():
+    parser = XHTMLParser("", True, False, None)
+    parser.parse("Plain <b>bold</b>")
+    proto = FText(parser)
+    first, second, third = proto.share(), proto.share(), proto.share()
+    assert first[0] == "Plain " and first.shared
+    first[1].append(" text")
+    assert not first.shared and second.shared
+    for item in second:
+        if isinstance(item, XItem):
+            item.append(" other")
+    assert len(first[1]) == 2 and len(second[1]) == 2 and len(proto[1]) == 1
+    assert third.get(MathType.ASCII, FileAddr.EMBEDDED) == "Plain <b>bold</b>"
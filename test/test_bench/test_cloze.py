@@ -0,0 +1,54 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Worst case of the Cloze reader, a text full of answer heads that are never
+closed, against the previous backtracking pattern.
+"""
+import re
+import time
+
+import pytest
+
+from qas_editor.enums import Language
+from qas_editor.parsers import cloze
+
+pytestmark = pytest.mark.bench
+
+_PATTERN = re.compile(r"(?!\\)\{(\d+)?(?:\:(.*?)\:)(.*?(?!\\)\})")
+
+
+def _timed(func, text: str) -> float:
+    start = time.perf_counter()
+    func(text)
+    return time.perf_counter() - start
+
+
+def test_cloze_worst_case():
+    reader = cloze._Reader("", Language.EN_US, False)
+    times = []
+    for size in (400, 4000):
+        text = "{1:" * size
+        old = _timed(lambda data: list(_PATTERN.finditer(data)), text) \
+            if size == 400 else None
+        new = _timed(reader._from_cloze_text, text)
+        times.append(new)
+        if old is not None:
+            print(f"{len(text)} chars: {old:.4f}s backtracking, {new:.4f}s "
+                  "single pass")
+            assert new * 100 < old
+    print(f"10x the size: {times[1] / times[0]:.1f}x the time")
+    assert times[1] < 50 * times[0]
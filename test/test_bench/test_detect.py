@@ -0,0 +1,67 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Format detection cost on a folder mixing all the text formats.
+"""
+import glob
+import logging
+import os
+import shutil
+import time
+
+import pytest
+
+from qas_editor import category
+
+pytestmark = pytest.mark.bench
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+_COPIES = 20
+
+
+def _mixed_folder(path) -> list:
+    files = (glob.glob(f"{TEST_PATH}/datasets/gift/*.gift") +
+             glob.glob(f"{TEST_PATH}/datasets/moodle/*.xml") +
+             [f"{TEST_PATH}/datasets/aiken/aiken_1.txt",
+              f"{TEST_PATH}/datasets/cloze/cloze.cloze",
+              f"{TEST_PATH}/datasets/anki/math.txt",
+              f"{TEST_PATH}/datasets/olx/test.tar.xz"])
+    res = []
+    for cnt in range(_COPIES):
+        for file in files:
+            name = os.path.basename(file)
+            res.append(shutil.copy(file, path / f"{cnt}_{name}"))
+    return res
+
+
+def test_detect_mixed_folder(tmp_path):
+    files = _mixed_folder(tmp_path)
+    start = time.perf_counter()
+    found = [category.detect_format(file) for file in files]
+    detect = time.perf_counter() - start
+    readable = [file for file, name in zip(files, found)
+                if name in ("Aiken", "Cloze", "GIFT")]
+    logging.disable(logging.CRITICAL)
+    try:
+        start = time.perf_counter()
+        control = category.Category.read_files(readable)
+        read = time.perf_counter() - start
+    finally:
+        logging.disable(logging.NOTSET)
+    assert found.count(None) == _COPIES  # Only the anki cards
+    assert control.get_size(True) > 0
+    assert detect < read
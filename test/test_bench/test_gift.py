@@ -0,0 +1,130 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Time to read a 100k questions GIFT file with the compiled marker patterns,
+against the previous reader that tested each char for every marker, to
+write it back, and to read a single category of it.
+"""
+import logging
+import os
+import time
+
+import pytest
+
+from qas_editor import category, utils
+from qas_editor.parsers import gift
+
+pytestmark = pytest.mark.bench
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+_QUESTIONS = 100_000
+
+
+class _CharReader(gift._Reader):
+
+    def _next(self, comp: list) -> str:
+        start = self._pos
+        self._pos += 1
+        while not any(self._str[self._pos:self._pos+len(x)] == x
+                      for x in comp) or self._scp:
+            self._nxt()
+        return self._str[start:self._pos]
+
+    def _skip(self):
+        self._nxt()
+
+
+def _file(path, questions=_QUESTIONS) -> int:
+    with open(f"{TEST_PATH}/datasets/gift/all.gift", encoding="utf-8") as ifile:
+        data = ifile.read()
+    size = 22                               # Questions in all.gift
+    with open(path, "w", encoding="utf-8") as ofile:
+        for cnt in range(questions // size + 1):
+            # One category per copy, so adding questions stays cheap
+            ofile.write(data.replace("qas editor/", f"copy {cnt}/"))
+            ofile.write("\n\n")
+    return (questions // size + 1) * size
+
+
+def _chained(data: str) -> str:
+    for repl in ((":", "\\:"), ("~", "\\~"), ("=", "\\="), ("#", "\\#"),
+                 ("{", "\\{"), ("}", "\\}")):
+        data = data.replace(*repl)
+    return data
+
+
+def _timed(path) -> tuple:
+    start = time.perf_counter()
+    quiz = gift.read_gift(category.Category, path)
+    return time.perf_counter() - start, quiz.get_size(True)
+
+
+def test_read_gift_100k(monkeypatch, tmp_path):
+    path = tmp_path / "big.gift"
+    total = _file(path)
+    logging.disable(logging.CRITICAL)
+    try:
+        new, size = _timed(path)
+        assert size == total
+        monkeypatch.setattr(gift, "_Reader", _CharReader)
+        old, size = _timed(path)
+        assert size == total
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{total} questions: {old:.2f}s per char, {new:.2f}s with patterns")
+    assert new < old
+
+
+def test_write_gift_20k(monkeypatch, tmp_path):
+    total = _file(tmp_path / "big.gift", 20_000)
+    logging.disable(logging.CRITICAL)
+    try:
+        quiz = gift.read_gift(category.Category, tmp_path / "big.gift")
+        start = time.perf_counter()
+        quiz.write_gift(tmp_path / "new.gift")
+        new = time.perf_counter() - start
+        with monkeypatch.context() as patch:
+            patch.setattr(gift, "_escape", _chained)
+            start = time.perf_counter()
+            quiz.write_gift(tmp_path / "old.gift")
+            old = time.perf_counter() - start
+        records = gift.iter_gift(str(tmp_path / "new.gift"))
+        assert sum(qst is not None for _, qst in records) == total
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{total} questions written: {old:.2f}s with chained replaces, "
+          f"{new:.2f}s searching the special chars first")
+
+
+def test_read_gift_filter(tmp_path):
+    path = str(tmp_path / "big.gift")
+    total = _file(path, 20_000)
+    logging.disable(logging.CRITICAL)
+    try:
+        start = time.perf_counter()
+        quiz = gift.read_gift(category.Category, path)
+        full = time.perf_counter() - start
+        start = time.perf_counter()
+        part = gift.read_gift(category.Category, path,
+                              filter=utils.QFilter(path="copy 3/*"))
+        partial = time.perf_counter() - start
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{total} questions: {full:.2f}s for all, {partial:.2f}s for the "
+          f"{part.get_size(True)} of a single copy")
+    assert quiz.get_size(True) == total and part.get_size(True) == 22
+    assert partial < full / 2
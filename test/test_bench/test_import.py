@@ -0,0 +1,64 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Import time of the API. Parsers and the math extras should only be loaded
+when they are actually used.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+IMPORT_BUDGET = 0.6  # seconds, eager imports took more than a second
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from qas_editor.category import Category
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted(sys.modules)]))
+"""
+
+
+def _import(script: str):
+    res = subprocess.run([sys.executable, "-c", script], check=True,
+                         capture_output=True, text=True,
+                         cwd=os.path.dirname(TEST_PATH))
+    return json.loads(res.stdout.splitlines()[-1])
+
+
+@pytest.mark.bench
+def test_import_budget():
+    elapsed = min(_import(_SCRIPT)[0] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET
+
+
+def test_import_lazy_modules():
+    _, modules = _import(_SCRIPT)
+    assert "qas_editor.parsers.moodle" not in modules
+    assert "qas_editor.parsers.gift" not in modules
+    assert "matplotlib" not in modules
+    assert "sympy" not in modules
+
+
+def test_parser_resolved_on_use():
+    script = _SCRIPT.replace("elapsed = ", "Category.read_gift\nelapsed = ")
+    _, modules = _import(script)
+    assert "qas_editor.parsers.gift" in modules
+    assert "qas_editor.parsers.moodle" not in modules
@@ -0,0 +1,58 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Saving a large bank again after editing a single question.
+"""
+import os
+import time
+
+from qas_editor import category, enums
+
+_QUESTIONS = 20000
+_LANG = enums.Language.EN_US
+
+
+def _bank(tmp_path) -> category.Category:
+    path = tmp_path / "bank.txt"
+    with open(path, "w", encoding="utf-8") as ofile:
+        for cnt in range(_QUESTIONS):
+            ofile.write(f"Question number {cnt}?\nA) First\nB) Second\n"
+                        f"C) Option {cnt % 7}\nANSWER: {'ABC'[cnt % 3]}\n\n")
+    top = category.Category()
+    top.add_subcat(category.Category.read_aiken(str(path), "bank", _LANG))
+    return top
+
+
+def test_shards_after_one_edit(tmp_path):
+    control = _bank(tmp_path)
+    folder = str(tmp_path / "shards")
+    start = time.perf_counter()
+    control.write_jsonl_shards(folder, 200)
+    full = time.perf_counter() - start
+    for name in os.listdir(folder):  # Only rewritten shards get a new time
+        os.utime(os.path.join(folder, name), ns=(0, 0))
+    control["bank"].get_question(12345).body[_LANG].text[0] = "Changed"
+    start = time.perf_counter()
+    control.write_jsonl_shards(folder, 200)
+    partial = time.perf_counter() - start
+    print(f"{_QUESTIONS} questions: full save {full:.2f}s, after one edit "
+          f"{partial:.3f}s")
+    with open(tmp_path / "shards" / "00061.jsonl", "rb") as ifile:
+        assert b'"Changed"' in ifile.read()
+    assert [name for name in sorted(os.listdir(folder)) if os.stat(
+        os.path.join(folder, name)).st_mtime_ns] == ["00061.jsonl",
+                                                      "manifest.json"]
@@ -0,0 +1,67 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Time to list and load a question from a large GIFT file through its index,
+against parsing the whole file.
+"""
+import logging
+import os
+import time
+
+import pytest
+
+from qas_editor import category
+from qas_editor.enums import Language
+from qas_editor.parsers.index import SourceIndex
+
+pytestmark = pytest.mark.bench
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+_COPIES = 2000        # 22 questions each
+
+
+def test_index_gift(tmp_path):
+    with open(f"{TEST_PATH}/datasets/gift/all.gift", encoding="utf-8") as ifile:
+        data = ifile.read()
+    path = str(tmp_path / "large.gift")
+    with open(path, "w", encoding="utf-8") as ofile:
+        for cnt in range(_COPIES):
+            ofile.write(data.replace("qas editor/", f"copy {cnt}/") + "\n\n")
+    logging.disable(logging.CRITICAL)
+    try:
+        start = time.perf_counter()
+        quiz = category.Category.read_gift(path)
+        parse = time.perf_counter() - start
+        start = time.perf_counter()
+        index = SourceIndex(path)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        index = SourceIndex(path)
+        stats = index.stats()
+        cached = time.perf_counter() - start
+        start = time.perf_counter()
+        question = index.load(40_000)
+        load = time.perf_counter() - start
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{len(index)} questions: {parse:.2f}s parsing, {build:.2f}s "
+          f"indexing, {cached:.2f}s for stats from the sidecar, {load:.4f}s "
+          "to load one question")
+    assert stats["questions"] == quiz.get_size(True) == 22 * _COPIES
+    assert not index.rebuilt
+    assert question.name[Language.EN_US] == index[40_000].name
+    assert build < parse and cached < build and load < cached
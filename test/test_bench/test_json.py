@@ -0,0 +1,81 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Load time of the native JSON format against the text formats it replaces
+as a save format, for the same bank.
+"""
+import glob
+import logging
+import os
+import shutil
+import time
+
+import pytest
+
+from qas_editor import category, utils
+
+pytestmark = pytest.mark.bench
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+_COPIES = 20
+
+
+def _copies(tmp_path, pattern: str) -> list:
+    files = []
+    for cnt in range(_COPIES):
+        for file in glob.glob(pattern):
+            name = f"{cnt}_{os.path.basename(file)}"
+            files.append(shutil.copy(file, tmp_path / name))
+    return files
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    res = func(*args)
+    return time.perf_counter() - start, res
+
+
+def _compare(tmp_path, files: list):
+    logging.disable(logging.CRITICAL)
+    try:
+        text, control = _timed(category.Category.read_files, files)
+        path = str(tmp_path / "bank.json")
+        write, _ = _timed(control.write_json, path)
+        native, test = _timed(category.Category.read_json, path)
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{control.get_size(True)} questions: {text:.2f}s parsing, "
+          f"{native:.2f}s from JSON ({write:.2f}s to write "
+          f"{os.path.getsize(path)} bytes)")
+    assert utils.Compare.compare(test, control)
+    return text, native
+
+
+def test_json_faster_than_gift(tmp_path):
+    files = _copies(tmp_path, f"{TEST_PATH}/datasets/gift/*.gift")
+    text, native = _compare(tmp_path, files)
+    assert native < text
+
+
+def test_json_faster_than_moodle(tmp_path):
+    files = _copies(tmp_path, f"{TEST_PATH}/datasets/moodle/*.xml")
+    try:
+        category.Category.read_moodle(files[0])
+    except AttributeError as err:
+        pytest.skip(f"read_moodle can not read the datasets: {err}")
+    text, native = _compare(tmp_path, files)
+    assert native < text
@@ -0,0 +1,163 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Memory retained by the banks read with and without the FText pool, and
+peak memory of the streaming Moodle XML reader.
+"""
+import gc
+import glob
+import logging
+import os
+import tracemalloc
+from xml.etree import ElementTree as et
+
+import pytest
+
+from qas_editor import category
+from qas_editor.parsers import gift, moodle
+from qas_editor.parsers.text import FTextPool
+from qas_editor.question import QQuestion
+
+pytestmark = pytest.mark.bench
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+
+
+def _retained(paths: list) -> int:
+    logging.disable(logging.CRITICAL)  # Captured log records are retained
+    gc.collect()
+    tracemalloc.start()
+    banks = [category.Category.read_gift(path) for path in paths]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logging.disable(logging.NOTSET)
+    del banks
+    return size
+
+
+def _compare(monkeypatch, paths: list, label: str):
+    _retained(paths)  # Warm up caches so they are not accounted to a run
+    pooled = _retained(paths)
+    with monkeypatch.context() as patch:
+        patch.setattr(gift, "FTextPool", lambda: FTextPool(False))
+        plain = _retained(paths)
+    print(f"{label}: {plain} bytes without pool, {pooled} bytes with pool "
+          f"({100 * (plain - pooled) / plain:.1f}% saved)")
+    return pooled, plain
+
+
+def test_pool_memory_datasets(monkeypatch):
+    paths = sorted(glob.glob(f"{TEST_PATH}/datasets/gift/*.gift"))
+    pooled, plain = _compare(monkeypatch, paths, "test/datasets/gift")
+    assert pooled <= plain
+
+
+def test_pool_memory_repeated(monkeypatch, tmp_path):
+    path = tmp_path / "repeated.gift"
+    with open(path, "w", encoding="utf-8") as ofile:
+        for num in range(500):
+            ofile.write(f"// [tags:week{num % 4} algebra]\n::q{num}::[html]"
+                        f"What is {num} + 1? {{=<b>{num + 1}</b>#Correct! "
+                        "~<b>0</b>#Your answer is incorrect. ~<b>-1</b>#Your"
+                        " answer is incorrect.}\n\n")
+    pooled, plain = _compare(monkeypatch, [str(path)], "repeated feedbacks")
+    assert pooled < plain
+
+
+def _peak(func, *args) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def test_moodle_stream_memory(monkeypatch, tmp_path):
+    # Question types can not be built from Moodle XML in this tree, so a
+    # stand-in that only reads the name is used for all of them.
+    monkeypatch.setitem(moodle._QTYPE, "description",
+                        lambda elem: QQuestion({}, elem.find("name").text))
+    path = tmp_path / "large.xml"
+    text = "Some long question text with <b>markup</b>. " * 100
+    with open(path, "w", encoding="utf-8") as ofile:
+        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n<quiz>\n")
+        for cat in range(20):
+            ofile.write("<question type=\"category\"><category><text>"
+                        f"top/cat{cat}</text></category></question>\n")
+            for num in range(100):
+                ofile.write(f"<question type=\"description\"><name>{num}"
+                            "</name><questiontext format=\"html\"><text>"
+                            f"<![CDATA[{text}]]></text></questiontext>"
+                            "</question>\n")
+        ofile.write("</quiz>\n")
+    logging.disable(logging.CRITICAL)
+    dom = _peak(et.parse, path)
+    stream = _peak(category.Category.read_moodle, str(path))
+    logging.disable(logging.NOTSET)
+    print(f"{os.path.getsize(path)} bytes file: {dom} bytes peak parsing the"
+          f" tree, {stream} bytes peak streaming")
+    assert stream * 3 < dom
+
+
+def test_moodle_write_memory(monkeypatch, tmp_path):
+    text = "Some long question text with <b>markup</b>. " * 100
+    def _to_xml(question):
+        elem = et.Element("question", {"type": "description"})
+        et.SubElement(elem, "name").text = str(question.dbid)
+        et.SubElement(elem, "questiontext").text = text
+        return elem
+    monkeypatch.setitem(moodle._QREF, QQuestion, _to_xml)
+    peaks = []
+    for cats in (2, 20):
+        control = category.Category("top")
+        for cat in range(cats):
+            control.add_subcat(category.Category(f"cat{cat}"))
+            for num in range(100):
+                control[f"cat{cat}"].add_question(QQuestion({}, num))
+        path = tmp_path / f"{cats}.xml"
+        peaks.append(_peak(control.write_moodle, path))
+        print(f"{cats * 100} questions, {os.path.getsize(path)} bytes file: "
+              f"{peaks[-1]} bytes peak writing")
+    assert peaks[1] < 2 * peaks[0]
+
+
+def _drain(path) -> int:
+    total = 0
+    for _, question in gift.iter_gift(path):
+        total += question is not None
+    return total
+
+
+def test_gift_stream_memory(tmp_path):
+    peaks = []
+    for size in (2000, 20000):
+        path = tmp_path / f"{size}.gift"
+        with open(path, "w", encoding="utf-8") as ofile:
+            for num in range(size):
+                if num % 100 == 0:
+                    ofile.write(f"$CATEGORY: top/cat{num // 100}\n\n")
+                ofile.write(f"// [id:{num}]\n::q{num}::[html]<p>Question "
+                            f"{num} text</p>{{=<b>{num + 1}</b>#Correct! "
+                            f"~<b>{num}</b>#Feedback {num}.}}\n\n")
+        logging.disable(logging.CRITICAL)
+        peaks.append(_peak(_drain, str(path)))
+        logging.disable(logging.NOTSET)
+        print(f"{size} questions: {peaks[-1]} bytes peak streaming")
+    assert peaks[1] < 2 * peaks[0]
@@ -0,0 +1,123 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Speedup of reading a folder of GIFT files, a large Moodle XML split in
+chunks, and a large GIFT file split in blocks, with several worker processes.
+"""
+import glob
+import logging
+import os
+import shutil
+import time
+
+import pytest
+
+from qas_editor import category
+from qas_editor.parsers import moodle
+from qas_editor.question import QQuestion
+
+pytestmark = pytest.mark.bench
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+_COPIES = 40
+
+
+def _timed(files: list, jobs: int) -> float:
+    start = time.perf_counter()
+    category.Category.read_files(files, jobs=jobs)
+    return time.perf_counter() - start
+
+
+def test_parallel_speedup(tmp_path):
+    files = []
+    for cnt in range(_COPIES):
+        for file in glob.glob(f"{TEST_PATH}/datasets/gift/*.gift"):
+            name = f"{cnt}_{os.path.basename(file)}"
+            files.append(shutil.copy(file, tmp_path / name))
+    jobs = os.cpu_count() or 1
+    logging.disable(logging.CRITICAL)
+    try:
+        serial = _timed(files, 1)
+        parallel = _timed(files, jobs)
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{len(files)} files: {serial:.2f}s serial, {parallel:.2f}s "
+          f"with {jobs} jobs ({serial / parallel:.1f}x)")
+    if jobs >= 4:  # Process startup dominates with fewer cores
+        assert serial / parallel > jobs / 2
+
+
+def test_moodle_chunks_speedup(monkeypatch, tmp_path):
+    # Question types can not be built from Moodle XML in this tree, so a
+    # stand-in that reads the name and text is used for all of them.
+    monkeypatch.setitem(moodle._QTYPE, "description", lambda elem: QQuestion(
+        {}, int(elem.findtext("name")) + len(elem.findtext("*/text"))))
+    path = tmp_path / "large.xml"
+    text = "Some long question text with <b>markup</b>. " * 50
+    with open(path, "w", encoding="utf-8") as ofile:
+        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n<quiz>\n")
+        for cat in range(20):
+            ofile.write("<question type=\"category\"><category><text>"
+                        f"top/cat{cat}</text></category></question>\n")
+            for num in range(500):
+                ofile.write(f"<question type=\"description\"><name>{num}"
+                            "</name><questiontext format=\"html\"><text>"
+                            f"<![CDATA[{text}]]></text></questiontext>"
+                            "</question>\n")
+        ofile.write("</quiz>\n")
+    jobs = os.cpu_count() or 1
+    start = time.perf_counter()
+    control = category.Category.read_moodle(str(path))
+    serial = time.perf_counter() - start
+    start = time.perf_counter()
+    test = category.Category.read_moodle(str(path), jobs=max(jobs, 2))
+    parallel = time.perf_counter() - start
+    print(f"{os.path.getsize(path)} bytes: {serial:.2f}s serial, "
+          f"{parallel:.2f}s with {max(jobs, 2)} jobs "
+          f"({serial / parallel:.1f}x)")
+    assert [test[name].get_size() for name in test] == \
+        [control[name].get_size() for name in control]
+    assert test.get_size(True) == control.get_size(True) == 10000
+    if jobs >= 4:  # Process startup dominates with fewer cores
+        assert serial / parallel > jobs / 2
+
+
+def test_gift_blocks_speedup(tmp_path):
+    with open(f"{TEST_PATH}/datasets/gift/all.gift", encoding="utf-8") as ifile:
+        data = ifile.read()
+    path = str(tmp_path / "large.gift")
+    with open(path, "w", encoding="utf-8") as ofile:
+        for cnt in range(300):
+            ofile.write(data.replace("qas editor/", f"copy {cnt}/") + "\n\n")
+    jobs = os.cpu_count() or 1
+    logging.disable(logging.CRITICAL)
+    try:
+        start = time.perf_counter()
+        control = category.Category.read_gift(path)
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        test = category.Category.read_gift(path, jobs=max(jobs, 2))
+        parallel = time.perf_counter() - start
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"{os.path.getsize(path)} bytes: {serial:.2f}s serial, "
+          f"{parallel:.2f}s with {max(jobs, 2)} jobs "
+          f"({serial / parallel:.1f}x)")
+    assert [test[name].get_size(True) for name in test] == \
+        [control[name].get_size(True) for name in control]
+    if jobs >= 4:  # Process startup dominates with fewer cores
+        assert serial / parallel > jobs / 2
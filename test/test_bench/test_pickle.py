@@ -0,0 +1,68 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Size and speed of pickling a large bank, as done when sending categories
+between worker processes.
+"""
+import pickle
+import time
+
+import pytest
+
+from qas_editor import category, enums, utils
+
+_QUESTIONS = 10000
+_LANG = enums.Language.EN_US
+
+
+def _bank(tmp_path) -> category.Category:
+    path = tmp_path / "bank.txt"
+    with open(path, "w", encoding="utf-8") as ofile:
+        for cnt in range(_QUESTIONS):
+            ofile.write(f"Question number {cnt}?\nA) First\nB) Second\n"
+                        f"C) Option {cnt % 7}\nANSWER: {'ABC'[cnt % 3]}\n\n")
+    top = category.Category()
+    top.add_subcat(category.Category.read_aiken(str(path), "bank", _LANG))
+    return top
+
+
+@pytest.mark.bench
+def test_pickle_bank(tmp_path):
+    control = _bank(tmp_path)
+    start = time.perf_counter()
+    data = pickle.dumps(control, protocol=5)
+    dump = time.perf_counter() - start
+    start = time.perf_counter()
+    test = pickle.loads(data)
+    load = time.perf_counter() - start
+    print(f"{_QUESTIONS} questions: {len(data)} bytes, dump {dump:.2f}s, "
+          f"load {load:.2f}s")
+    assert utils.Compare.compare(test, control)
+    subcat = test["bank"]
+    assert subcat.parent is test
+    question = subcat.get_question(5)
+    assert question.parent is subcat
+    assert question.body[_LANG].text[1].processor.func(2, category.TestStatus())
+    assert len(data) < 400 * _QUESTIONS
+    assert dump + load < 10
+
+
+def test_pickle_question_alone(tmp_path):
+    control = _bank(tmp_path)["bank"].get_question(0)
+    test = pickle.loads(pickle.dumps(control, protocol=5))
+    assert test.parent is None
+    assert len(pickle.dumps(control, protocol=5)) < 2000
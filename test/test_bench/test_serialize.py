@@ -0,0 +1,101 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Time to serialize a large XML tree with the stack based serialize_fxml,
+against the previous recursive one that wrote each token.
+"""
+import filecmp
+import os
+import time
+from xml.etree import ElementTree as et
+
+import pytest
+
+from qas_editor import utils
+
+pytestmark = pytest.mark.bench
+
+
+def _recursive(write, elem, short_empty, pretty, level=0):
+    tag = elem.tag
+    text = elem.text
+    if pretty:
+        write(level * "  ")
+    write(f"<{tag}")
+    for key, value in elem.attrib.items():
+        value = utils._escape_attrib_html(value)
+        write(f" {key}=\"{value}\"")
+    if text is not None or len(elem) or not short_empty:
+        if len(elem) and pretty:
+            write(">\n")
+        else:
+            write(">")
+        write(utils._escape_cdata(text))
+        for child in elem:
+            _recursive(write, child, short_empty, pretty, level+1)
+        if len(elem) and pretty:
+            write(level * "  ")
+        write(f"</{tag}>")
+    else:
+        write(" />")
+    if pretty:
+        write("\n")
+    if elem.tail:
+        write(utils._escape_cdata(elem.tail))
+
+
+def _tree(size: int) -> et.Element:
+    root = et.Element("quiz")
+    text = "<p>Which of the following is a \"prime\" & odd?</p>" * 5
+    total = 0
+    while total < size:
+        question = et.SubElement(root, "question", {"type": "multichoice"})
+        name = et.SubElement(question, "name")
+        et.SubElement(name, "text").text = f"Question {len(root)}"
+        body = et.SubElement(question, "questiontext", {"format": "html"})
+        et.SubElement(body, "text").text = text
+        for num in range(4):
+            answer = et.SubElement(question, "answer",
+                                   {"fraction": 100 if num else 0})
+            et.SubElement(answer, "text").text = f"{num} > 1"
+            et.SubElement(answer, "feedback").tail = "\n"
+        et.SubElement(question, "shuffleanswers").text = 1
+        total += len(text) + 400
+    return root
+
+
+def _timed(func, tree, pretty, path) -> float:
+    best = None
+    for _ in range(2):                      # Best of two, the box is noisy
+        with open(path, "w", encoding="utf-8") as ofile:
+            start = time.perf_counter()
+            func(ofile.write, tree, True, pretty)
+            spent = time.perf_counter() - start
+        best = spent if best is None else min(best, spent)
+    return best
+
+
+def test_serialize_fxml_50mb(tmp_path):
+    tree = _tree(50_000_000)
+    for pretty in (False, True):
+        old = _timed(_recursive, tree, pretty, tmp_path / "old.xml")
+        new = _timed(utils.serialize_fxml, tree, pretty, tmp_path / "new.xml")
+        size = os.path.getsize(tmp_path / "new.xml")
+        print(f"{size} bytes (pretty={pretty}): {old:.2f}s recursive, "
+              f"{new:.2f}s stack based")
+        assert filecmp.cmp(tmp_path / "old.xml", tmp_path / "new.xml", False)
+        assert new < old
@@ -59,4 +59,21 @@ def test_diff_simple():
     new_data = category.Category.read_aiken(test, None, lang)
     assert utils.Compare.compare(new_data, control)
     os.remove(test)
-    
\ No newline at end of file
+    
+
+def test_read_jobs(tmp_path):
+    example = f"{TEST_PATH}/datasets/aiken/aiken_1.txt"
+    lang = enums.Language.EN_US
+    with open(example, encoding="utf-8") as ifile:
+        data = ifile.read()
+    path = str(tmp_path / "copies.txt")
+    with open(path, "w", encoding="utf-8") as ofile:
+        ofile.write("\n\n".join([data.strip()] * 20) + "\n")
+    control = category.Category.read_aiken(path, None, lang)
+    test = category.Category.read_aiken(path, None, lang, jobs=3)
+    assert test.get_size() == control.get_size() == 100
+    for num in range(100):
+        question = test.get_question(num)
+        assert question.name[lang] == f"aiken_{num}"
+        assert question.body[lang].text[0] == \
+            control.get_question(num).body[lang].text[0]
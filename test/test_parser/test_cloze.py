@@ -21,6 +21,7 @@
 import os
 
 from qas_editor import answer, category, enums, utils
+from qas_editor.parsers import cloze
 
 TEST_PATH = os.path.dirname(os.path.dirname(__file__))
 
@@ -54,3 +55,33 @@ def test_diff_simple():
     new_data = category.Category.read_cloze(cloze_test, lang)
     assert utils.Compare.compare(new_data, control)
     os.remove(cloze_test)
+
+
+def test_read_escaped():
+    lang = enums.Language.EN_US
+    reader = cloze._Reader("", lang, False)
+    question = reader._from_cloze_text(
+        "Set \\{1:SA:a} is {2:SHORTANSWER:=\\{x\\}#a \\# b~%50%y\\~z#c#d} "
+        "and {1:MC:unclosed")
+    text = question.body[lang].text
+    assert text[0] == "Set \\{1:SA:a} is "
+    assert text[2] == " and {1:MC:unclosed"
+    assert list(text[1].processor.args["values"]) == ["{x}", "y~z"]
+    assert text[1].processor.args["values"]["y~z"]["value"] == 1.0
+    assert [feed.text for feed in text[1].feedbacks] == [["a # b"],
+                                                         ["c#d"]]
+
+
+def test_read_jobs(tmp_path):
+    lang = enums.Language.EN_US
+    path = str(tmp_path / "many.cloze")
+    with open(path, "w", encoding="utf-8") as ofile:
+        for num in range(60):   # Runs of 3 new lines are not split twice
+            ofile.write(f"Question {num} is {{1:SA:={num}}}" +
+                        "\n" * (2 + num % 3))
+    control = category.Category.read_cloze(path, lang, "\n\n")
+    test = category.Category.read_cloze(path, lang, "\n\n", jobs=3)
+    assert test.get_size() == control.get_size()
+    for num in range(control.get_size()):
+        assert test.get_question(num).body[lang].text[0] == \
+            control.get_question(num).body[lang].text[0]
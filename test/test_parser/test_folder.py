@@ -0,0 +1,131 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+
+"""
+import gc
+import os
+
+import pytest
+
+from qas_editor import category, enums
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+LANG = enums.Language.EN_US
+
+
+def _bank(path: str):
+    control = category.Category.read_gift(f"{TEST_PATH}/datasets/gift/all.gift")
+    control.add_subcat(category.Category.read_aiken(
+        f"{TEST_PATH}/datasets/aiken/aiken_1.txt", "aiken", LANG))
+    control.write_folder(path)
+    return control
+
+
+def _mtimes(path: str) -> dict:
+    return {os.path.join(root, name): os.stat(os.path.join(root, name)
+                                              ).st_mtime_ns
+            for root, _, files in os.walk(path) for name in files}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "bank")
+    control = _bank(path)
+    test = category.Category.read_folder(path)
+    assert sorted(test) == sorted(control)
+    assert test.get_size(True) == control.get_size(True)
+    names = {tuple(qst.name.values()) for qst in control["aiken"].questions}
+    assert {tuple(qst.name.values()) for qst in test["aiken"].questions} \
+        == names
+
+
+def test_lazy_load(tmp_path):
+    path = str(tmp_path / "bank")
+    _bank(path)
+    test = category.Category.read_folder(path)
+    assert not test.loaded
+    assert not test["aiken"].loaded and not test["qas editor"].loaded
+    assert test["aiken"].get_size() == 5
+    assert test["aiken"].loaded and not test["qas editor"].loaded
+
+
+def test_save_touched(tmp_path):
+    path = str(tmp_path / "bank")
+    _bank(path)
+    before = _mtimes(path)
+    test = category.Category.read_folder(path)
+    aiken = test["aiken"]
+    aiken.get_question(0).tags.append("edited")
+    aiken.pop_question(aiken.get_question(1))
+    test["qas editor"].pop_subcat("Essays")
+    test.write_folder(path)
+    after = _mtimes(path)
+    changed = {name for name in after if after[name] != before.get(name)}
+    assert len(changed) == 1 and len(set(before) - set(after)) == 3
+    again = category.Category.read_folder(path)
+    assert "Essays" not in again["qas editor"]
+    assert again["aiken"].get_size() == 4
+    assert any("edited" in qst.tags for qst in again["aiken"].questions)
+
+
+def test_rename_category(tmp_path):
+    path = str(tmp_path / "bank")
+    _bank(path)
+    test = category.Category.read_folder(path)
+    test["aiken"].name = "renamed"
+    test.write_folder(path)
+    assert sorted(os.listdir(path)) == ["qas editor", "renamed"]
+    assert category.Category.read_folder(path)["renamed"].get_size() == 5
+
+
+def test_nested_file(tmp_path):
+    os.makedirs(tmp_path / "bank" / "mixed")
+    with open(f"{TEST_PATH}/datasets/gift/all.gift", "rb") as ifile:
+        data = ifile.read()
+    (tmp_path / "bank" / "mixed" / "all.gift").write_bytes(data)
+    path = str(tmp_path / "bank")
+    test = category.Category.read_folder(path)
+    size = test["mixed"].get_size()
+    assert size == category.Category.read_gift(
+        f"{TEST_PATH}/datasets/gift/all.gift").get_size(True)
+    test.write_folder(path)  # Unchanged, so nothing is written
+    test["mixed"].get_question(0).tags.append("edited")
+    with pytest.raises(ValueError):
+        test.write_folder(path)
+    assert (tmp_path / "bank" / "mixed" / "all.gift").read_bytes() == data
+
+
+def test_remove_keeps_other_files(tmp_path):
+    path = str(tmp_path / "bank")
+    _bank(path)
+    (tmp_path / "bank" / "aiken" / "figure.png").write_bytes(b"\x89PNG")
+    test = category.Category.read_folder(path)
+    removed = test.pop_subcat("aiken")
+    test.write_folder(path)
+    assert os.listdir(tmp_path / "bank" / "aiken") == ["figure.png"]
+    assert removed.get_size() == 5  # Still readable after the removal
+
+
+def test_release_unused(tmp_path):
+    path = str(tmp_path / "bank")
+    _bank(path)
+    test = category.Category.read_folder(path)
+    bank = test._bank
+    assert test["aiken"].get_size() == 5 and len(bank._sources) == 5
+    test.pop_subcat("aiken")
+    gc.collect()
+    assert not bank._sources and len(bank._cats) == 2
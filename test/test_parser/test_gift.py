@@ -20,7 +20,8 @@
 
 import os
 
-from qas_editor import category, enums
+from qas_editor import category, enums, utils
+from qas_editor.parsers import gift
 
 TEST_PATH = os.path.dirname(os.path.dirname(__file__))
 
@@ -170,7 +171,7 @@ def test_read_truefalse():
     assert control.get_size(True) == 4
     qst = control.get_question(0)
     assert len(qst.feedback[lang]) == 1
-    assert qst.feedback[lang][0].text[1][0] == 'This question is operating with '
+    assert qst.feedback[lang][0].text[0][0] == 'This question is operating with '
     qst = control.get_question(1)
     assert qst.name[lang] == 'TrueFalse 2'
     assert len(qst.feedback[lang]) == 0
@@ -182,3 +183,122 @@ def test_read_truefalse():
     assert item.processor.func(0) == {"value": 0.0}
     assert item.processor.func(1) == {"value": 100.0}
 
+
+
+def test_iter_gift():
+    EXAMPLE = f"{TEST_PATH}/datasets/gift/all.gift"
+    records = gift.iter_gift(EXAMPLE)
+    assert next(records) == ("qas editor/descriptions", None)
+    path, qst = next(records)
+    assert path == "qas editor/descriptions"
+    assert qst.name[enums.Language.EN_US] == "description"
+    records = list(records)
+    assert sum(qst is None for _, qst in records) == 8
+    assert sum(qst is not None for _, qst in records) == 21
+    assert records[-1][0] == "qas editor/Multichoice"
+
+
+def test_write_all(tmp_path):
+    EXAMPLE = f"{TEST_PATH}/datasets/gift/all.gift"
+    control = category.Category.read_gift(EXAMPLE)
+    control.write_gift(tmp_path / "first.gift")
+    data = category.Category.read_gift(str(tmp_path / "first.gift"))
+    data.write_gift(tmp_path / "second.gift")
+    with open(tmp_path / "first.gift", encoding="utf-8") as ifile:
+        first = ifile.read()
+    with open(tmp_path / "second.gift", encoding="utf-8") as ifile:
+        assert ifile.read() == first
+    for name in control["qas editor"]:
+        assert (data["qas editor"][name].get_size(True) ==
+                control["qas editor"][name].get_size(True))
+
+
+def test_write_plain(tmp_path):
+    lang = enums.Language.EN_US
+    EXAMPLE = tmp_path / "plain.gift"
+    with open(EXAMPLE, "w", encoding="utf-8") as ofile:
+        ofile.write("$CATEGORY: $course$/top\n\n// [id:3] [tags:a b]\n"
+                    "::Q\\: 1::Is 1 \\= 2\\\\2? {\n\t~yes#no \\{sure\\}\n"
+                    "\t=%-50%maybe\n\t=no#right\n\t####a\\nb\n}\n\n"
+                    "::Q2::Type \\#1 {=one =%50%uno#so so}\n\n"
+                    "::Q3::Value {#=2.5:0.1#ok\n=%50%3:1}\n\n"
+                    "::Q4::Pairs {=a -> b =c -> d}\n\n")
+    control = category.Category.read_gift(str(EXAMPLE))
+    control.write_gift(tmp_path / "copy.gift")
+    data = category.Category.read_gift(str(tmp_path / "copy.gift"))
+    qst = data["top"].get_question(0)
+    assert qst.name[lang] == "Q: 1" and qst.dbid == 3
+    assert qst.tags == ["a", "b"]
+    assert qst.body[lang][0] == "Is 1 = 2\\2? "
+    item = qst.body[lang][1]
+    assert [opt.text[0] for opt in item.options] == ["yes", "maybe", "no"]
+    assert item.processor.args == control["top"].get_question(0).body[
+        lang][1].processor.args
+    assert item.feedbacks[0][0] == "no {sure}"
+    assert qst.feedback[lang][0][0] == "a\nb"
+    for num in range(1, 4):
+        assert data["top"].get_question(num).body[lang][1].processor.args \
+            == control["top"].get_question(num).body[lang][1].processor.args
+    assert "Type #1 " == data["top"].get_question(1).body[lang][0]
+
+
+def test_read_jobs(tmp_path):
+    lang = enums.Language.EN_US
+    with open(f"{TEST_PATH}/datasets/gift/all.gift", encoding="utf-8") as ifile:
+        data = ifile.read()
+    path = str(tmp_path / "copies.gift")
+    with open(path, "w", encoding="utf-8") as ofile:
+        for cnt in range(10):
+            ofile.write(data.replace("qas editor/", f"copy {cnt}/") + "\n\n")
+    ranges = utils.split_blocks(path, 12)
+    assert ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize(path)
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(ranges, ranges[1:]))
+    control = category.Category.read_gift(path)
+    test = category.Category.read_gift(path, jobs=3)
+    assert test.get_size(True) == control.get_size(True) == 220
+    for cnt in range(10):
+        for name in control[f"copy {cnt}"]:
+            assert [qst.name[lang] for qst in
+                    test[f"copy {cnt}"][name].questions] == \
+                [qst.name[lang] for qst in
+                 control[f"copy {cnt}"][name].questions]
+
+
+def test_read_filter(monkeypatch):
+    EXAMPLE = f"{TEST_PATH}/datasets/gift/all.gift"
+    parsed = []
+    get = gift._Reader.get
+    def _get(self):
+        parsed.append(self._str)
+        return get(self)
+    monkeypatch.setattr(gift._Reader, "get", _get)
+    control = category.Category.read_gift(
+        EXAMPLE, filter=utils.QFilter(path="qas editor/Multi*"))
+    assert list(control["qas editor"]) == ["Multichoice"]
+    assert control.get_size(True) == len(parsed) == 4
+    parsed.clear()
+    control = category.Category.read_gift(
+        EXAMPLE, filter=utils.QFilter(types=["truefalse", "numerical"]))
+    assert control["qas editor"]["True-False"].get_size() == 4
+    assert control["qas editor"]["Numericals"].get_size() == 4
+    assert control.get_size(True) == len(parsed) == 8
+    test = category.Category.read_gift(
+        EXAMPLE, jobs=2, filter=utils.QFilter(types=["truefalse",
+                                                     "numerical"]))
+    assert test.get_size(True) == 8
+
+
+def test_read_jobs_filter(tmp_path):
+    with open(f"{TEST_PATH}/datasets/gift/all.gift", encoding="utf-8") as ifile:
+        data = ifile.read()
+    path = str(tmp_path / "copies.gift")
+    with open(path, "w", encoding="utf-8") as ofile:
+        ofile.write("$CATEGORY: $course$/A\n\n")
+        for _ in range(10):  # One category over all the blocks
+            ofile.write("".join(line + "\n" for line in data.splitlines()
+                                if not line.startswith("$CATEGORY:")))
+            ofile.write("\n\n")
+    qfilter = utils.QFilter(path="$course$/A")
+    control = category.Category.read_gift(path, filter=qfilter)
+    test = category.Category.read_gift(path, jobs=4, filter=qfilter)
+    assert test.get_size(True) == control.get_size(True) == 220
@@ -0,0 +1,110 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+Tests of the question index of large source files.
+"""
+
+import os
+import shutil
+
+from qas_editor import category
+from qas_editor.enums import Language
+from qas_editor.parsers import gift, moodle
+from qas_editor.parsers.index import SourceIndex
+from qas_editor.question import QQuestion
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_gift(tmp_path):
+    path = shutil.copy(f"{TEST_PATH}/datasets/gift/all.gift", tmp_path)
+    index = SourceIndex(path)
+    assert index.rebuilt and os.path.isfile(f"{path}.qidx")
+    control = category.Category.read_gift(path)
+    questions = [question for name in control["qas editor"]
+                 for question in control["qas editor"][name].questions]
+    assert index.names() == [qst.name[Language.EN_US] for qst in questions]
+    stats = index.stats()
+    assert stats["questions"] == 22 and stats["types"]["truefalse"] == 4
+    assert stats["categories"]["qas editor/Multichoice"] == 4
+    for num in (0, 5, 21):
+        question = index.load(num)
+        assert question.name == questions[num].name
+        assert question.body[Language.EN_US].text[0] == \
+            questions[num].body[Language.EN_US].text[0]
+    assert not SourceIndex(path).rebuilt
+    with open(path, "a", encoding="utf-8") as ofile:
+        ofile.write("\n::added::Last one{}\n")
+    index = SourceIndex(path)
+    assert index.rebuilt and index[-1].name == "added"
+    assert index[-1].qtype == "essay"
+
+
+
+def test_gift_hint(monkeypatch):
+    seen = []
+    for name, qtype in (("_from_qtruefalse", "truefalse"),
+                        ("_from_qnumerical", "numerical"),
+                        ("_from_qessay", "essay"),
+                        ("_from_matching", "matching"),
+                        ("_from_qshortanswer", "shortanswer"),
+                        ("_from_qmultichoice", "multichoice")):
+        monkeypatch.setattr(gift._Reader, name,
+                            lambda *_, qtype=qtype: seen.append(qtype))
+    reader = gift._Reader("")
+    for text in ("::q:: x { T }", "::q:: x { #3:1 }", "x {T}", "x {#3:1}",
+                 "x {####Feedback =a}", "x {}", "x {=a -> 1 =b -> 2}",
+                 "x { =a -> 1 =b -> 2}", "x {=a \\-> 1 ~b}", "x {=a =b}",
+                 "x {=a#Good =b}", "x {~a =b}", "x {=a#Good ~b}", "x",
+                 "x \\{=a}", "x {=a \\} b =c}"):
+        seen.clear()
+        reader.reset(text, {})
+        reader.get()
+        assert [gift._hint(text)] == (seen or ["description"]), text
+
+
+def test_aiken(tmp_path):
+    path = shutil.copy(f"{TEST_PATH}/datasets/aiken/aiken_1.txt", tmp_path)
+    index = SourceIndex(path)
+    assert index.format == "Aiken" and len(index) == 5
+    control = category.Category.read_aiken(path)
+    question = index.load(3)
+    assert question.name[Language.EN_US] == "aiken_3"
+    assert question.body[Language.EN_US].text[0] == \
+        control.get_question(3).body[Language.EN_US].text[0]
+
+
+def test_moodle(monkeypatch, tmp_path):
+    monkeypatch.setitem(moodle._QTYPE, "description", lambda elem: QQuestion(
+        {Language.EN_US: elem.findtext("name/text")}))
+    path = f"{tmp_path}/large.xml"
+    with open(path, "w", encoding="utf-8") as ofile:
+        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n<quiz>\n")
+        for num in range(30):
+            if num % 10 == 0:
+                ofile.write("<question type=\"category\"><category><text>"
+                            f"top/cat{num}</text></category></question>\n")
+            ofile.write(f"<question type=\"description\"><name><text>q{num}"
+                        "</text></name><questiontext><text><![CDATA[<p>"
+                        "<question></p>]]></text></questiontext></question>\n")
+        ofile.write("</quiz>\n")
+    index = SourceIndex(path)
+    assert index.names() == [f"q{num}" for num in range(30)]
+    assert index[25].path == "top/cat20" and index[25].qtype == "description"
+    assert index.stats()["categories"] == {"top/cat0": 10, "top/cat10": 10,
+                                           "top/cat20": 10}
+    assert index.load(17).name[Language.EN_US] == "q17"
@@ -18,10 +18,18 @@
 
 """
 
+import base64
+import io
 import os
+import sqlite3
+import tarfile
+import zipfile
 
-from qas_editor import category
+from qas_editor import category, utils
+from qas_editor.enums import Language
 from qas_editor.parsers import moodle
+from qas_editor.parsers.text import FText
+from qas_editor.question import QQuestion
 
 TEST_PATH = os.path.dirname(os.path.dirname(__file__))
 
@@ -117,4 +125,307 @@ def test_diff_all():
 def test_diff_backup():
     """TODO
     """
-    pass
\ No newline at end of file
+    pass
+
+
+def test_write_cache(monkeypatch, tmp_path):
+    calls = []
+    def _to_xml(question):
+        calls.append(question)
+        elem = moodle.et.Element("question", {"type": "description"})
+        moodle.et.SubElement(elem, "questiontext").text = str(question.body)
+        return elem
+    control = category.Category.read_aiken(f"{TEST_PATH}/datasets/aiken/"
+                                           "aiken_1.txt")
+    qtype = type(control.get_question(0))
+    monkeypatch.setitem(moodle._QREF, qtype, _to_xml)
+    cache = f"{tmp_path}/cache.db"
+    control.write_moodle(f"{tmp_path}/plain.xml", True)
+    assert len(calls) == control.get_size()
+    calls.clear()
+    control.write_moodle(f"{tmp_path}/first.xml", True, cache)
+    assert len(calls) == control.get_size()
+    calls.clear()
+    control.get_question(0).time_lim = 60
+    control.write_moodle(f"{tmp_path}/second.xml", True, cache)
+    assert calls == [control.get_question(0)]
+    with open(f"{tmp_path}/plain.xml") as ifile:
+        plain = ifile.read()
+    with open(f"{tmp_path}/first.xml") as ifile:
+        assert ifile.read() == plain
+    with open(f"{tmp_path}/second.xml") as ifile:
+        assert ifile.read() == plain
+    with sqlite3.connect(cache) as conn:   # Entry of the old version pruned
+        rows = conn.execute("SELECT COUNT(*) FROM fragments").fetchone()
+    assert rows[0] == control.get_size()
+
+
+def test_cache_fingerprint(tmp_path):
+    def _loader():
+        raise AssertionError("Deferred data was read")
+    proto = FText("Same text")
+    shared, own = proto.share(), FText("Same text")
+    own.mark_saved()
+    first, second = (utils.File("/img.png", "ZGF0YQ==") for _ in range(2))
+    deferred = utils.File("/img.png", "ZGF0YQ==")
+    deferred.defer(_loader, "files/ab/ab12")
+    unknown = utils.File("/img.png", "ZGF0YQ==")
+    unknown.defer(_loader)
+    with utils.FragmentCache(f"{tmp_path}/cache.db", "test", 1) as frags:
+        assert frags.fingerprint(shared) == frags.fingerprint(own)
+        assert frags.fingerprint(shared) != frags.fingerprint(FText("Other"))
+        assert frags.fingerprint(first) == frags.fingerprint(second)
+        assert frags.fingerprint(deferred) is not None
+        assert frags.fingerprint(deferred) != frags.fingerprint(first)
+        assert frags.fingerprint(unknown) is None
+    assert deferred.deferred and unknown.deferred
+
+
+def test_read_stream(monkeypatch, tmp_path):
+    seen = []
+    def _from_xml(elem):
+        seen.append(elem.find("name").text)
+        return QQuestion({}, len(seen))
+    monkeypatch.setitem(moodle._QTYPE, "description", _from_xml)
+    path = f"{tmp_path}/stream.xml"
+    with open(path, "w") as ofile:
+        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n<quiz>\n")
+        for cat in ("top/first", "top/second/third"):
+            ofile.write("<question type=\"category\"><category><text>"
+                        f"{cat}</text></category></question>\n")
+            for num in range(3):
+                ofile.write("<question type=\"description\"><name>"
+                            f"{cat}{num}</name></question>\n")
+        ofile.write("</quiz>\n")
+    control = category.Category.read_moodle(path)
+    assert control.name == "top"
+    assert control["first"].get_size() == 3
+    assert control["second"]["third"].get_size() == 3
+    assert seen == [f"{cat}{num}" for cat in ("top/first", "top/second/third")
+                    for num in range(3)]
+
+
+def test_write_stream(monkeypatch, tmp_path):
+    def _to_xml(question):
+        elem = moodle.et.Element("question", {"type": "description"})
+        moodle.et.SubElement(elem, "name").text = f"Ünï {question.dbid}"
+        moodle.et.SubElement(elem, "questiontext").text = "<b>1 < 2</b>"
+        return elem
+    monkeypatch.setitem(moodle._QREF, QQuestion, _to_xml)
+    control = category.Category("top")
+    control.add_subcat(category.Category("empty"))
+    control["empty"].add_subcat(category.Category("nested"))
+    for num in range(3):
+        control["empty"]["nested"].add_question(QQuestion({}, num))
+        control.add_question(QQuestion({}, num + 3))
+    for pretty in (False, True):
+        root = moodle.et.Element("quiz")     # What the tree based writer did
+        for cat in (control, control["empty"]["nested"]):
+            elem = moodle.et.SubElement(root, "question", {"type": "category"})
+            path = "top/empty/nested" if cat.parent else "top"
+            moodle.et.SubElement(moodle.et.SubElement(elem, "category"),
+                                 "text").text = path
+            root.extend(_to_xml(question) for question in cat.questions)
+        expected = ["<?xml version='1.0' encoding='utf-8'?>\n"]
+        moodle.serialize_fxml(expected.append, root, True, pretty)
+        control.write_moodle(f"{tmp_path}/out.xml", pretty)
+        with open(f"{tmp_path}/out.xml", encoding="utf-8") as ifile:
+            assert ifile.read() == "".join(expected)
+    category.Category("none").write_moodle(f"{tmp_path}/empty.xml")
+    with open(f"{tmp_path}/empty.xml", encoding="utf-8") as ifile:
+        assert ifile.read().endswith("<quiz />")
+
+
+def test_decoder_schema():
+    schema = moodle._Schema({"single": (bool, "single"),
+                             "shuffleanswers": (bool, "shuffle"),
+                             "answer": (str, "options", True)},
+                            moodle._Schema({"name": (str, "name"),
+                                            "defaultgrade": (float, "grade"),
+                                            "idnumber": (int, "dbid")}))
+    root = moodle.et.fromstring(
+        "<question><name><text>First</text></name><name><text>Second</text>"
+        "</name><defaultgrade> 2.5 </defaultgrade><idnumber></idnumber>"
+        "<single>false</single><answer>A</answer><unknown>1</unknown>"
+        "<answer><text>B</text></answer></question>")
+    assert schema.decode(root) == {"name": "First", "grade": 2.5, "dbid": "",
+                                   "single": False, "options": ["A", "B"],
+                                   "shuffle": False}
+    assert moodle._Schema({"flag": (bool, "flag")}).decode(
+        moodle.et.fromstring("<a><flag/></a>")) == {"flag": True}
+
+
+def _backup_members() -> dict:
+    questions = ("<?xml version='1.0' encoding='utf-8'?>\n<quiz><question "
+                 "type=\"category\"><category><text>top/backup</text>"
+                 "</category></question><question type=\"description\">"
+                 "<name>img.png</name></question><question type=\""
+                 "description\"><name>other.png</name></question></quiz>")
+    files = ("<files><file id=\"1\"><contenthash>ab12</contenthash>"
+             "<filepath>/</filepath><filename>.</filename></file><file id="
+             "\"2\"><contenthash>cd34</contenthash><filepath>/</filepath>"
+             "<filename>img.png</filename></file></files>")
+    return {"questions.xml": questions.encode(), "files.xml": files.encode(),
+            "files/cd/cd34": b"\x89PNG data"}
+
+
+def test_read_backup(monkeypatch, tmp_path):
+    def _from_xml(elem):
+        question = QQuestion({}, None)
+        path = f"@@PLUGINFILE@@/{elem.find('name').text}"
+        question.body[Language.EN_US] = FText(files=[utils.File(path)])
+        return question
+    monkeypatch.setitem(moodle._QTYPE, "description", _from_xml)
+    members = _backup_members()
+    with zipfile.ZipFile(tmp_path / "backup.zip", "w") as ofile:
+        for name, data in members.items():
+            ofile.writestr(name, data)
+    with tarfile.open(tmp_path / "backup.mbz", "w:gz") as ofile:
+        for name, data in members.items():
+            info = tarfile.TarInfo(f"./{name}")
+            info.size = len(data)
+            ofile.addfile(info, io.BytesIO(data))
+    monkeypatch.chdir(tmp_path)
+    for path in ("backup.zip", "backup.mbz"):
+        control = category.Category.read_moodle_backup(path)
+        assert control["backup"].get_size() == 2
+        image, other = (question.body[Language.EN_US].files[0]
+                        for question in control["backup"].questions)
+        assert image.deferred and not other.deferred
+        assert image.get_data() == base64.b64encode(b"\x89PNG data").decode()
+        assert other.data is None
+    assert sorted(os.listdir(tmp_path)) == ["backup.mbz", "backup.zip"]
+
+
+def test_read_backup_items(monkeypatch, tmp_path):
+    def _from_xml(elem):
+        question = QQuestion({}, int(elem.find('name').text))
+        question.body[Language.EN_US] = FText(files=[utils.File(
+            "@@PLUGINFILE@@/img.png")])
+        return question
+    monkeypatch.setitem(moodle._QTYPE, "description", _from_xml)
+    questions = ("<quiz><question type=\"category\"><category><text>top/"
+                 "backup</text></category></question>" + "".join(
+                     f"<question type=\"description\" id=\"{num}\"><name>"
+                     f"{num}</name></question>" for num in (7, 8)) + "</quiz>")
+    files = "<files>" + "".join(
+        f"<file id=\"{num}\"><contenthash>{digest}</contenthash><component>"
+        f"question</component><filearea>questiontext</filearea><itemid>{num}"
+        "</itemid><filepath>/</filepath><filename>img.png</filename></file>"
+        for num, digest in ((7, "aa11"), (8, "bb22"))) + "</files>"
+    with zipfile.ZipFile(tmp_path / "backup.zip", "w") as ofile:
+        ofile.writestr("questions.xml", questions)
+        ofile.writestr("files.xml", files)
+        ofile.writestr("files/aa/aa11", b"seven")
+        ofile.writestr("files/bb/bb22", b"eight")
+    control = category.Category.read_moodle_backup(str(tmp_path / "backup.zip"))
+    data = {question.dbid: question.body[Language.EN_US].files[0].get_data()
+            for question in control["backup"].questions}
+    assert data == {7: base64.b64encode(b"seven").decode(),
+                    8: base64.b64encode(b"eight").decode()}
+
+
+def test_write_backup(monkeypatch, tmp_path):
+    def _from_xml(elem):
+        question = QQuestion({}, None)
+        path = f"@@PLUGINFILE@@/{elem.find('name').text}"
+        question.body[Language.EN_US] = FText(files=[utils.File(path)])
+        return question
+    monkeypatch.setitem(moodle._QTYPE, "description", _from_xml)
+    with tarfile.open(tmp_path / "backup.mbz", "w:gz") as ofile:
+        for name, data in _backup_members().items():
+            info = tarfile.TarInfo(f"./{name}")
+            info.size = len(data)
+            ofile.addfile(info, io.BytesIO(data))
+    monkeypatch.chdir(tmp_path)
+    expected = base64.b64encode(b"\x89PNG data").decode()
+    control = category.Category.read_moodle_backup("backup.mbz")
+    image = next(control["backup"].questions).body[Language.EN_US].files[0]
+    assert image.deferred and image.data == expected and not image.deferred
+    control = category.Category.read_moodle_backup("backup.mbz")
+    control.write_sqlite("bank.db")
+    test = category.Category.read_sqlite("bank.db")
+    image = next(test["backup"].questions).body[Language.EN_US].files[0]
+    assert image.get_data() == expected
+
+
+def test_read_chunks(monkeypatch, tmp_path):
+    monkeypatch.setitem(moodle._QTYPE, "description", lambda elem: QQuestion(
+        {}, int(elem.find("name").text)))
+    path = f"{tmp_path}/chunks.xml"
+    with open(path, "w") as ofile:
+        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n<quiz>\n")
+        for num in range(60):
+            if num % 25 == 0:
+                ofile.write("<question type=\"category\"><category><text>"
+                            f"top/cat{num}</text></category></question>\n")
+            ofile.write(f"<question type=\"description\"><name>{num}</name>"
+                        "<questiontext><text><![CDATA[<p>Markup <question>"
+                        "</p>]]></text></questiontext></question>\n")
+        ofile.write("</quiz>\n")
+    header, starts, end = moodle._split_quiz(path, 8)
+    assert len(starts) == 8 and starts[0] == header
+    control = category.Category.read_moodle(path)
+    test = category.Category.read_moodle(path, jobs=3)
+    for name in ("cat0", "cat25", "cat50"):
+        assert [question.dbid for question in test[name].questions] == \
+            [question.dbid for question in control[name].questions]
+    assert test.get_size(True) == 60
+
+
+def test_read_chunks_export(monkeypatch, tmp_path):
+    monkeypatch.setitem(moodle._QTYPE, "description", lambda elem: QQuestion(
+        {}, int(elem.find("name").text)))
+    path = f"{tmp_path}/export.xml"
+    with open(path, "w") as ofile:   # Laid out like the files Moodle exports
+        ofile.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<quiz>\n")
+        for num in range(60):
+            if num % 25 == 0:
+                ofile.write(f"<!-- question: 0  -->\n  <question type=\""
+                            "category\">\n    <category>\n      <text>"
+                            f"top/cat{num}</text>\n    </category>\n  "
+                            "</question>\n\n")
+            ofile.write(f"<!-- question: {num + 1}  -->\n  <question type="
+                        f"\"description\">\n    <name>{num}</name>\n  "
+                        "</question>\n\n")
+        ofile.write("</quiz>\n")
+    header, starts, end = moodle._split_quiz(path, 8)
+    assert len(starts) == 8 and starts[0] == header
+    control = category.Category.read_moodle(path)
+    test = category.Category.read_moodle(path, jobs=3)
+    for name in ("cat0", "cat25", "cat50"):
+        assert [question.dbid for question in test[name].questions] == \
+            [question.dbid for question in control[name].questions]
+    assert test.get_size(True) == 60
+
+
+def test_read_filter(monkeypatch, tmp_path):
+    decoded = []
+    def _decode(elem):
+        decoded.append(elem.findtext("name/text"))
+        return QQuestion({}, int(elem.findtext("idnumber")))
+    monkeypatch.setitem(moodle._QTYPE, "description", _decode)
+    path = f"{tmp_path}/filter.xml"
+    with open(path, "w") as ofile:
+        ofile.write("<?xml version='1.0' encoding='utf-8'?>\n<quiz>\n")
+        for num in range(60):
+            if num % 20 == 0:
+                ofile.write("<question type=\"category\"><category><text>"
+                            f"top/cat{num}</text></category></question>\n")
+            tag = "even" if num % 2 == 0 else "odd"
+            ofile.write(f"<question type=\"description\"><name><text>q{num}"
+                        f"</text></name><idnumber>{num}</idnumber><tags><tag>"
+                        f"<text>{tag}</text></tag></tags></question>\n")
+        ofile.write("</quiz>\n")
+    qfilter = utils.QFilter(path="top/cat2*", tags=["odd"])
+    control = category.Category.read_moodle(path, filter=qfilter)
+    assert list(control) == ["cat20"]
+    assert [qst.dbid for qst in control["cat20"].questions] == \
+        list(range(21, 40, 2))
+    assert len(decoded) == 10
+    test = category.Category.read_moodle(path, jobs=3, filter=qfilter)
+    assert [qst.dbid for qst in test["cat20"].questions] == \
+        list(range(21, 40, 2))
+    control = category.Category.read_moodle(path, filter=utils.QFilter(
+        dbids={5, 45}, types=["description"]))
+    assert control.get_size(True) == 2
@@ -0,0 +1,100 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+
+"""
+import os
+
+import pytest
+import sympy
+
+from qas_editor import category, utils
+from qas_editor.parsers import qasjson
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+
+
+def _bank():
+    control = category.Category.read_gift(f"{TEST_PATH}/datasets/gift/all.gift")
+    control.add_subcat(category.Category.read_aiken(
+        f"{TEST_PATH}/datasets/aiken/aiken_1.txt", "aiken"))
+    return control
+
+
+def test_shards_round_trip(tmp_path):
+    control = _bank()
+    control.write_jsonl_shards(str(tmp_path), shard_size=4)
+    assert len(list(tmp_path.glob("*.jsonl"))) == 7
+    test = category.Category.read_jsonl_shards(str(tmp_path), jobs=2)
+    assert utils.Compare.compare(test, control)
+
+
+def test_shards_append(tmp_path):
+    control = _bank()
+    control.write_jsonl_shards(str(tmp_path), shard_size=10)
+    extra = category.Category()
+    extra.add_subcat(category.Category.read_aiken(
+        f"{TEST_PATH}/datasets/aiken/aiken_1.txt", "more"))
+    extra.append_jsonl_shards(str(tmp_path))
+    test = category.Category.read_jsonl_shards(str(tmp_path))
+    assert test.get_size(True) == control.get_size(True) + 5
+    assert test["more"].get_size() == 5
+    assert len(list(tmp_path.glob("*.jsonl"))) == 4
+    control.write_jsonl_shards(str(tmp_path), shard_size=10)
+    test = category.Category.read_jsonl_shards(str(tmp_path))
+    assert utils.Compare.compare(test, control)
+    assert len(list(tmp_path.glob("*.jsonl"))) == 3
+
+
+def test_shards_hash(tmp_path):
+    _bank().write_jsonl_shards(str(tmp_path), shard_size=10)
+    with open(tmp_path / "00001.jsonl", "ab") as ofile:
+        ofile.write(b"\n")
+    with pytest.raises(ValueError):
+        category.Category.read_jsonl_shards(str(tmp_path))
+
+
+def test_shards_incremental(tmp_path):
+    control = _bank()
+    control.write_jsonl_shards(str(tmp_path), 4)
+    names = sorted(os.listdir(tmp_path))
+    before = {name: (tmp_path / name).read_bytes() for name in names}
+    for name in names:
+        os.utime(tmp_path / name, ns=(0, 0))
+    control["aiken"].get_question(0).touch()
+    control.write_jsonl_shards(str(tmp_path), 4)
+    changed = [name for name in names
+               if os.stat(tmp_path / name).st_mtime_ns != 0]
+    assert sorted(changed) == ["00005.jsonl", "manifest.json"]
+    assert (tmp_path / "00005.jsonl").read_bytes() == before["00005.jsonl"]
+    test = category.Category.read_jsonl_shards(str(tmp_path))
+    for _ in range(3):
+        test["aiken"].pop_question(test["aiken"].get_question(2))
+    test.write_jsonl_shards(str(tmp_path), 4)
+    assert sorted(os.listdir(tmp_path)) == names[:-2] + ["manifest.json"]
+    assert category.Category.read_jsonl_shards(str(tmp_path)).get_size(True)\
+        == control.get_size(True) - 3
+
+
+def test_sympy_decode():
+    x = sympy.Symbol("x", real=True)
+    expr = sympy.sqrt(2) * x ** 2 - sympy.Rational(1, 3) * sympy.sin(x)
+    assert qasjson.from_json(qasjson.to_json(expr)) == expr
+    for text in ("__import__('os')", "Poly('x')", "Symbol('x').name",
+                 "sympify('1')"):
+        with pytest.raises(ValueError):
+            qasjson.from_json({"$x": text})
@@ -0,0 +1,128 @@
+# Question and Answer Sheet Editor <https://github.com/LucasWolfgang/QAS-Editor>
+# Copyright (C) 2022  Lucas Wolfgang
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+## Description
+
+"""
+import gc
+import os
+
+from qas_editor import category, enums, utils
+
+TEST_PATH = os.path.dirname(os.path.dirname(__file__))
+LANG = enums.Language.EN_US
+
+
+def _bank():
+    control = category.Category.read_gift(f"{TEST_PATH}/datasets/gift/all.gift")
+    control.add_subcat(category.Category.read_aiken(
+        f"{TEST_PATH}/datasets/aiken/aiken_1.txt", "aiken", LANG))
+    return control
+
+
+def _same(control: category.Category, test: category.Category):
+    assert list(control) == list(test)
+    assert control.get_size() == test.get_size()
+    for qst_a, qst_b in zip(control.questions, test.questions):
+        assert qst_a.name == qst_b.name and qst_a.tags == qst_b.tags
+        assert utils.Compare.compare(qst_a.body, qst_b.body)
+        assert utils.Compare.compare(qst_a.feedback, qst_b.feedback)
+    for name in control:
+        _same(control[name], test[name])
+
+
+def test_round_trip(tmp_path):
+    control = _bank()
+    path = str(tmp_path / "bank.db")
+    control.write_sqlite(path)
+    test = category.Category.read_sqlite(path)
+    _same(control, test)
+
+
+def test_lazy_load(tmp_path):
+    path = str(tmp_path / "bank.db")
+    _bank().write_sqlite(path)
+    test = category.Category.read_sqlite(path)
+    assert not test.loaded and not test["aiken"].loaded
+    question = test["aiken"].get_question(1)
+    assert test["aiken"].loaded and not test.loaded
+    assert not question.loaded
+    assert question.body[LANG].text[0].startswith("During the month")
+    assert question.loaded
+
+
+def test_incremental_save(tmp_path):
+    path = str(tmp_path / "bank.db")
+    _bank().write_sqlite(path)
+    test = category.Category.read_sqlite(path)
+    question = test["aiken"].get_question(1)
+    question.body[LANG].text[0] = "Changed"
+    question.tags.append("edited")
+    test["aiken"].pop_question(test["aiken"].get_question(0))
+    test.add_subcat(category.Category("new"))
+    test["new"].add_question(test["aiken"].get_question(3))
+    test.write_sqlite(path)
+    assert not test["qas editor"].loaded
+    again = category.Category.read_sqlite(path)
+    assert again["aiken"].get_size() == 3
+    assert again["new"].get_size() == 1
+    question = again["aiken"].get_question(0)
+    assert question.body[LANG].text[0] == "Changed"
+    assert question.tags == ["edited"]
+    assert again.get_size(True) == test.get_size(True)
+
+
+def test_save_as(tmp_path):
+    control = _bank()
+    control.write_sqlite(str(tmp_path / "a.db"))
+    source = category.Category.read_sqlite(str(tmp_path / "a.db"))
+    source.write_sqlite(str(tmp_path / "b.db"))
+    test = category.Category.read_sqlite(str(tmp_path / "b.db"))
+    assert test.get_size(True) == control.get_size(True)
+    _same(control, test)
+    source = category.Category.read_sqlite(str(tmp_path / "a.db"))
+    source["aiken"].get_question(0)     # Loaded stubs, without bodies
+    source.write_sqlite(str(tmp_path / "c.db"))
+    _same(control, category.Category.read_sqlite(str(tmp_path / "c.db")))
+
+
+def test_refuse_overwrite(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not a bank")
+    control = _bank()
+    try:
+        control.write_sqlite(str(path))
+    except FileExistsError:
+        pass
+    else:
+        raise AssertionError("A file that is not a bank was replaced")
+    assert path.read_text() == "not a bank"
+    control.write_sqlite(str(path), overwrite=True)
+    control.write_sqlite(str(path))     # Its own bank is replaced
+    assert category.Category.read_sqlite(str(path)).get_size(True) == \
+        control.get_size(True)
+
+
+def test_rows_are_weak(tmp_path):
+    path = str(tmp_path / "bank.db")
+    _bank().write_sqlite(path)
+    test = category.Category.read_sqlite(path)
+    bank = test._bank
+    test["aiken"].get_question(0).body
+    loaded = len(bank._rows)
+    test.pop_subcat("aiken")
+    gc.collect()        # Questions and categories link to each other
+    assert len(bank._rows) < loaded